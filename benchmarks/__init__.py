@@ -0,0 +1,15 @@
+'''
+Benchmarks and simulations of the crawler. Their processes write the logs of the
+frontier and crawls they run to a temporary directory, and no json lines file unless
+a config sets LOGJSON, so running them leaves the checkout's Logs/ alone.
+'''
+import atexit
+import shutil
+import tempfile
+
+from utils import logs
+
+_log_dir = tempfile.mkdtemp(prefix="crawler-bench-logs-")
+logs.log_to(_log_dir)
+# registered before the log pipeline's own stop, so it runs after it
+atexit.register(shutil.rmtree, _log_dir, ignore_errors=True)
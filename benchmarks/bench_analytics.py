@@ -0,0 +1,98 @@
+'''
+Word counting for the report: the old per word loop into a defaultdict with a full
+sort for the top 50, against utils/analytics.py (batched per page counts, per thread
+shards, heap top 50) and its bounded Space-Saving mode at a few capacities. Checks the
+exact mode writes the same top 50 lines as the old report.txt and how close the
+bounded ones get.
+
+    python -m benchmarks.bench_analytics --pages 20000 --threads 4
+'''
+import random
+import string
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+
+from scraper import stop_words
+from utils.analytics import WordCounter, report_words
+
+STOP_WORDS = sorted(stop_words)
+
+
+def make_pages(pages, words, vocabulary, seed=1):
+    rng = random.Random(seed)
+    terms = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 10)))
+             for _ in range(vocabulary)]
+    weights = list(accumulate(1 / rank for rank in range(1, vocabulary + 1)))
+    corpus = []
+    for _ in range(pages):
+        page = rng.choices(terms, cum_weights=weights, k=words)
+        for i in range(0, words, 7):
+            # what page text looks like: stop words, capitals, punctuation, numbers
+            page[i] = rng.choice([rng.choice(STOP_WORDS), page[i].title(), page[i] + ",",
+                                  f"({page[i]})", str(i), "don't", page[i].upper()])
+        corpus.append(page)
+    return corpus
+
+
+def old_top(corpus):
+    word_counter = defaultdict(int)
+    for words in corpus:
+        for word in words:
+            normalized_word = word.lower().strip(string.punctuation)
+            if normalized_word not in stop_words and word.isalpha():
+                word_counter[normalized_word] += 1
+    return sorted(word_counter.items(), key=lambda item: item[1], reverse=True)[:50], word_counter
+
+
+def new_top(corpus, threads, capacity=0):
+    word_counter = WordCounter(capacity)
+    count = lambda words: word_counter.update(report_words(words, stop_words))
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(count, corpus))
+    else:
+        for words in corpus:
+            count(words)
+    return word_counter.most_common(50), word_counter
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--capacities", default="1000,10000,50000")
+    args = parser.parse_args()
+
+    corpus = make_pages(args.pages, args.words, args.vocabulary)
+    words = args.pages * args.words
+    (old, exact), old_time = timed(old_top, corpus)
+    print(f"old loop + sort    | {words / old_time:12,.0f} words/sec | {len(exact):7} words kept")
+
+    (top, counter), new_time = timed(new_top, corpus, 1)
+    assert top == old, "exact mode wrote a different top 50"
+    print(f"sharded, 1 thread  | {words / new_time:12,.0f} words/sec | {len(counter):7} words kept"
+          f" | {old_time / new_time:5.2f}x | same top 50 lines")
+    (top, counter), new_time = timed(new_top, corpus, args.threads)
+    assert dict(counter.items()) == dict(exact), "sharded counts differ"
+    print(f"sharded, {args.threads} threads | {words / new_time:12,.0f} words/sec | "
+          f"{len(counter):7} words kept | {old_time / new_time:5.2f}x | same counts")
+
+    truth = {word for word, _ in old}
+    for capacity in map(int, args.capacities.split(",")):
+        (top, counter), elapsed = timed(new_top, corpus, 1, capacity)
+        recall = len(truth & {word for word, _ in top}) / len(truth)
+        error = max((count - exact[word]) / exact[word] for word, count in top)
+        same = "same top 50 lines" if top == old else f"top 50 recall {recall:.0%}"
+        print(f"space saving {capacity:>6}| {words / elapsed:12,.0f} words/sec | "
+              f"{len(counter.total):7} words kept | {same}, counts over by at most {error:.1%}")
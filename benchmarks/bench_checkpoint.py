@@ -0,0 +1,120 @@
+'''
+Report state checkpoints (crawler/checkpoint.py) while threads record pages as fast
+as they can: how long a checkpoint holds the crawl threads, the slowest page with and
+without checkpointing, file size against a pickle of the same state and load time.
+Then cuts the file at random offsets, as a crash mid write would, and checks every
+cut loads as a consistent prefix of the segments.
+
+    python -m benchmarks.bench_checkpoint --pages 50000 --threads 4
+'''
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+
+import scraper
+from benchmarks.bench_parse import reset_report_state
+from crawler.checkpoint import ReportCheckpoint, read_segments
+
+VOCABULARY = [f"w{'abcdefghij'[i % 10]}{'abcdefghij'[i // 10 % 10]}{'abcdefghij'[i // 100 % 10]}"
+              f"{'abcdefghij'[i // 1000]}" for i in range(10_000)]
+
+
+def make_pages(count, seed=1):
+    rng = random.Random(seed)
+    return [(f"https://h{number % 50}.ics.uci.edu/p/{number}", scraper.PageStats(
+        [], 400, rng.choices(VOCABULARY, k=300),
+        {rng.randrange(1_000_000_007) for _ in range(100)})) for number in range(count)]
+
+
+def add_page(url, stats, slowest):
+    ''' What scraper.scrape does to the report state for one page. '''
+    start = time.perf_counter()
+    scraper.record_page(url, stats)
+    with scraper.state_lock:
+        if url not in scraper.unique_pages:
+            scraper.unique_pages.add(url)
+            if scraper.page_journal is not None:
+                scraper.page_journal.append(url)
+            scraper.subdomain_counter[url.split("/")[2]] += 1
+    slowest[0] = max(slowest[0], time.perf_counter() - start)
+
+
+def record(pages, threads, checkpoint=None):
+    reset_report_state()
+    if checkpoint is not None:
+        checkpoint.start()
+    slowests = [[0.0] for _ in range(threads)]
+    workers = [threading.Thread(target=lambda part, slowest: [add_page(*page, slowest) for page in part],
+                                args=(pages[i::threads], slowests[i])) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    if checkpoint is not None:
+        checkpoint.stop()
+    return elapsed, max(slowest[0] for slowest in slowests)
+
+
+def snapshot():
+    return (set(scraper.unique_pages), dict(scraper.word_counter.items()),
+            list(scraper.near_duplicate.fingerprints), scraper.longest_word_count[0])
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=50_000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--cuts", type=int, default=50)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages)
+    elapsed, slowest = record(pages, args.threads)
+    print(f"no checkpoints   | {args.pages / elapsed:8,.0f} pages/sec | slowest page {slowest * 1000:7.2f} ms")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "report.ckpt")
+        checkpoint = ReportCheckpoint(path, args.interval)
+        elapsed, slowest = record(pages, args.threads, checkpoint)
+        print(f"checkpoint {args.interval:4}s | {args.pages / elapsed:8,.0f} pages/sec | "
+              f"slowest page {slowest * 1000:7.2f} ms | {len(checkpoint.pauses)} checkpoints, "
+              f"longest hold of the crawl threads {max(checkpoint.pauses) * 1000:.3f} ms")
+        expected = snapshot()
+        pickled = len(pickle.dumps(expected[:3]))
+        print(f"checkpoint file {os.path.getsize(path):12,} bytes | pickle {pickled:12,} bytes")
+
+        reset_report_state()
+        start = time.perf_counter()
+        ReportCheckpoint(path).load()
+        print(f"loaded in {time.perf_counter() - start:.2f} s")
+        assert snapshot() == expected, "the loaded report state differs"
+
+        # segments as a crashed crawl would leave them, then cut anywhere
+        reset_report_state()
+        torn_path = os.path.join(folder, "torn.ckpt")
+        checkpoint = ReportCheckpoint(torn_path, compact_segments=10 ** 9)
+        checkpoint.start()
+        prefixes = [0]
+        for part in range(20):
+            for page in pages[part * len(pages) // 20:(part + 1) * len(pages) // 20]:
+                add_page(*page, [0.0])
+            checkpoint.checkpoint()
+            prefixes.append(os.path.getsize(torn_path))
+        checkpoint.stopped.set()
+        with open(torn_path, "rb") as file:
+            data = file.read()
+        rng = random.Random(1)
+        for cut in [rng.randrange(len(data)) for _ in range(args.cuts)]:
+            with open(torn_path, "wb") as file:
+                file.write(data[:cut])
+            state, segments, end = read_segments(torn_path)
+            whole = max(size for size in prefixes if size <= cut)
+            assert end == whole and segments == prefixes.index(whole), (cut, end, segments)
+            assert len(state.pages) == segments * len(pages) // 20 or segments == 20
+        print(f"{args.cuts} cuts loaded as a prefix of whole segments")
@@ -0,0 +1,90 @@
+'''
+Cache server round trips/sec: a fresh requests.get per url (the old download) against the
+pooled keep-alive session in utils.download and the asyncio path in utils.aio_download,
+all talking to the local stand-in server from benchmarks.cache_server.
+
+    python -m benchmarks.bench_download --urls 400 --latency 0.02
+'''
+import asyncio
+import logging
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+import cbor
+import requests
+
+from benchmarks.cache_server import start_server
+from benchmarks.synthetic_site import SyntheticSite
+from utils.download import download
+from utils.response import Response
+
+
+class BenchConfig(object):
+    def __init__(self, cache_server, threads_count=8, async_downloads=32):
+        self.cache_server = cache_server
+        self.user_agent = "IR benchmark"
+        self.threads_count = threads_count
+        self.async_downloads = async_downloads
+        self.timeout = 10.0
+        self.retries = 3
+        self.backoff = 0.1
+
+
+def old_download(url, config):
+    ''' utils.download before the pooled session: new connection every time. '''
+    host, port = config.cache_server
+    resp = requests.get(
+        f"http://{host}:{port}/", params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+    return Response(cbor.loads(resp.content))
+
+
+def run_threads(function, urls, config, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        responses = list(executor.map(lambda url: function(url, config), urls))
+    assert all(resp.status == 200 for resp in responses)
+    return len(urls) / (time.perf_counter() - start)
+
+
+def run_async(urls, config):
+    from utils.aio_download import download_async, make_session
+    logger = logging.getLogger("bench")
+
+    async def crawl():
+        async with make_session(config) as session:
+            return await asyncio.gather(
+                *(download_async(url, config, session, logger) for url in urls))
+
+    start = time.perf_counter()
+    responses = asyncio.run(crawl())
+    assert all(resp.status == 200 for resp in responses)
+    return len(urls) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--in_flight", type=int, default=32)
+    args = parser.parse_args()
+
+    site = SyntheticSite()
+    server = start_server(site, latency=args.latency)
+    config = BenchConfig(server.server_address, args.threads, args.in_flight)
+    urls = [f"https://{site.hosts[i % len(site.hosts)]}/p/{i // len(site.hosts)}"
+            for i in range(args.urls)]
+
+    print(f"old requests.get, 1 thread     {run_threads(old_download, urls, config, 1):8.1f} urls/sec")
+    print(f"pooled session, 1 thread       {run_threads(download, urls, config, 1):8.1f} urls/sec")
+    print(f"old requests.get, {args.threads} threads    "
+          f"{run_threads(old_download, urls, config, args.threads):8.1f} urls/sec")
+    print(f"pooled session, {args.threads} threads      "
+          f"{run_threads(download, urls, config, args.threads):8.1f} urls/sec")
+    try:
+        print(f"asyncio, {args.in_flight} in flight, 1 thread "
+              f"{run_async(urls, config):8.1f} urls/sec")
+    except RuntimeError as e:
+        print(f"asyncio skipped: {e}")
+    server.shutdown()
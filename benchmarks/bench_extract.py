@@ -0,0 +1,82 @@
+'''
+BeautifulSoup against the single pass extractor in utils.extract: checks both give the
+same text, links and page stats on the fixture corpus (benchmarks/fixtures plus synthetic
+pages, or --corpus) and reports throughput and peak memory per page.
+
+    python -m benchmarks.bench_extract --pages 200
+'''
+import os
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from bs4 import BeautifulSoup as Bs
+
+import scraper
+from benchmarks.synthetic_site import SyntheticSite
+from utils.extract import extract
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_pages(folders, synthetic, words):
+    pages = []
+    for folder in folders:
+        for name in sorted(os.listdir(folder)):
+            with open(os.path.join(folder, name), "rb") as page:
+                pages.append((f"https://www.ics.uci.edu/fixtures/{name}", page.read()))
+    site = SyntheticSite(hosts=2, pages_per_host=synthetic, words=words, duplicate_every=0)
+    for number in range(synthetic):
+        url = f"https://{site.hosts[number % 2]}/p/{number}"
+        pages.append((url, site.page(url)[1]))
+    return pages
+
+
+def soup_extract(raw_content):
+    soup = Bs(raw_content, 'html.parser')
+    return (soup.get_text(separator=" "),
+            [tag['href'] for tag in soup.find_all('a', href=True)])
+
+
+def check_equivalent(pages):
+    mismatches = 0
+    for url, content in pages:
+        if soup_extract(content) != extract(content) or \
+                scraper.analyze_page(url, content) != scraper.analyze_page(url, content, fast=True):
+            mismatches += 1
+            print(f"mismatch: {url}")
+    return mismatches
+
+
+def measure(function, pages):
+    start = time.perf_counter()
+    for _, content in pages:
+        function(content)
+    elapsed = time.perf_counter() - start
+
+    peaks = []
+    for _, content in pages[:50]:
+        tracemalloc.start()
+        function(content)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return len(pages) / elapsed, max(peaks)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--corpus", type=str, default=None)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--words", type=int, default=3000)
+    args = parser.parse_args()
+
+    folders = [FIXTURES] + ([args.corpus] if args.corpus else [])
+    pages = load_pages(folders, args.pages, args.words)
+    mismatches = check_equivalent(pages)
+    print(f"{len(pages)} pages, {mismatches} differ between the soup and the fast extractor")
+
+    soup_rate, soup_peak = measure(soup_extract, pages)
+    fast_rate, fast_peak = measure(extract, pages)
+    print(f"soup | {soup_rate:8.1f} pages/sec | peak {soup_peak / 1024:8.0f} KB per page")
+    print(f"fast | {fast_rate:8.1f} pages/sec | peak {fast_peak / 1024:8.0f} KB per page")
+    print(f"fast is {fast_rate / soup_rate:.2f}x faster with {fast_peak / soup_peak:.2f}x the peak memory")
@@ -0,0 +1,63 @@
+'''
+Per page cost of the trigram fingerprint: the old per character custom_hash loop over
+every joined trigram against scraper.fingerprint.
+
+    python -m benchmarks.bench_fingerprint --words 1000,10000,60000
+'''
+import random
+import string
+import time
+from argparse import ArgumentParser
+
+import scraper
+
+
+def old_fingerprint(tokens):
+    ''' The trigram loop is_duplicate used to run. '''
+    trigrams = []
+    for i in range(len(tokens) - 2):
+        trigrams.append(' '.join(tokens[i:i + 3]))
+    trigram_hashes = set()
+    for ngram in trigrams:
+        trigram_hashes.add(scraper.custom_hash(ngram))
+    return {h for h in trigram_hashes if h % 4 == 0}
+
+
+def make_page(rng, vocabulary, words):
+    # zipf-ish word choice so common words repeat the way they do on real pages
+    return [vocabulary[min(int(rng.paretovariate(1.1)) - 1, len(vocabulary) - 1)]
+            for _ in range(words)]
+
+
+def timed(function, tokens, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(tokens)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--words", type=str, default="1000,10000,60000")
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [
+        ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 12)))
+        for _ in range(args.vocabulary)]
+
+    for words in map(int, args.words.split(",")):
+        tokens = make_page(rng, vocabulary, words)
+        old_time, old_result = timed(old_fingerprint, tokens, args.repeat)
+        scraper.token_hash.cache_clear()
+        cold_time, new_result = timed(scraper.fingerprint, tokens, 1)
+        warm_time, _ = timed(scraper.fingerprint, tokens, args.repeat)
+        assert old_result == new_result, "fingerprints differ"
+        print(f"{words:>7} words | old {old_time * 1e3:9.2f} ms/page | "
+              f"new cold {cold_time * 1e3:8.2f} ms/page | new warm {warm_time * 1e3:8.2f} ms/page | "
+              f"speedup {old_time / warm_time:6.1f}x | {len(new_result)} hashes, identical")
@@ -0,0 +1,113 @@
+'''
+What logging costs a crawl page: every thread is a worker logging its per page
+"Downloaded" line, through the old get_logger (a FileHandler and a console
+StreamHandler added on every call, written under their locks by the crawl thread)
+and through the queue pipeline in utils/logs.py. Reports the time per page the crawl
+threads spend in logging calls (summed over the threads, waits for the GIL and the
+handler locks included) and the wall time per page until everything is on disk, for
+1 to 32 threads, and the per page cost with LOGLEVEL = warning. The console goes to /dev/null, a terminal only makes the old way slower.
+
+    python -m benchmarks.bench_logging --threads 1,8,32 --pages 20000
+'''
+import logging
+import os
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+
+from utils import logs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE = ("127.0.0.1", 9000)
+
+
+def legacy_logger(name, filename, console):
+    ''' utils.get_logger before the pipeline. '''
+    logger = logging.getLogger(f"legacy-{name}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    fh = logging.FileHandler(f"Logs/{filename}.log")
+    fh.setLevel(logging.DEBUG)
+    ch = logging.StreamHandler(console)
+    ch.setLevel(logging.INFO)
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    fh.setFormatter(formatter)
+    ch.setFormatter(formatter)
+    logger.addHandler(fh)
+    logger.addHandler(ch)
+    return logger
+
+
+def legacy_page(logger, url):
+    logger.info(f"Downloaded {url}, status <200>, using cache {CACHE}.")
+
+
+def pipeline_page(logger, url):
+    logger.info("Downloaded %s, status <%s>, using cache %s.", url, 200, CACHE,
+                 extra={"url": url, "status": 200})
+
+
+def run(loggers, log_page, pages):
+    ''' Seconds per page inside the logging calls, summed over the threads. '''
+    spent = [0.0] * len(loggers)
+
+    def worker(index):
+        logger = loggers[index]
+        start = time.perf_counter()
+        for number in range(pages):
+            log_page(logger, f"https://h{index}.ics.uci.edu/p/{number}")
+        spent[index] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(len(loggers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(spent) / (pages * len(loggers))
+
+
+def drained(pipeline):
+    ''' Waits until the listener wrote everything queued. '''
+    while not pipeline.queue.empty():
+        time.sleep(0.001)
+    pipeline.write_out()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--threads", default="1,8,32")
+    parser.add_argument("--pages", type=int, default=20_000, help="per run, split over the threads")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder, open(os.devnull, "w") as console:
+        os.chdir(folder)
+        os.makedirs("Logs")
+        pipeline = logs.pipeline()
+        pipeline.console.setStream(console)
+        for count in map(int, args.threads.split(",")):
+            pages = args.pages // count
+
+            loggers = [legacy_logger(f"{count}-{index}", "Worker", console) for index in range(count)]
+            start = time.perf_counter()
+            legacy = run(loggers, legacy_page, pages)
+            legacy_total = (time.perf_counter() - start) / (pages * count)
+            for logger in loggers:
+                for handler in logger.handlers:
+                    handler.close()
+
+            loggers = [logs.get_logger(f"Worker-{count}-{index}", "Worker") for index in range(count)]
+            start = time.perf_counter()
+            queued = run(loggers, pipeline_page, pages)
+            drained(pipeline)
+            queued_total = (time.perf_counter() - start) / (pages * count)
+
+            # LOGLEVEL = warning
+            for logger in loggers:
+                logger.setLevel(logging.WARNING)
+            dropped = run(loggers, pipeline_page, pages)
+
+            print(f"{count:2} threads | old {legacy * 1e6:6.1f} us/page in the workers, "
+                  f"{legacy_total * 1e6:5.1f} on disk | queue {queued * 1e6:6.1f} us/page "
+                  f"in the workers, {queued_total * 1e6:5.1f} on disk | warning {dropped * 1e6:4.1f} us/page")
+        os.chdir(ROOT)
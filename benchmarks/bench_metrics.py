@@ -0,0 +1,112 @@
+'''
+What the crawl metrics (utils/metrics.py) cost: nanoseconds per recorded stage and per
+fetch from 1 and 8 threads, the time to render the endpoint with many hosts, and
+pages/sec of the Worker.run loop over the synthetic site with metrics on and off.
+
+    python -m benchmarks.bench_metrics --pages_per_host 300 --rounds 3
+'''
+import os
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+
+import cbor
+
+import scraper
+from benchmarks.bench_parse import reset_report_state
+from benchmarks.cache_server import encode_response
+from benchmarks.stress_frontier import StressConfig
+from benchmarks.synthetic_site import SyntheticSite
+from crawler.frontier import Frontier
+from utils.metrics import metrics
+from utils.response import Response
+
+
+def per_call(threads, calls, record):
+    workers = [threading.Thread(target=lambda: [record() for _ in range(calls)])
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (threads * calls) * 1e9
+
+
+def timed_stage():
+    with metrics.timer("parse"):
+        pass
+
+
+def fetch():
+    metrics.fetched("https://h1.ics.uci.edu/p/1", 200)
+
+
+def crawl(site):
+    ''' Worker.run without the network, the site answers from memory. '''
+    reset_report_state()
+    metrics.clear()
+    with tempfile.TemporaryDirectory() as folder:
+        config = StressConfig(os.path.join(folder, "save"), "shelve", 0)
+        config.seed_urls = site.seed_urls
+        frontier = Frontier(config, True)
+        pages = 0
+        start = time.perf_counter()
+        while True:
+            with metrics.timer("wait"):
+                tbd_url = frontier.get_tbd_url()
+            if not tbd_url:
+                break
+            with metrics.timer("download"):
+                status, content = site.page(tbd_url)
+                resp = Response(cbor.loads(encode_response(tbd_url, status, content)))
+            metrics.fetched(tbd_url, resp.status)
+            report = scraper.scrape(tbd_url, resp)
+            with metrics.timer("frontier"):
+                new_links = sum(frontier.add_url(link, tbd_url) for link in report.links)
+                frontier.record_yield(tbd_url, report, new_links)
+            frontier.mark_url_complete(tbd_url)
+            pages += 1
+        elapsed = time.perf_counter() - start
+        frontier.close()
+    return pages / elapsed
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--hosts", type=int, default=2000)
+    parser.add_argument("--pages_per_host", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    for enabled in (True, False):
+        metrics.enabled = enabled
+        for threads in (1, 8):
+            stage = per_call(threads, args.calls // threads, timed_stage)
+            fetched = per_call(threads, args.calls // threads, fetch)
+            print(f"metrics {'on ' if enabled else 'off'} | {threads} threads | "
+                  f"{stage:6.0f} ns per timed stage | {fetched:6.0f} ns per fetch")
+
+    metrics.enabled = True
+    metrics.clear()
+    for number in range(args.hosts):
+        metrics.fetched(f"https://h{number}.ics.uci.edu/", 200 if number % 10 else 404)
+    start = time.perf_counter()
+    text = metrics.render()
+    print(f"endpoint with {args.hosts} hosts: {len(text):,} bytes rendered in "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # alternate so drift in the machine hits both the same
+    site = SyntheticSite(hosts=3, pages_per_host=args.pages_per_host)
+    rates = {True: [], False: []}
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            metrics.enabled = enabled
+            rates[enabled].append(crawl(site))
+    on, off = max(rates[True]), max(rates[False])
+    print(f"crawl loop | metrics off {off:7.1f} pages/sec | on {on:7.1f} pages/sec | "
+          f"overhead {1 - on / off:+.1%}")
+    metrics.enabled = True
+    print(f"last crawl: {metrics.summary()[0]}")
@@ -0,0 +1,86 @@
+'''
+Compares the lsh near duplicate index against the old linear scan over every fingerprint.
+
+    python -m benchmarks.bench_near_duplicate --sizes 10000,100000,1000000
+'''
+import random
+import time
+from argparse import ArgumentParser
+
+from utils.lsh import MinHashLSH, jaccard
+
+
+def make_fingerprint(rng, size):
+    return frozenset(rng.randrange(0, 10**9 + 7) for _ in range(size))
+
+
+def mutate(rng, fingerprint, changed):
+    kept = list(fingerprint)
+    rng.shuffle(kept)
+    return frozenset(kept[changed:]) | make_fingerprint(rng, changed)
+
+
+def linear_is_duplicate(fingerprints, selected_hashes, threshold):
+    ''' What scraper.is_duplicate used to do for every page. '''
+    for fingerprint in fingerprints:
+        if jaccard(selected_hashes, fingerprint) >= threshold:
+            return True
+    return False
+
+
+def run(size, queries, linear_queries, fingerprint_size, threshold, bands, rows, seed):
+    rng = random.Random(seed)
+    index = MinHashLSH(threshold, bands, rows)
+    fingerprints = []
+
+    start = time.perf_counter()
+    for _ in range(size):
+        fingerprint = make_fingerprint(rng, fingerprint_size)
+        fingerprints.append(fingerprint)
+        index.add(fingerprint)
+    build = time.perf_counter() - start
+
+    # half the queries are near duplicates of indexed pages, half are new pages
+    probes = []
+    for i in range(queries):
+        if i % 2 == 0:
+            original = fingerprints[rng.randrange(size)]
+            probes.append(mutate(rng, original, int(fingerprint_size * 0.05)))
+        else:
+            probes.append(make_fingerprint(rng, fingerprint_size))
+
+    start = time.perf_counter()
+    lsh_answers = [index.query(probe) for probe in probes]
+    lsh_time = (time.perf_counter() - start) / queries
+
+    start = time.perf_counter()
+    linear_answers = [
+        linear_is_duplicate(fingerprints, probe, threshold)
+        for probe in probes[:linear_queries]]
+    linear_time = (time.perf_counter() - start) / max(1, len(linear_answers))
+
+    agree = sum(a == b for a, b in zip(lsh_answers, linear_answers))
+    expected = [i % 2 == 0 for i in range(queries)]
+    recall = sum(a and e for a, e in zip(lsh_answers, expected)) / max(1, sum(expected))
+    false_hits = sum(a and not e for a, e in zip(lsh_answers, expected))
+
+    print(f"{size:>9} docs | build {build:8.2f}s | "
+          f"lsh {lsh_time * 1e3:8.3f} ms/query | linear {linear_time * 1e3:10.3f} ms/query | "
+          f"speedup {linear_time / lsh_time:9.1f}x | recall {recall:.3f} | "
+          f"false hits {false_hits} | agree {agree}/{len(linear_answers)}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", type=str, default="10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--linear_queries", type=int, default=10)
+    parser.add_argument("--fingerprint_size", type=int, default=250)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--bands", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    for size in map(int, args.sizes.split(",")):
+        run(size, args.queries, args.linear_queries, args.fingerprint_size,
+            args.threshold, args.bands, args.rows, args.seed)
@@ -0,0 +1,82 @@
+'''
+Pages/sec of scraper.extract_next_links as the parse stage moves to more processes.
+Uses a directory of saved pages (--corpus, every file is one page) or synthetic pages.
+
+    python -m benchmarks.bench_parse --processes 0,1,2,4 --threads 8
+'''
+import os
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cbor
+
+import scraper
+from benchmarks.cache_server import encode_response
+from benchmarks.synthetic_site import SyntheticSite
+from utils.exact_dedup import ExactDuplicates
+from utils.lsh import MinHashLSH
+from utils.response import Response
+
+
+def load_corpus(folder, pages, words):
+    if folder:
+        corpus = []
+        for name in sorted(os.listdir(folder)):
+            with open(os.path.join(folder, name), "rb") as page:
+                corpus.append((f"https://www.ics.uci.edu/saved/{name}", page.read()))
+        return corpus
+    site = SyntheticSite(hosts=4, pages_per_host=pages, words=words, duplicate_every=0)
+    return [(f"https://{host}/p/{number}", site.page(f"https://{host}/p/{number}")[1])
+            for number in range(pages) for host in site.hosts][:pages]
+
+
+def reset_report_state():
+    scraper.unique_pages.clear()
+    scraper.word_counter.clear()
+    scraper.subdomain_counter.clear()
+    scraper.longest_word_count[0] = 0
+    scraper.longest_word_count_url[0] = ""
+    scraper.near_duplicate = MinHashLSH(
+        scraper.SIMILARITY_THRESHOLD, scraper.LSH_BANDS, scraper.LSH_ROWS)
+    scraper.exact_duplicates = ExactDuplicates(
+        scraper.exact_duplicates.mode, scraper.exact_duplicates.capacity)
+
+
+def crawl(corpus, processes, threads):
+    reset_report_state()
+    scraper.parse_pool = ProcessPoolExecutor(max_workers=processes) if processes else None
+    if scraper.parse_pool is not None:
+        # start the processes before timing
+        list(scraper.parse_pool.map(abs, range(processes)))
+    responses = [Response(cbor.loads(encode_response(url, 200, content)))
+                 for url, content in corpus]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        links = sum(len(found) for found in executor.map(
+            lambda resp: scraper.scraper(resp.url, resp), responses))
+    elapsed = time.perf_counter() - start
+    if scraper.parse_pool is not None:
+        scraper.parse_pool.shutdown()
+        scraper.parse_pool = None
+    return len(corpus) / elapsed, links, sum(scraper.word_counter.values())
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--corpus", type=str, default=None)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--words", type=int, default=3000)
+    parser.add_argument("--processes", type=str, default="0,1,2,4")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.pages, args.words)
+    print(f"{len(corpus)} pages, {os.cpu_count()} cpus")
+    baseline = None
+    for processes in map(int, args.processes.split(",")):
+        rate, links, words = crawl(corpus, processes, args.threads)
+        baseline = baseline or rate
+        label = f"{processes} parse processes" if processes else "in-thread parsing"
+        print(f"{label:>20} | {rate:8.1f} pages/sec | {rate / baseline:5.2f}x | "
+              f"{links} links, {words} words counted")
@@ -0,0 +1,100 @@
+'''
+Time to first fetch when resuming a crawl from a big save file: the old full scan
+(unpickle every entry, is_valid on every url still to fetch) against the pending
+index in crawler/pending.py, with the validation cached and with changed filter
+rules. Also how long until the whole backlog is queued.
+
+    python -m benchmarks.bench_resume --urls 1000000 --store sqlite
+'''
+import os
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import scraper
+from benchmarks.stress_frontier import StressConfig
+from crawler.frontier import Frontier
+from utils.seen import SeenSet, seen_key
+from crawler.store import open_store
+from scraper import is_valid
+from utils import get_urlhash
+
+
+class OldFrontier(Frontier):
+    def _parse_save_file(self):
+        ''' The frontier before the pending index. '''
+        keys = []
+        for urlhash, (url, completed) in self.save.items():
+            keys.append(seen_key(urlhash))
+            if not completed and is_valid(url):
+                self.to_be_downloaded.push(url)
+        self.seen = SeenSet(keys)
+
+
+def build_save(config, urls, hosts):
+    save = open_store(config)
+    for number in range(urls):
+        url = f"https://h{number % hosts}.ics.uci.edu/page/{number}"
+        # half of them fetched already, like a crawl stopped half way
+        save[get_urlhash(url)] = (url, number % 2 == 0)
+        save.sync()
+    save.close()
+
+
+def resume(factory, config):
+    start = time.perf_counter()
+    frontier = factory(config, False)
+    while True:
+        scheduled = frontier.try_get_tbd_url()
+        if scheduled:
+            break
+        time.sleep(0.001)
+    first = time.perf_counter() - start
+    if frontier.loader is not None:
+        frontier.loader.join()
+    loaded = time.perf_counter() - start
+    queued = len(frontier.to_be_downloaded) + 1
+    frontier.close()
+    return first, loaded, queued
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=1_000_000)
+    parser.add_argument("--hosts", type=int, default=100)
+    parser.add_argument("--store", default="sqlite")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        config = StressConfig(os.path.join(folder, "save"), args.store, 0)
+        config.flush_batch = 100_000
+        start = time.perf_counter()
+        build_save(config, args.urls, args.hosts)
+        print(f"{args.urls} url save file ({args.store}) built in {time.perf_counter() - start:.1f} s")
+        # the first resume scans it and writes the index
+        first, loaded, queued = resume(Frontier, config)
+        print(f"scan + index build   | first fetch after {first:7.3f} s | "
+              f"all {queued} queued after {loaded:7.2f} s")
+        # copies so every run resumes the same files
+        backup = os.path.join(folder, "backup")
+        os.makedirs(backup)
+        for name in os.listdir(folder):
+            if name.startswith("save"):
+                shutil.copy(os.path.join(folder, name), backup)
+
+        def restore():
+            for name in os.listdir(backup):
+                shutil.copy(os.path.join(backup, name), folder)
+
+        runs = [("old full scan", OldFrontier), ("index, cached", Frontier)]
+        for name, factory in runs:
+            restore()
+            first, loaded, queued = resume(factory, config)
+            print(f"{name:20} | first fetch after {first:7.3f} s | "
+                  f"all {queued} queued after {loaded:7.2f} s")
+        restore()
+        scraper.url_filter = scraper.url_filter.replace(max_query_length=99)
+        first, loaded, queued = resume(Frontier, config)
+        print(f"{'index, new rules':20} | first fetch after {first:7.3f} s | "
+              f"all {queued} queued after {loaded:7.2f} s")
@@ -0,0 +1,167 @@
+'''
+robots.txt and sitemaps (crawler/robots.py) on a replayed crawl: the synthetic site
+with robots=True, whose robots.txt disallows a printer copy of every page and whose
+sitemaps list every page, a tenth of them linked from nowhere. Each scenario replays
+benchmarks/corpus/robots.arc in a fresh process (like bench_suite) and reports the
+cache server requests (pages, robots.txt and sitemap files), the disallowed pages
+fetched, the real pages reached and the time until 50%, 90% and 100% of the real
+pages the crawl without robots.txt reaches. --record crawls the stand-in cache server
+once without and once with ROBOTS into the same archive, so both replay completely.
+
+    python -m benchmarks.bench_robots
+    python -m benchmarks.bench_robots --latency 0.02 --threads 1
+    python -m benchmarks.bench_robots --record --hosts 8 --pages_per_host 500
+'''
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from urllib.parse import urlparse
+
+from benchmarks.bench_suite import BASE, ROOT, write_config
+
+CORPUS = os.path.join(ROOT, "benchmarks", "corpus", "robots.arc")
+
+# name -> [CRAWLER] changes
+SCENARIOS = {
+    "off": {"ROBOTS": "false"},
+    "robots": {"ROBOTS": "true", "SITEMAPS": "false"},
+    "sitemaps": {"ROBOTS": "true", "SITEMAPS": "true"},
+}
+FRACTIONS = (0.5, 0.9, 1.0)
+
+
+def sections(hosts, threads):
+    values = {section: dict(values) for section, values in BASE.items()}
+    values["CRAWLER"]["SEEDURL"] = ",".join(f"https://h{i}.ics.uci.edu" for i in range(hosts))
+    values["LOCAL PROPERTIES"]["THREADCOUNT"] = str(threads)
+    return values
+
+
+def load_config(values):
+    from utils.config import Config
+
+    write_config("config.ini", values)
+    parser = ConfigParser()
+    parser.read("config.ini")
+    return Config(parser)
+
+
+def is_real(url):
+    return not urlparse(url).path.startswith("/print/")
+
+
+def child(archive, latency, scenario, hosts, threads):
+    ''' One crawl in this process, prints its results as json. '''
+    import scraper
+    from crawler import Crawler
+    from utils.archive import Archive
+    from utils.metrics import metrics
+
+    values = sections(hosts, threads)
+    values["CONNECTION"].update(REPLAY=archive, REPLAYLATENCY=str(latency))
+    values["CRAWLER"].update(SCENARIOS[scenario])
+    config = load_config(values)
+    config.cache_server = ("replay", config.replay)
+    crawler = Crawler(config, True)
+    # when every page is done, in order
+    completed = []
+    mark_url_complete = crawler.frontier.mark_url_complete
+
+    def marked(url):
+        completed.append((time.perf_counter(), url))
+        mark_url_complete(url)
+
+    crawler.frontier.mark_url_complete = marked
+    start = time.perf_counter()
+    crawler.start()
+    elapsed = time.perf_counter() - start
+
+    recorded = Archive(archive)
+    real = [moment - start for moment, url in completed
+            if is_real(url) and url in scraper.unique_pages and recorded.get(url).status == 200]
+    robots = crawler.frontier.robots.stats() if crawler.frontier.robots is not None else {}
+    print(json.dumps({
+        "pages": sum(metrics.snapshot()["statuses"].values()), "elapsed": elapsed,
+        "disallowed": sum(not is_real(url) for _, url in completed),
+        "robots": robots, "real": real}))
+
+
+def run(archive, latency, scenario, hosts, threads):
+    with tempfile.TemporaryDirectory() as folder:
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_robots", "--child", scenario,
+             "--archive", archive, "--latency", str(latency), "--hosts", str(hosts),
+             "--threads", str(threads)],
+            cwd=folder, env=dict(os.environ, PYTHONPATH=ROOT),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def record(archive, hosts, pages_per_host):
+    ''' Crawls the site through the stand-in cache server without and with ROBOTS, into one archive. '''
+    from benchmarks.bench_parse import reset_report_state
+    from benchmarks.cache_server import start_server
+    from benchmarks.synthetic_site import SyntheticSite
+    from crawler import Crawler
+
+    if os.path.exists(archive):
+        os.remove(archive)
+    server = start_server(SyntheticSite(hosts=hosts, pages_per_host=pages_per_host, robots=True))
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        for robots in ("false", "true"):
+            values = sections(hosts, 4)
+            values["CONNECTION"]["RECORD"] = archive
+            values["CRAWLER"]["ROBOTS"] = robots
+            config = load_config(values)
+            config.cache_server = server.server_address
+            reset_report_state()
+            Crawler(config, True).start()
+        os.chdir(ROOT)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--archive", default=CORPUS)
+    parser.add_argument("--latency", type=float, default=0.005, help="REPLAYLATENCY")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--record", action="store_true")
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--pages_per_host", type=int, default=100)
+    parser.add_argument("--child", default="")
+    args = parser.parse_args()
+    archive = os.path.abspath(args.archive)
+
+    if args.child:
+        child(archive, args.latency, args.child, args.hosts, args.threads)
+        sys.exit()
+    if args.record or not os.path.exists(archive):
+        record(archive, args.hosts, args.pages_per_host)
+        print(f"recorded {archive}: {os.path.getsize(archive):,} bytes")
+        if args.record:
+            sys.exit()
+
+    print(f"{'scenario':8} | requests | pages | robots.txt | sitemaps | disallowed fetched | "
+          f"blocked links | real pages | " + " | ".join(f"time to {fraction:4.0%}" for fraction in FRACTIONS))
+    target = None
+    for scenario in args.scenarios.split(","):
+        result = run(archive, args.latency, scenario, args.hosts, args.threads)
+        robots = result["robots"]
+        real = result["real"]
+        # the real pages a crawl without robots.txt reaches, or this one's when it did not run
+        target = target or len(real)
+        # robots.txt and sitemaps are fetched by the workers, counted in the metrics too
+        requests = result["pages"]
+        pages = requests - robots.get("fetched", 0) - robots.get("sitemaps", 0)
+        times = [f"{real[int(fraction * target) - 1]:10.2f} s" if len(real) >= fraction * target
+                 else f"{'never':>12}" for fraction in FRACTIONS]
+        print(f"{scenario:8} | {requests:8} | {pages:5} | {robots.get('fetched', 0):10} | "
+              f"{robots.get('sitemaps', 0):8} | {result['disallowed']:18} | {robots.get('blocked', 0):13} | "
+              f"{len(real):10} | " + " | ".join(times))
@@ -0,0 +1,80 @@
+'''
+Memory per url and "seen?" lookups/sec of utils.seen.SeenSet against the old
+`urlhash in self.save` check on the shelve and sqlite save files.
+
+    python -m benchmarks.bench_seen --urls 1000000 --store_urls 100000
+'''
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from utils.seen import SeenSet, seen_key
+from crawler.store import ShelveStore, SQLiteStore
+from utils import get_urlhash
+
+
+def url_hashes(count, offset=0):
+    return [get_urlhash(f"https://www.ics.uci.edu/page/{i}") for i in range(offset, offset + count)]
+
+
+def measure_memory(build):
+    tracemalloc.start()
+    structure = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return structure, size
+
+
+def lookups_per_sec(contains, probes):
+    start = time.perf_counter()
+    for probe in probes:
+        contains(probe)
+    return len(probes) / (time.perf_counter() - start)
+
+
+def build_seen_set(hashes):
+    seen = SeenSet()
+    for urlhash in hashes:
+        seen.add(seen_key(urlhash))
+    return seen
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=1_000_000)
+    parser.add_argument("--store_urls", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    hashes = url_hashes(args.urls)
+    # mostly already seen links, the way a page links back into its own site
+    probes = rng.sample(hashes, min(args.lookups, args.urls) * 9 // 10) + \
+        url_hashes(args.lookups // 10, offset=args.urls)
+    rng.shuffle(probes)
+
+    seen, seen_bytes = measure_memory(lambda: build_seen_set(hashes))
+    _, hex_bytes = measure_memory(lambda: set(hashes))
+    _, int_bytes = measure_memory(lambda: {seen_key(h) for h in hashes})
+    print(f"memory per url at {args.urls} urls: SeenSet {seen_bytes / args.urls:6.1f} B | "
+          f"set of hex digests {hex_bytes / args.urls:6.1f} B (table only, the digests are "
+          f"another ~113 B each) | "
+          f"set of ints {int_bytes / args.urls:6.1f} B")
+
+    print(f"SeenSet           {lookups_per_sec(lambda h: seen_key(h) in seen, probes):12.0f} lookups/sec")
+
+    store_probes = probes[:20_000]
+    with tempfile.TemporaryDirectory() as folder:
+        for name, store in (("shelve", ShelveStore(os.path.join(folder, "save"))),
+                            ("sqlite", SQLiteStore(os.path.join(folder, "save.db")))):
+            for urlhash in hashes[:args.store_urls]:
+                store[urlhash] = ("", False)
+            store.flush()
+            rate = lookups_per_sec(lambda h: h in store, store_probes)
+            # note dbm.dumb keeps its whole key index in a python dict, gdbm/ndbm go to disk
+            print(f"{name} save file {rate:12.0f} lookups/sec ({args.store_urls} urls stored)")
+            store.close()
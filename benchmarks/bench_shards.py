@@ -0,0 +1,95 @@
+'''
+Scaling of the sharded crawl (crawler/shard.py): launches 1, 2, 4... local shard
+processes (launch.py --shard i) against the stand-in cache server with the same total
+number of worker threads, and reports pages/sec and the speedup over the single
+process crawl. Checks the merged report has the same pages and words.
+
+    python -m benchmarks.bench_shards --shards 1,2,4 --threads 8 --hosts 16
+'''
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG = """[IDENTIFICATION]
+USERAGENT = IR F19 bench
+[CONNECTION]
+HOST = x
+PORT = 1
+[CRAWLER]
+SEEDURL = {seeds}
+POLITENESS = {politeness}
+[LOCAL PROPERTIES]
+SAVE = frontier.shelve
+THREADCOUNT = {threads}
+METRICSINTERVAL = 0
+{shards}
+"""
+
+
+def crawl(folder, shards, threads, hosts, politeness, cache_port, base_port):
+    seeds = ",".join(f"https://h{i}.ics.uci.edu" for i in range(hosts))
+    addresses = ",".join(f"127.0.0.1:{base_port + i}" for i in range(shards))
+    with open(os.path.join(folder, "config.ini"), "w") as file:
+        file.write(CONFIG.format(
+            seeds=seeds, politeness=politeness, threads=max(1, threads // shards),
+            shards=f"SHARDS = {addresses}" if shards > 1 else ""))
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    processes = [subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "launch.py"), "--restart",
+         "--cache_server", f"127.0.0.1:{cache_port}", "--shard", str(index)],
+        cwd=folder, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for index in range(shards)]
+    for process in processes:
+        process.wait()
+    elapsed = time.perf_counter() - start
+    with open(os.path.join(folder, "report.txt")) as file:
+        report = file.read().splitlines()
+    return elapsed, report
+
+
+def counts(report):
+    return sorted(line.rsplit(":", 1)[1] for line in report[3:] if "." not in line)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--shards", default="1,2,4")
+    parser.add_argument("--threads", type=int, default=8, help="worker threads over all shards")
+    parser.add_argument("--hosts", type=int, default=16)
+    parser.add_argument("--pages_per_host", type=int, default=150)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--politeness", type=float, default=0.01)
+    parser.add_argument("--port", type=int, default=9150)
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.cache_server", "--port", str(args.port),
+         "--hosts", str(args.hosts), "--pages_per_host", str(args.pages_per_host),
+         "--latency", str(args.latency)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(1)
+    print(f"{os.cpu_count()} cpus")
+    try:
+        baseline = None
+        for count in map(int, args.shards.split(",")):
+            with tempfile.TemporaryDirectory() as folder:
+                elapsed, report = crawl(folder, count, args.threads, args.hosts,
+                                        args.politeness, args.port, args.port + 1)
+            pages = int(report[0].split(":")[1])
+            if baseline is None:
+                baseline = elapsed, report
+            print(f"{count:2} shards x {max(1, args.threads // count):2} threads | {pages:6} pages | "
+                  f"{elapsed:6.1f} s | {pages / elapsed:7.1f} pages/sec | "
+                  f"{baseline[0] / elapsed:5.2f}x")
+            # the longest page and words tied at the 50th count may be others
+            assert report[0] == baseline[1][0] and report[2] == baseline[1][2], \
+                "the merged report differs from the first crawl"
+            assert counts(report) == counts(baseline[1]), "the merged word counts differ"
+    finally:
+        server.terminate()
@@ -0,0 +1,100 @@
+'''
+Bytes read and peak RSS of a crawl over a site with some very large pages and pdfs:
+the old download (whole response read, page unpickled before the size check) against
+the streaming size guard in utils.download. Each mode runs in its own process so the
+peak RSS is its own.
+
+    python -m benchmarks.bench_size_guard --pages 200 --large_every 10 --large_size 8000000
+'''
+import json
+import logging
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+import cbor
+import requests
+
+import scraper
+from benchmarks.bench_download import BenchConfig
+from benchmarks.cache_server import start_server
+from benchmarks.synthetic_site import SyntheticSite
+from utils.download import download
+from utils.response import Response, size_guard_stats
+
+MAX_DOWNLOAD = 1_100_000
+
+
+def old_download(url, config, read):
+    ''' utils.download before the size guard: everything read and unpickled. '''
+    host, port = config.cache_server
+    resp = requests.get(
+        f"http://{host}:{port}/", params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+    read.append(len(resp.content))
+    response = Response(cbor.loads(resp.content))
+    response.raw_response
+    return response
+
+
+def run_mode(mode, port, urls, threads):
+    config = BenchConfig(("127.0.0.1", port), threads)
+    config.max_download = MAX_DOWNLOAD
+    read = []
+    if mode == "old":
+        fetch = lambda url: old_download(url, config, read)
+    else:
+        logger = logging.getLogger("bench")
+        fetch = lambda url: download(url, config, logger)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        links = sum(executor.map(lambda url: len(scraper.scraper(url, fetch(url))), urls))
+    stats = size_guard_stats()
+    stats.update(seconds=time.perf_counter() - start, links=links)
+    if mode == "old":
+        stats["bytes_read"] = sum(read)
+    return stats
+
+
+def child(mode, port, urls, threads):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_size_guard", "--child", mode,
+         "--port", str(port), "--threads", str(threads)],
+        input="\n".join(urls), capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--large_every", type=int, default=10)
+    parser.add_argument("--large_size", type=int, default=8_000_000)
+    parser.add_argument("--binary_every", type=int, default=7)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--child", type=str, default=None)
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.child:
+        urls = sys.stdin.read().split()
+        print(json.dumps(run_mode(args.child, args.port, urls, args.threads)))
+        sys.exit()
+
+    site = SyntheticSite(hosts=2, pages_per_host=args.pages // 2, duplicate_every=0,
+                         large_every=args.large_every, large_size=args.large_size,
+                         binary_every=args.binary_every)
+    server = start_server(site)
+    urls = [f"https://{host}/p/{number}"
+            for number in range(args.pages // 2) for host in site.hosts]
+    results = {mode: child(mode, server.server_address[1], urls, args.threads)
+               for mode in ("old", "guard")}
+    server.shutdown()
+
+    for mode, stats in results.items():
+        print(f"{mode:>5} | {stats['seconds']:6.2f} s | read {stats['bytes_read'] / 2**20:8.1f} MB | "
+              f"saved {stats.get('bytes_saved', 0) / 2**20:8.1f} MB | "
+              f"peak RSS {stats['peak_rss_kb'] / 1024:7.1f} MB | {stats['links']} links")
+    guard = results["guard"]
+    print(f"guard: {guard.get('skipped', 0)} skipped on Content-Length, {guard.get('aborted', 0)} "
+          f"cut off, peak RSS {results['old']['peak_rss_kb'] / guard['peak_rss_kb']:.2f}x lower")
@@ -0,0 +1,142 @@
+'''
+Frontier save file backends: urls/sec for the old shelve-sync-per-url path against the
+group committing stores in crawler/store.py, plus a crash test that kills a writer
+process mid crawl and checks the reopened save file is a consistent prefix.
+
+    python -m benchmarks.bench_store --urls 5000 --crashes 5
+'''
+import multiprocessing
+import os
+import random
+import shelve
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from crawler.store import ShelveStore, SQLiteStore
+from utils import get_urlhash
+
+
+def events(urls):
+    ''' A crawl shaped stream: every page completed discovers two new ones. '''
+    added = completed = 0
+    yield ("add", 0)
+    added = 1
+    while completed < urls:
+        yield ("complete", completed)
+        completed += 1
+        for _ in range(2):
+            if added < urls:
+                yield ("add", added)
+                added += 1
+
+
+def url_of(i):
+    return f"https://www.ics.uci.edu/page/{i}"
+
+
+class LegacyStore(object):
+    ''' What Frontier did before: shelve plus a full sync after every single write. '''
+    def __init__(self, path):
+        self.save = shelve.open(path)
+
+    def __setitem__(self, urlhash, value):
+        self.save[urlhash] = value
+
+    def keys(self):
+        return self.save.keys()
+
+    def values(self):
+        return self.save.values()
+
+    def items(self):
+        return self.save.items()
+
+    def sync(self):
+        self.save.sync()
+
+    def close(self):
+        self.save.close()
+
+
+def make_store(kind, path, flush_interval, flush_batch):
+    if kind == "legacy":
+        return LegacyStore(path)
+    if kind == "shelve":
+        return ShelveStore(path, flush_interval, flush_batch)
+    return SQLiteStore(path, flush_interval, flush_batch, durability=kind.split("-")[1])
+
+
+def replay(store, urls, crash_at=None):
+    for count, (kind, i) in enumerate(events(urls)):
+        if count == crash_at:
+            os._exit(1)
+        url = url_of(i)
+        store[get_urlhash(url)] = (url, kind == "complete")
+        store.sync()
+
+
+def throughput(kind, urls, flush_interval, flush_batch):
+    with tempfile.TemporaryDirectory() as folder:
+        store = make_store(kind, os.path.join(folder, "save"), flush_interval, flush_batch)
+        start = time.perf_counter()
+        replay(store, urls)
+        store.close()
+        return urls / (time.perf_counter() - start)
+
+
+def crash_child(kind, path, urls, crash_at, flush_interval, flush_batch):
+    replay(make_store(kind, path, flush_interval, flush_batch), urls, crash_at)
+
+
+def consistent_prefix(kind, path, urls, flush_interval, flush_batch):
+    ''' Returns the number of events that survived, or None if the state matches no prefix. '''
+    store = make_store(kind, path, flush_interval, flush_batch)
+    state = dict(store.items())
+    store.close()
+    expected = dict()
+    if not state:
+        return 0
+    for count, (event, i) in enumerate(events(urls)):
+        url = url_of(i)
+        expected[get_urlhash(url)] = (url, event == "complete")
+        if expected == state:
+            return count + 1
+    return None
+
+
+def crash_test(kind, urls, crashes, flush_interval, flush_batch, seed):
+    rng = random.Random(seed)
+    total_events = sum(1 for _ in events(urls))
+    lost = []
+    for _ in range(crashes):
+        crash_at = rng.randrange(1, total_events)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "save")
+            child = multiprocessing.Process(
+                target=crash_child,
+                args=(kind, path, urls, crash_at, flush_interval, flush_batch))
+            child.start()
+            child.join()
+            survived = consistent_prefix(kind, path, urls, flush_interval, flush_batch)
+            if survived is None:
+                return "INCONSISTENT"
+            lost.append(crash_at - survived)
+    return f"consistent, lost {min(lost)}-{max(lost)} events per crash"
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=5000)
+    parser.add_argument("--crashes", type=int, default=5)
+    parser.add_argument("--crash_urls", type=int, default=1000)
+    parser.add_argument("--flush_interval", type=float, default=1.0)
+    parser.add_argument("--flush_batch", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for kind in ("legacy", "shelve", "sqlite-normal", "sqlite-full"):
+        rate = throughput(kind, args.urls, args.flush_interval, args.flush_batch)
+        recovery = crash_test(kind, args.crash_urls, args.crashes,
+                              args.flush_interval, args.flush_batch, args.seed)
+        print(f"{kind:>14} | {rate:10.0f} urls/sec | crash recovery: {recovery}")
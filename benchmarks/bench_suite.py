@@ -0,0 +1,180 @@
+'''
+End to end crawl benchmarks, offline: every scenario replays the same recorded crawl
+(REPLAY, utils/archive.py) in a fresh process and reports pages/sec, CPU time per
+page of each stage of the crawl loop (utils/metrics.py timed with time.thread_time),
+peak RSS, unique pages, near duplicates, exact duplicate hits (EXACTDEDUP) with the
+parse time they saved, and whether its report matches the first scenario's. The corpus is benchmarks/corpus/synthetic.arc, a recording of the
+synthetic site; --record makes it again (or another one with --archive).
+The CPU of a parse process is not in the parse column, and with ASYNCDOWNLOADS the
+download column also has the CPU of the other tasks that ran on the loop meanwhile.
+
+    python -m benchmarks.bench_suite
+    python -m benchmarks.bench_suite --latency 0.02 --scenarios threads4,fast
+    python -m benchmarks.bench_suite --record --archive /tmp/big.arc --pages_per_host 2000
+'''
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from configparser import ConfigParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(ROOT, "benchmarks", "corpus", "synthetic.arc")
+
+BASE = {
+    "IDENTIFICATION": {"USERAGENT": "IR F19 bench"},
+    "CONNECTION": {"HOST": "x", "PORT": "1"},
+    "CRAWLER": {"SEEDURL": "https://h0.ics.uci.edu,https://h1.ics.uci.edu,https://h2.ics.uci.edu",
+                "POLITENESS": "0"},
+    "LOCAL PROPERTIES": {"SAVE": "frontier.shelve", "THREADCOUNT": "1", "METRICSINTERVAL": "0",
+                         "LOGJSON": ""},
+}
+
+# name -> [LOCAL PROPERTIES] changes
+SCENARIOS = {
+    "baseline": {},
+    "noexact": {"EXACTDEDUP": "off"},
+    "threads4": {"THREADCOUNT": "4"},
+    "fast": {"THREADCOUNT": "4", "PARSER": "fast"},
+    "processes2": {"THREADCOUNT": "4", "PARSEPROCESSES": "2"},
+    "sqlite": {"THREADCOUNT": "4", "STORE": "sqlite", "SAVE": "frontier.db"},
+    "async8": {"THREADCOUNT": "1", "ASYNCDOWNLOADS": "8"},
+}
+
+STAGES = ("download", "parse", "dedup", "filter", "frontier", "flush")
+
+
+def write_config(path, sections):
+    parser = ConfigParser()
+    parser.optionxform = str
+    for section, values in sections.items():
+        parser[section] = values
+    with open(path, "w") as file:
+        parser.write(file)
+
+
+def child(archive, latency, scenario):
+    ''' One crawl in this process, prints its results as json. '''
+    import scraper
+    from crawler import Crawler
+    from crawler.async_worker import AsyncWorker
+    from crawler.worker import Worker
+    from utils.config import Config
+    from utils.metrics import metrics
+    from utils.response import peak_rss_kb
+
+    sections = {section: dict(values) for section, values in BASE.items()}
+    sections["CONNECTION"].update(REPLAY=archive, REPLAYLATENCY=str(latency))
+    sections["LOCAL PROPERTIES"].update(SCENARIOS[scenario])
+    write_config("config.ini", sections)
+    parser = ConfigParser()
+    parser.read("config.ini")
+    config = Config(parser)
+    config.cache_server = ("replay", config.replay)
+    metrics.clock = time.thread_time
+    crawler = Crawler(config, True, worker_factory=AsyncWorker if config.async_downloads else Worker)
+    start = time.perf_counter()
+    crawler.start()
+    elapsed = time.perf_counter() - start
+    scraper.write_report("report.txt")
+    snapshot = metrics.snapshot()
+    pages = sum(snapshot["statuses"].values())
+    traps = crawler.frontier.traps.stats() if crawler.frontier.traps is not None else {}
+    with open("report.txt") as file:
+        report = file.read().splitlines()
+    print(json.dumps({
+        "pages": pages, "elapsed": elapsed, "peak_rss_kb": peak_rss_kb(),
+        "cpu": {stage: snapshot["stages"][stage].sum for stage in STAGES},
+        "unique": len(scraper.unique_pages),
+        "duplicates": sum(stats["duplicates"] for stats in traps.values()),
+        "exact": scraper.exact_duplicates.stats(),
+        "report": report}))
+
+
+def run(archive, latency, scenario):
+    with tempfile.TemporaryDirectory() as folder:
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_suite", "--child", scenario,
+             "--archive", archive, "--latency", str(latency)],
+            cwd=folder, env=dict(os.environ, PYTHONPATH=ROOT),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def equivalent(report, other):
+    ''' Same pages, longest count, top word counts and subdomains, ties may be ordered differently. '''
+    def key(lines):
+        return lines[0], lines[2], sorted(line.rsplit(":", 1)[1] for line in lines[3:])
+    return key(report) == key(other)
+
+
+def record(archive, hosts, pages_per_host, mirror_every):
+    ''' Crawls the synthetic site through the stand-in cache server with RECORD set. '''
+    from benchmarks.cache_server import start_server
+    from benchmarks.synthetic_site import SyntheticSite
+    from crawler import Crawler
+    from utils.config import Config
+
+    if os.path.exists(archive):
+        os.remove(archive)
+    server = start_server(SyntheticSite(
+        hosts=hosts, pages_per_host=pages_per_host, duplicate_every=25, variant_every=7,
+        mirror_every=mirror_every))
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        sections = {section: dict(values) for section, values in BASE.items()}
+        sections["CONNECTION"]["RECORD"] = archive
+        sections["CRAWLER"]["SEEDURL"] = ",".join(f"https://h{i}.ics.uci.edu" for i in range(hosts))
+        sections["LOCAL PROPERTIES"]["THREADCOUNT"] = "4"
+        write_config("config.ini", sections)
+        parser = ConfigParser()
+        parser.read("config.ini")
+        config = Config(parser)
+        config.cache_server = server.server_address
+        Crawler(config, True).start()
+        os.chdir(ROOT)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--archive", default=CORPUS)
+    parser.add_argument("--latency", type=float, default=0.005, help="REPLAYLATENCY")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--record", action="store_true")
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--pages_per_host", type=int, default=100)
+    parser.add_argument("--mirror_every", type=int, default=10, help="every n-th page has a www. mirror")
+    parser.add_argument("--child", default="")
+    args = parser.parse_args()
+    archive = os.path.abspath(args.archive)
+
+    if args.child:
+        child(archive, args.latency, args.child)
+        sys.exit()
+    if args.record:
+        record(archive, args.hosts, args.pages_per_host, args.mirror_every)
+        print(f"recorded {archive}: {os.path.getsize(archive):,} bytes")
+        sys.exit()
+
+    print(f"{'scenario':10} | pages/sec | peak RSS | unique | dups | exact hits | saved | report | "
+          + " | ".join(f"{stage:>8}" for stage in STAGES) + "  (CPU ms per page)")
+    first = None
+    for scenario in args.scenarios.split(","):
+        try:
+            result = run(archive, args.latency, scenario)
+        except subprocess.CalledProcessError:
+            # async8 without aiohttp installed
+            print(f"{scenario:10} | failed")
+            continue
+        first = first or result
+        pages = max(result["pages"], 1)
+        same = "same" if equivalent(result["report"], first["report"]) else "DIFFERS"
+        print(f"{scenario:10} | {result['pages'] / result['elapsed']:9.1f} | "
+              f"{result['peak_rss_kb'] / 1024:5.0f} MB | {result['unique']:6} | "
+              f"{result['duplicates']:4} | {result['exact']['hits']:4} {result['exact']['hit_rate']:5.1%} | "
+              f"{result['exact']['saved_seconds'] * 1000:3.0f} ms | {same:>6} | "
+              + " | ".join(f"{result['cpu'][stage] * 1000 / pages:8.3f}" for stage in STAGES))
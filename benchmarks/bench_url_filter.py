@@ -0,0 +1,138 @@
+'''
+urls/sec of the compiled filter in utils/url_filter.py against the old scraper.is_valid,
+over generated links: in and out of scope hosts, blocked extensions, calendar traps,
+blocked and encoded query params, ;params. Checks both agree except where the old
+endswith matched in the middle of a label (physics.uci.edu ends with cs.uci.edu).
+
+    python -m benchmarks.bench_url_filter --urls 2000000
+'''
+import random
+import re
+import time
+from argparse import ArgumentParser
+from urllib.parse import urlparse, parse_qs
+
+import scraper
+
+HOSTS = [
+    "www.ics.uci.edu", "ics.uci.edu", "vision.ics.uci.edu", "www.cs.uci.edu",
+    "www.informatics.uci.edu", "www.stat.uci.edu", "today.uci.edu", "ICS.UCI.EDU",
+    "physics.uci.edu", "economics.uci.edu", "www.uci.edu", "www.google.com",
+    "www.ics.uci.edu:8080", "wics.ics.uci.edu",
+]
+PATHS = [
+    "", "/", "/about", "/people/faculty", "/department/information_computer_sciences/news",
+    "/files/paper.pdf", "/img/logo.PNG", "/assets/site.css", "/data/set.tar.gz",
+    "/events/day/2019-10-21", "/events/2019-10", "/wiki/doku.php", "/readme.md",
+    "/a.pdf;jsessionid=12", "/dir.v2/page", "/~eppstein/pubs/", "/index.php/ok",
+]
+QUERIES = [
+    "", "", "", "id=3", "share=twitter", "do=edit&id=4", "tab_files=1", "a=1&ical=",
+    "sh%61re=1", "ical", "page=2&sort=date", "x=" + "y" * 120, "outlook-ical=1", "do+=1",
+]
+
+
+def old_good_query(parsed_query):
+    query_params = parse_qs(parsed_query)
+    for param in scraper.blocked_params:
+        if param in query_params:
+            return False
+    if len(parsed_query) > 100:
+        return False
+    return True
+
+
+def old_is_valid(url):
+    ''' scraper.is_valid before utils.url_filter. '''
+    valid_domains = {"ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu",
+                     "today.uci.edu"}
+    parsed = urlparse(url)
+    if parsed.scheme not in set(["http", "https"]):
+        return False
+    domain = parsed.netloc.lower()
+    is_valid_domain = False
+    for valid_domain in valid_domains:
+        if domain.endswith(valid_domain):
+            if valid_domain == "today.uci.edu":
+                if not parsed.path.startswith("/department/information_computer_sciences/"):
+                    return False
+            is_valid_domain = True
+            break
+    if not is_valid_domain:
+        return False
+    if parsed.path.lower().endswith(scraper.blocked_extensions):
+        return False
+    if re.search(r'/day/\d{4}-\d{2}-\d{2}', parsed.path):
+        return False
+    if re.search(r'/\d{4}-\d{2}', parsed.path):
+        return False
+    if not old_good_query(parsed.query):
+        return False
+    return not re.match(
+        r".*\.(css|js|bmp|gif|jpe?g|ico"
+        + r"|png|tiff?|mid|mp2|mp3|mp4"
+        + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+        + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+        + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+        + r"|epub|dll|cnf|tgz|sha1"
+        + r"|thmx|mso|arff|rtf|jar|csv"
+        + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower())
+
+
+def generate(count, seed=1):
+    rng = random.Random(seed)
+    urls = []
+    for number in range(count):
+        scheme = "https" if rng.random() < 0.9 else rng.choice(["http", "mailto", "ftp"])
+        path = rng.choice(PATHS)
+        if path.endswith("/") or not path:
+            path += f"p{number}"
+        query = rng.choice(QUERIES)
+        url = f"{scheme}://{rng.choice(HOSTS)}{path}"
+        url = f"{url}?{query}" if query else url
+        # the fragment keeps every url distinct, nothing is answered from a cache
+        urls.append(f"{url}#s{number}")
+    return urls
+
+
+def label_boundary(url):
+    ''' Accepted by the old suffix match but not on whole labels. '''
+    netloc = urlparse(url).netloc.lower()
+    return scraper.url_filter.domain_rule(netloc) is None
+
+
+def rate(function, urls):
+    start = time.perf_counter()
+    function(urls)
+    return len(urls) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    urls = generate(args.urls)
+    compiled = scraper.url_filter.replace()
+    uncached = type(compiled)(**compiled.rules, cache_size=0)
+
+    sample = urls[:200_000]
+    differ = [url for url in sample if old_is_valid(url) != uncached.is_valid(url)]
+    unexplained = [url for url in differ if not label_boundary(url)]
+    assert not unexplained, unexplained[:10]
+    print(f"{len(sample)} urls checked, {len(differ)} differ, all on label boundaries "
+          f"(e.g. {differ[0] if differ else '-'})")
+
+    old = rate(lambda urls: [url for url in urls if old_is_valid(url)], urls)
+    single = rate(lambda urls: [url for url in urls if uncached.is_valid(url)], urls)
+    batch = rate(uncached.filter_links, urls)
+    print(f"old is_valid        {old:12,.0f} urls/sec")
+    print(f"compiled is_valid   {single:12,.0f} urls/sec | {single / old:5.2f}x")
+    print(f"filter_links batch  {batch:12,.0f} urls/sec | {batch / old:5.2f}x")
+
+    # links on real pages repeat (navigation, footers), the lru cache answers those
+    pages = [urls[i:i + 60] + urls[:40] for i in range(0, min(len(urls), 500_000), 60)]
+    repeated = rate(lambda pages: [compiled.filter_links(page) for page in pages], pages)
+    old_repeated = rate(lambda pages: [[u for u in page if old_is_valid(u)] for page in pages], pages)
+    print(f"per page batches with repeated links: {repeated * 100:,.0f} urls/sec, "
+          f"{repeated / old_repeated:5.2f}x the old is_valid")
@@ -0,0 +1,102 @@
+'''
+Memory per url of the structures that hold every url of a crawl, old against packed
+(utils/urlstore.py): the frontier queue (HostScheduler with heaps of (priority, seq,
+url) tuples against packed per host queues), scraper.unique_pages (a set of str
+against URLSet) and the seen set (hex sha256 digests against 64 bit keys in
+utils.seen.SeenSet). Each one is built in a fresh process from generated urls and
+measured by its RSS growth, the queues are then drained to time the decoding.
+
+    python -m benchmarks.bench_urlstore --urls 1000000,10000000
+'''
+import json
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+SECTIONS = ["people", "research", "events", "news", "courses", "projects", "pubs", "wiki"]
+STRUCTURES = ["queue-old", "queue-packed", "unique-old", "unique-packed", "seen-old", "seen-packed"]
+
+
+def urls(count, hosts):
+    ''' Urls of a crawl: hosts with a hundred or so directories each, some with a query. '''
+    for i in range(count):
+        host = f"www{i % hosts}.ics.uci.edu"
+        directory = f"{SECTIONS[(i // hosts) % 8]}/{(i // (hosts * 8)) % 12}"
+        query = f"?id={i}&view=full" if i % 5 == 0 else ""
+        yield f"https://{host}/{directory}/item-{i}.html{query}"
+
+
+def rss_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+
+def child(structure, count, hosts):
+    from crawler.policy import LIFOPolicy
+    from crawler.scheduler import HostScheduler, get_host
+    from utils import get_urlhash
+    from utils.seen import SeenSet, seen_key
+    from utils.urlstore import URLSet
+
+    class OldLIFO(LIFOPolicy):
+        # the heap of tuples every queue was before
+        sequential = None
+
+    before = rss_kb()
+    start = time.perf_counter()
+    if structure.startswith("queue"):
+        built = HostScheduler(0.0, OldLIFO() if structure == "queue-old" else LIFOPolicy())
+        for url in urls(count, hosts):
+            built.push(url)
+    elif structure == "unique-old":
+        built = set(urls(count, hosts))
+    elif structure == "unique-packed":
+        built = URLSet(urls(count, hosts))
+    elif structure == "seen-old":
+        built = {get_urlhash(url) for url in urls(count, hosts)}
+    else:
+        built = SeenSet()
+        for url in urls(count, hosts):
+            built.add(seen_key(get_urlhash(url)))
+    elapsed = time.perf_counter() - start
+    after = rss_kb()
+    drain = 0.0
+    if structure.startswith("queue"):
+        start = time.perf_counter()
+        while True:
+            scheduled = built.pop(0.0)
+            if scheduled is None:
+                break
+            built.done(get_host(scheduled[1]), 0.0)
+        drain = time.perf_counter() - start
+    print(json.dumps({"bytes": (after - before) * 1024, "build": elapsed, "drain": drain}))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", default="1000000,10000000")
+    parser.add_argument("--hosts", type=int, default=1000)
+    parser.add_argument("--structures", default=",".join(STRUCTURES))
+    parser.add_argument("--child", default="")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, int(args.urls), args.hosts)
+        sys.exit()
+
+    for count in map(int, args.urls.split(",")):
+        results = {}
+        for structure in args.structures.split(","):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_urlstore", "--child", structure,
+                 "--urls", str(count), "--hosts", str(args.hosts)],
+                stdout=subprocess.PIPE, check=True, text=True).stdout
+            result = results[structure] = json.loads(output)
+            old = results.get(structure.replace("packed", "old"))
+            versus = f" | {old['bytes'] / result['bytes']:4.1f}x smaller" if old and old is not result else ""
+            drain = f", drained in {result['drain']:5.1f} s" if result["drain"] else ""
+            print(f"{count:>10,} urls | {structure:13} | {result['bytes'] / count:6.1f} bytes/url | "
+                  f"{result['bytes'] / 2 ** 20:7.0f} MB | built in {result['build']:5.1f} s{drain}{versus}")
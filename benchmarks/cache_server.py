@@ -0,0 +1,85 @@
+'''
+Local stand-in for the spacetime cache server. Answers GET /?q=<url>&u=<agent> with the
+same CBOR encoded {"url", "status", "response": pickled requests.Response} payload,
+serving pages from benchmarks.synthetic_site after an optional simulated latency.
+
+    python -m benchmarks.cache_server --port 9100 --latency 0.05
+    python launch.py --restart --cache_server 127.0.0.1:9100
+'''
+import pickle
+import threading
+import time
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import cbor
+import requests
+
+from benchmarks.synthetic_site import SyntheticSite
+
+
+def encode_response(url, status, content, content_type="text/html"):
+    raw = requests.Response()
+    raw.status_code = status
+    raw._content = content
+    raw.url = url
+    raw.encoding = "utf-8"
+    raw.headers["Content-Type"] = content_type
+    raw.headers["Content-Length"] = str(len(content))
+    return cbor.dumps({"url": url, "status": status, "response": pickle.dumps(raw)})
+
+
+class CacheHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # send headers and body in one segment, otherwise keep-alive clients hit delayed acks
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        url = query.get("q", [""])[0]
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        status, content = self.server.site.page(url)
+        body = encode_response(url, status, content, self.server.site.content_type(url))
+        self.server.requests_served += 1
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/cbor")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except ConnectionError:
+            # the client's size guard hung up on a large page
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(site=None, port=0, latency=0.0):
+    ''' Runs the server on a daemon thread, returns it. server.server_address has the port. '''
+    server = ThreadingHTTPServer(("127.0.0.1", port), CacheHandler)
+    server.daemon_threads = True
+    server.site = site or SyntheticSite()
+    server.latency = latency
+    server.requests_served = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--pages_per_host", type=int, default=500)
+    args = parser.parse_args()
+    server = start_server(SyntheticSite(args.hosts, args.pages_per_host), args.port, args.latency)
+    print(f"Serving the synthetic site on 127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
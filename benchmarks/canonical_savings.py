@@ -0,0 +1,76 @@
+'''
+How many fetches canonical urls (utils/canonical.py) save. Reads the urls a recorded
+crawl downloaded from its Logs/Worker.log and counts those that are another fetched
+url under the full canonicalization, step by step. With --synthetic it crawls the
+synthetic site, whose links are partly written in other spellings of the same page,
+once with the old trailing slash rule only and once with every step, and compares.
+
+    python -m benchmarks.canonical_savings --log Logs/Worker.log
+    python -m benchmarks.canonical_savings --synthetic
+'''
+import re
+from argparse import ArgumentParser
+from collections import Counter
+
+import scraper
+from benchmarks.sim_traps import crawl
+from benchmarks.synthetic_site import SyntheticSite
+from utils.canonical import Canonicalizer, STEPS
+
+DOWNLOADED = re.compile(r"Downloaded (\S+), status <")
+
+
+def fetched_urls(log_file):
+    with open(log_file) as log:
+        return [match.group(1) for match in map(DOWNLOADED.search, log) if match]
+
+
+def savings(urls):
+    ''' Fetches that repeat a canonical url, for all steps and for each step alone. '''
+    old = Canonicalizer(steps=["slash"])
+    distinct = {old.canonical(url) for url in urls}
+    saved = {"all": len(distinct) - len({Canonicalizer().canonical(url) for url in distinct})}
+    for step in STEPS:
+        if step != "slash":
+            alone = Canonicalizer(steps=[step, "slash"])
+            saved[step] = len(distinct) - len({alone.canonical(url) for url in distinct})
+    return len(distinct), saved
+
+
+def crawl_with(site, steps):
+    scraper.canonicalizer = Canonicalizer(steps=steps)
+    fetched, _, elapsed, _ = crawl(site, False, 10 ** 9)
+    pages = Counter(site.page(url)[1] for url in fetched)
+    return fetched, len(pages), elapsed
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--log", default="Logs/Worker.log")
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--pages_per_host", type=int, default=300)
+    parser.add_argument("--variant_every", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        site = SyntheticSite(hosts=3, pages_per_host=args.pages_per_host,
+                             variant_every=args.variant_every)
+        old, old_pages, old_elapsed = crawl_with(site, ["slash"])
+        new, new_pages, new_elapsed = crawl_with(site, STEPS)
+        print(f"old normalize | {len(old):6} fetched | {old_pages:6} distinct pages | {old_elapsed:5.1f} s")
+        print(f"canonical     | {len(new):6} fetched | {new_pages:6} distinct pages | {new_elapsed:5.1f} s")
+        print(f"fetches saved: {len(old) - len(new)} ({1 - len(new) / len(old):.1%})")
+        assert new_pages == old_pages, "canonical urls lost pages"
+        distinct, saved = savings(old)
+    else:
+        urls = fetched_urls(args.log)
+        if not urls:
+            # a log rotated away, or from before the download lines were INFO
+            raise SystemExit(f"No \"Downloaded <url>, status <...>\" lines in {args.log}, nothing to count.")
+        distinct, saved = savings(urls)
+        print(f"{len(urls)} fetches, {distinct} distinct urls under the old normalize")
+
+    print(f"canonical urls would have saved {saved['all']} of {distinct} fetches "
+          f"({saved['all'] / max(distinct, 1):.1%})")
+    for step in STEPS[:-1]:
+        print(f"    {step:>10} alone: {saved[step]}")
@@ -0,0 +1,105 @@
+'''
+Simulated clock run of the per host scheduler against the old frontier (one LIFO list,
+every worker sleeping POLITENESS seconds after each page no matter the host).
+Checks that a host's next fetch never starts before delay seconds after its last one
+finished, so fetches of one host never overlap, and reports pages/sec. Runs once per
+--fetch_time, the default includes downloads slower than the delay.
+
+    python -m benchmarks.sim_politeness --hosts 20 --urls 2000 --threads 1,4,8,16
+'''
+import heapq
+import random
+from argparse import ArgumentParser
+from collections import defaultdict
+
+from crawler.scheduler import HostScheduler, get_host
+
+
+def make_urls(rng, hosts, urls):
+    names = [f"https://h{i}.ics.uci.edu" for i in range(hosts)]
+    # skewed so a few hosts own most of the pages, like www.ics.uci.edu does
+    return [f"{names[min(int(rng.expovariate(4 / hosts)), hosts - 1)]}/page/{i}"
+            for i in range(urls)]
+
+
+def min_gap(starts, fetch_time):
+    ''' Shortest time from the end of a fetch to the start of the next one of its host. '''
+    gap = float("inf")
+    for times in starts.values():
+        times.sort()
+        for first, second in zip(times, times[1:]):
+            gap = min(gap, second - (first + fetch_time))
+    return gap
+
+
+def simulate_old(urls, threads, delay, fetch_time):
+    ''' Old worker loop: pop LIFO, fetch, then sleep delay regardless of host. '''
+    pending = list(urls)
+    workers = [(0.0, i) for i in range(threads)]
+    starts = defaultdict(list)
+    finish = 0.0
+    while pending:
+        now, worker = heapq.heappop(workers)
+        url = pending.pop()
+        starts[get_host(url)].append(now)
+        finish = max(finish, now + fetch_time)
+        heapq.heappush(workers, (now + fetch_time + delay, worker))
+    return finish, starts
+
+
+def simulate_new(urls, threads, delay, fetch_time):
+    '''
+    Workers take whatever host frees up first. A worker that finished a fetch marks
+    it done (like Frontier.mark_url_complete), one that finds every queued host busy
+    waits until another worker frees one.
+    '''
+    scheduler = HostScheduler(delay)
+    for url in urls:
+        scheduler.push(url)
+    # (time the worker is free, worker, host it just fetched from)
+    workers = [(0.0, i, "") for i in range(threads)]
+    waiting = []
+    starts = defaultdict(list)
+    finish = 0.0
+    while workers:
+        now, worker, host = heapq.heappop(workers)
+        if host and scheduler.done(host, now):
+            for other in waiting:
+                heapq.heappush(workers, (now, other, ""))
+            waiting = []
+        scheduled = scheduler.pop(now)
+        if scheduled is None:
+            waiting.append(worker)
+            continue
+        start, url = scheduled
+        starts[get_host(url)].append(start)
+        finish = max(finish, start + fetch_time)
+        heapq.heappush(workers, (start + fetch_time, worker, get_host(url)))
+    assert not scheduler, "workers stopped with urls queued"
+    return finish, starts
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--urls", type=int, default=2000)
+    parser.add_argument("--threads", type=str, default="1,4,8,16")
+    parser.add_argument("--delay", type=float, default=0.5)
+    parser.add_argument("--fetch_time", default="0.2,1.0", help="seconds per download, comma separated")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    urls = make_urls(random.Random(args.seed), args.hosts, args.urls)
+    for fetch_time in map(float, args.fetch_time.split(",")):
+        print(f"fetch time {fetch_time}s, delay {args.delay}s")
+        baseline, _ = simulate_old(urls, 1, args.delay, fetch_time)
+        for threads in map(int, args.threads.split(",")):
+            old_time, old_starts = simulate_old(urls, threads, args.delay, fetch_time)
+            new_time, new_starts = simulate_new(urls, threads, args.delay, fetch_time)
+            new_gap = min_gap(new_starts, fetch_time)
+            assert new_gap >= args.delay - 1e-9, f"host hit again {new_gap}s after its last fetch ended"
+            assert new_time <= baseline + 1e-9
+            print(f"{threads:>3} threads | old {len(urls) / old_time:7.2f} pages/s "
+                  f"(min same host gap {min_gap(old_starts, fetch_time):5.2f}s) | "
+                  f"new {len(urls) / new_time:7.2f} pages/s (min same host gap {new_gap:.2f}s) | "
+                  f"{baseline / new_time:5.2f}x the polite single thread crawl")
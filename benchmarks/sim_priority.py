@@ -0,0 +1,144 @@
+'''
+Replays a recorded link graph through the real frontier once per PRIORITY policy
+(crawler/policy.py) and reports unique pages per fetch under a fetch budget. The graph
+is recorded once from the trap site of sim_traps (real pages plus an endless calendar
+and endless wiki revisions): every url's links as scraper.scrape would hand them to the
+frontier, its word count and its near duplicate cluster. A unique page is a fetch that
+is not thin and is the first of its cluster. Replaying needs no parsing, so every
+policy sees exactly the same web.
+
+    python -m benchmarks.sim_priority --budget 1500
+    python -m benchmarks.sim_priority --graph graph.json.gz --traps
+'''
+import gzip
+import json
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import deque
+
+import scraper
+from benchmarks.sim_traps import TrapSite, is_trap
+from benchmarks.stress_frontier import StressConfig
+from crawler.frontier import Frontier
+from crawler.policy import POLICIES
+from utils.lsh import MinHashLSH, jaccard
+
+
+def record_graph(site, pages):
+    '''
+    Breadth first over the site up to pages urls. Returns {url: [links, words, cluster]},
+    cluster is None for thin pages and errors.
+    '''
+    lsh = MinHashLSH(scraper.SIMILARITY_THRESHOLD, scraper.LSH_BANDS, scraper.LSH_ROWS)
+    cluster_of = []
+    clusters = 0
+    graph = dict()
+    queue = deque(scraper.canonical_url(url) for url in site.seed_urls)
+    seen = set(queue)
+    while queue and len(graph) < pages:
+        url = queue.popleft()
+        status, content = site.page(url)
+        stats = scraper.analyze_page(url, content) if status == 200 else None
+        if stats is None:
+            graph[url] = [[], 0, None]
+            continue
+        cluster = None
+        if stats.fingerprint:
+            for doc_id in lsh.candidates(stats.fingerprint):
+                if jaccard(stats.fingerprint, lsh.fingerprints[doc_id]) >= lsh.threshold:
+                    cluster = cluster_of[doc_id]
+                    break
+            lsh.add(stats.fingerprint)
+        if cluster is None:
+            cluster = clusters
+            clusters += 1
+        if stats.fingerprint:
+            cluster_of.append(cluster)
+        links = scraper.url_filter.filter_links(scraper.canonicalizer.canonical_links(stats.links))
+        graph[url] = [links, stats.word_count, cluster]
+        for link in links:
+            if link not in seen:
+                seen.add(link)
+                queue.append(link)
+    return graph
+
+
+def load_graph(path, site, pages):
+    if path and os.path.exists(path):
+        with gzip.open(path, "rt") as file:
+            return json.load(file)
+    graph = record_graph(site, pages)
+    if path:
+        with gzip.open(path, "wt") as file:
+            json.dump(graph, file)
+    return graph
+
+
+def replay(graph, seeds, policy, budget, traps):
+    '''
+    Crawls the graph with the frontier, urls outside of it answer like a 404.
+    Returns the fetched urls and the unique page count after every fetch.
+    '''
+    with tempfile.TemporaryDirectory() as folder:
+        config = StressConfig(os.path.join(folder, "save"), "shelve", 0)
+        config.seed_urls = seeds
+        config.priority = policy
+        config.trap_detection = traps
+        frontier = Frontier(config, True)
+        fetched, unique = [], []
+        clusters = set()
+        while len(fetched) < budget:
+            scheduled = frontier.try_get_tbd_url()
+            if not scheduled:
+                break
+            _, url = scheduled
+            fetched.append(url)
+            links, words, cluster = graph.get(url, ([], 0, None))
+            duplicate = cluster in clusters
+            if cluster is not None:
+                clusters.add(cluster)
+            unique.append(len(clusters))
+            report = scraper.PageReport([] if duplicate else links, words, duplicate, None)
+            new_links = sum(frontier.add_url(link, url) for link in report.links)
+            frontier.record_yield(url, report, new_links)
+            frontier.mark_url_complete(url)
+        frontier.close()
+    return fetched, unique
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--graph", default="", help="recorded graph, written on the first run")
+    parser.add_argument("--pages", type=int, default=8000, help="urls to record")
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--pages_per_host", type=int, default=300)
+    parser.add_argument("--traps", action="store_true", help="trap detector on while replaying")
+    args = parser.parse_args()
+
+    # as if nobody had written the calendar regexes and the blocked params yet
+    scraper.url_filter = scraper.url_filter.replace(traps=[], blocked_params=[])
+    site = TrapSite(hosts=args.hosts, pages_per_host=args.pages_per_host, duplicate_every=25)
+    start = time.perf_counter()
+    graph = load_graph(args.graph, site, args.pages)
+    real = {url for url, (_, words, _) in graph.items() if words and not is_trap(url)}
+    clusters = {cluster for _, _, cluster in graph.values() if cluster is not None}
+    print(f"graph: {len(graph)} urls, {len(clusters)} unique pages, {len(real)} real pages "
+          f"({time.perf_counter() - start:.1f} s)")
+
+    checkpoints = [args.budget // 4, args.budget // 2, args.budget]
+    print(f"{'policy':10} | " + " | ".join(f"unique/fetch, real @{c:<5}" for c in checkpoints)
+          + " | trap fetches | time")
+    for name in POLICIES:
+        start = time.perf_counter()
+        fetched, unique = replay(graph, site.seed_urls, name, args.budget, args.traps)
+        elapsed = time.perf_counter() - start
+        columns = []
+        for checkpoint in checkpoints:
+            count = min(checkpoint, len(fetched))
+            covered = len(real.intersection(fetched[:count]))
+            columns.append(f"{unique[count - 1] / count:14.3f}, {covered:5}")
+        traps = sum(map(is_trap, fetched))
+        print(f"{name:10} | " + " | ".join(columns) + f" | {traps:12} | {elapsed:4.1f} s")
@@ -0,0 +1,171 @@
+'''
+Crawls the synthetic site plus two traps the hand written rules in scraper.py do not
+know about: an endless events calendar (calendar.ics.uci.edu/calendar/Y/M/D, every day
+links the next) and a wiki whose pages have endless old revisions (?id=x&rev=N).
+Runs with the trap detector off and on, under a fetch budget, and checks the detector
+finds the same real pages, bans the trap templates and lets the crawl finish.
+
+    python -m benchmarks.sim_traps --budget 5000
+'''
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import date, timedelta
+from urllib.parse import urlparse, parse_qs
+
+import cbor
+
+import scraper
+from benchmarks.bench_parse import reset_report_state
+from benchmarks.cache_server import encode_response
+from benchmarks.stress_frontier import StressConfig
+from benchmarks.synthetic_site import SyntheticSite, VOCABULARY
+from crawler.frontier import Frontier
+from utils.response import Response
+
+CALENDAR = "calendar.ics.uci.edu"
+WIKI = "wiki.ics.uci.edu"
+# every calendar day is this header and four of the EVENTS, days are rarely near
+# duplicates but after a few weeks there is nothing new to read
+CALENDAR_TEXT = " ".join(VOCABULARY[i % 40] for i in range(30))
+EVENTS = [" ".join(VOCABULARY[40 + (event * 37 + i * 11) % 1500] for i in range(30))
+          for event in range(40)]
+
+
+class TrapSite(SyntheticSite):
+    def __init__(self, wiki_pages=40, **kwargs):
+        super().__init__(**kwargs)
+        self.wiki_pages = wiki_pages
+
+    def _text(self, key, words):
+        rng = self._rng(WIKI, key)
+        return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+    def calendar(self, path):
+        try:
+            year, month, day = map(int, path.strip("/").split("/")[1:])
+            day = date(year, month, day)
+        except ValueError:
+            return 404, b"<html><body>Not Found</body></html>"
+        links = [day + timedelta(days=1), day - timedelta(days=1), day + timedelta(days=31)]
+        anchors = "".join(
+            f'<a href="/calendar/{d.year}/{d.month}/{d.day}">{d}</a>' for d in links)
+        rng = self._rng(CALENDAR, day.toordinal())
+        events = " ".join(f"<p>{event}</p>" for event in rng.sample(EVENTS, 4))
+        return 200, (f"<html><body><h1>Events on {day}</h1><p>{CALENDAR_TEXT}</p>{events}"
+                     f"{anchors}</body></html>").encode()
+
+    def wiki(self, query):
+        params = parse_qs(query)
+        name = params.get("id", ["start"])[0]
+        number = int(name[4:]) if name.startswith("page") and name[4:].isdigit() else 0
+        if name != "start" and not (name.startswith("page") and number < self.wiki_pages):
+            return 404, b"<html><body>Not Found</body></html>"
+        text = self._text(number, 300)
+        if params.get("do") == ["revisions"]:
+            # the start of the page and the latest revisions
+            anchors = "".join(f'<a href="/doku.php?id={name}&rev={rev}">rev {rev}</a>'
+                              for rev in range(1, 4))
+            summary = " ".join(text.split()[:120])
+            return 200, (f"<html><body>Old revisions of {name}<p>{summary}</p>{anchors}"
+                         f"</body></html>").encode()
+        if "rev" in params:
+            # an old revision is the page with a few words changed, linking to the
+            # revisions around it
+            rev = int(params["rev"][0])
+            words = text.split()
+            rng = self._rng(name, rev)
+            for _ in range(len(words) // 50):
+                words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+            text = " ".join(words)
+            anchors = "".join(f'<a href="/doku.php?id={name}&rev={other}">rev {other}</a>'
+                              for other in (rev - 1, rev + 1, rev + 2))
+            anchors += f'<a href="/doku.php?id={name}&do=diff&rev={rev}">diff</a>'
+            return 200, f"<html><body><p>{text}</p><p>revision {rev}</p>{anchors}</body></html>".encode()
+        others = [(number + step) % self.wiki_pages for step in (1, 7, 13)]
+        anchors = "".join(f'<a href="/doku.php?id=page{other}">page {other}</a>' for other in others)
+        anchors += f'<a href="/doku.php?id={name}&do=revisions">old revisions</a>'
+        return 200, f"<html><body><p>{text}</p>{anchors}</body></html>".encode()
+
+    def page(self, url):
+        parsed = urlparse(url)
+        if parsed.netloc == CALENDAR:
+            return self.calendar(parsed.path)
+        if parsed.netloc == WIKI:
+            return self.wiki(parsed.query)
+        status, content = super().page(url)
+        if parsed.netloc == self.hosts[0] and parsed.path.rstrip("/") == "":
+            # the way into the traps
+            content = content.replace(b"</body>", (
+                f'<a href="https://{CALENDAR}/calendar/2019/10/21">events</a>'
+                f'<a href="https://{WIKI}/doku.php?id=start">wiki</a></body>').encode())
+        return status, content
+
+
+def is_trap(url):
+    parsed = urlparse(url)
+    return parsed.netloc == CALENDAR or (parsed.netloc == WIKI and "rev=" in parsed.query)
+
+
+def crawl(site, detector, budget):
+    reset_report_state()
+    with tempfile.TemporaryDirectory() as folder:
+        config = StressConfig(os.path.join(folder, "save"), "shelve", 0)
+        config.seed_urls = site.seed_urls
+        config.trap_detection = detector
+        frontier = Frontier(config, True)
+        fetched = []
+        start = time.perf_counter()
+        while len(fetched) < budget:
+            scheduled = frontier.try_get_tbd_url()
+            if not scheduled:
+                break
+            _, url = scheduled
+            fetched.append(url)
+            status, content = site.page(url)
+            resp = Response(cbor.loads(encode_response(url, status, content)))
+            report = scraper.scrape(url, resp)
+            new_links = sum(frontier.add_url(link, url) for link in report.links)
+            frontier.record_yield(url, report, new_links)
+            frontier.mark_url_complete(url)
+        elapsed = time.perf_counter() - start
+        finished = not frontier.to_be_downloaded
+        stats = frontier.traps.stats() if frontier.traps is not None else {}
+        frontier.close()
+    return fetched, finished, elapsed, stats
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--budget", type=int, default=5000)
+    parser.add_argument("--pages_per_host", type=int, default=150)
+    args = parser.parse_args()
+
+    # as if nobody had written the calendar regexes and the blocked params yet
+    scraper.url_filter = scraper.url_filter.replace(traps=[], blocked_params=[])
+    site = TrapSite(hosts=2, pages_per_host=args.pages_per_host, duplicate_every=25)
+
+    results = {}
+    for detector in (False, True):
+        fetched, finished, elapsed, stats = crawl(site, detector, args.budget)
+        real = {url for url in fetched if not is_trap(url)}
+        traps = len(fetched) - len(real)
+        results[detector] = real
+        print(f"detector {'on ' if detector else 'off'} | {len(fetched):6} fetched | "
+              f"{len(real):5} real pages | {traps:6} trap pages | "
+              f"{'finished' if finished else 'budget hit'} | {elapsed:5.1f} s")
+        for template, template_stats in sorted(stats.items(), key=lambda item: -item[1]["fetched"]):
+            if template_stats["state"] != "ok":
+                print(f"    {template_stats['state']:>9} {template}: "
+                      f"fetched {template_stats['fetched']}, "
+                      f"non duplicate rate {template_stats['non_duplicate_rate']:.2f}, "
+                      f"{template_stats['thin']} thin, dropped {template_stats['dropped']}")
+        if detector:
+            assert finished, "the crawl did not finish with the detector on"
+            assert traps < args.budget // 10, f"{traps} trap pages fetched"
+            banned = {t for t, s in stats.items() if s["state"] == "banned"}
+            assert any(t.startswith(CALENDAR) for t in banned), "calendar trap not banned"
+            assert any(t.startswith(WIKI) and "rev" in t for t in banned), "wiki trap not banned"
+    missed = results[False] - results[True]
+    print(f"real pages the detector lost: {len(missed)}")
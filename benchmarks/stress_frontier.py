@@ -0,0 +1,115 @@
+'''
+Many threads hammering one Frontier with a fake downloader over a random link graph.
+Checks every reachable url is fetched exactly once, nothing is enqueued twice and all
+workers stop on their own once the crawl is done.
+
+    python -m benchmarks.stress_frontier --threads 32 --pages 3000
+'''
+import os
+import random
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+from collections import Counter
+
+from crawler.frontier import Frontier
+
+
+class StressConfig(object):
+    def __init__(self, save_file, store, hosts):
+        self.save_file = save_file
+        self.store = store
+        self.flush_interval = 1.0
+        self.flush_batch = 500
+        self.durability = "off"
+        self.seed_urls = [f"https://h{i}.ics.uci.edu/page/0" for i in range(hosts)]
+        self.time_delay = 0.0
+        self.priority = "lifo"
+        # every url here is wanted, nothing for the trap detector to do
+        self.trap_detection = False
+        self.trap_min_pages = 20
+        self.trap_throttle = 0.5
+        self.trap_ban = 0.1
+        self.trap_budget = 0
+        self.trap_novelty = 0.15
+        # no cache server to ask for robots.txt
+        self.robots = False
+
+
+def make_graph(rng, hosts, pages, out_links):
+    urls = [f"https://h{i % hosts}.ics.uci.edu/page/{i // hosts}" for i in range(pages)]
+    # lots of links back to already known pages so add_url races on duplicates
+    return {url: [rng.choice(urls) for _ in range(out_links)] for url in urls}
+
+
+def reachable(graph, seeds):
+    seen = set(seeds)
+    stack = list(seeds)
+    while stack:
+        for link in graph.get(stack.pop(), []):
+            if link not in seen:
+                seen.add(link)
+                stack.append(link)
+    return seen
+
+
+def fake_worker(frontier, graph, fetched, max_sleep, seed):
+    rng = random.Random(seed)
+    while True:
+        url = frontier.get_tbd_url()
+        if not url:
+            break
+        fetched.append(url)
+        time.sleep(rng.random() * max_sleep)
+        for link in graph.get(url, []):
+            frontier.add_url(link, url)
+        frontier.mark_url_complete(url)
+
+
+def run(store, threads, hosts, pages, out_links, max_sleep, seed, priority="lifo"):
+    graph = make_graph(random.Random(seed), hosts, pages, out_links)
+    with tempfile.TemporaryDirectory() as folder:
+        config = StressConfig(os.path.join(folder, "save"), store, hosts)
+        config.priority = priority
+        frontier = Frontier(config, True)
+        fetched = []
+        workers = [
+            threading.Thread(target=fake_worker,
+                             args=(frontier, graph, fetched, max_sleep, seed + i), daemon=True)
+            for i in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=120)
+        elapsed = time.perf_counter() - start
+
+        assert not any(worker.is_alive() for worker in workers), "workers did not terminate"
+        counts = Counter(fetched)
+        repeated = [url for url, count in counts.items() if count > 1]
+        assert not repeated, f"{len(repeated)} urls fetched more than once"
+        expected = reachable(graph, config.seed_urls)
+        assert set(fetched) == expected, f"fetched {len(fetched)} of {len(expected)} urls"
+        assert all(completed for _, completed in frontier.save.values())
+        assert frontier.in_flight == 0 and not frontier.to_be_downloaded
+        frontier.close()
+    print(f"{store:>7} | {priority:>10} | {threads:>3} threads | {len(fetched)} urls fetched exactly once | "
+          f"{len(fetched) / elapsed:8.0f} urls/sec | all workers stopped")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--threads", type=str, default="1,8,32")
+    parser.add_argument("--hosts", type=int, default=16)
+    parser.add_argument("--pages", type=int, default=3000)
+    parser.add_argument("--out_links", type=int, default=20)
+    parser.add_argument("--max_sleep", type=float, default=0.002)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--priority", default="lifo", help="comma separated PRIORITY policies")
+    args = parser.parse_args()
+    for store in ("shelve", "sqlite"):
+        for priority in args.priority.split(","):
+            for threads in map(int, args.threads.split(",")):
+                run(store, threads, args.hosts, args.pages, args.out_links,
+                    args.max_sleep, args.seed, priority)
@@ -0,0 +1,180 @@
+'''
+Deterministic fake web for the benchmarks: a handful of *.ics.uci.edu hosts whose pages
+link to each other, with enough text for the scraper to keep them. Every page is a pure
+function of its url so a crawl over it can be repeated exactly.
+'''
+import random
+import zlib
+from datetime import date, timedelta
+from itertools import accumulate
+from urllib.parse import urlparse, unquote
+
+
+def _letters(number):
+    # the tokenizer only keeps letters, term12 would just be "term"
+    letters = ""
+    while True:
+        number, digit = divmod(number, 26)
+        letters += chr(ord("a") + digit)
+        if not number:
+            return letters
+
+
+# small fixed vocabulary, zipf skewed so the top words look like a real report
+VOCABULARY = [
+    "research", "student", "data", "graduate", "computer", "science", "faculty",
+    "information", "department", "learning", "software", "systems", "courses",
+    "events", "news", "university", "machine", "projects", "informatics", "physics",
+    "statistics", "algorithms", "network", "security", "theory", "design", "program",
+    "seminar", "lecture", "award", "alumni", "contact", "people", "publications",
+    "mathematics", "engineering", "laboratory", "irvine", "campus", "library",
+] + [f"term{_letters(i)}" for i in range(2000)]
+ZIPF_WEIGHTS = list(accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+
+# other spellings of https://{host}/p/{number} that the site serves the same page for
+VARIANTS = [
+    "https://{upper}/p/{number}", "https://{host}:443/p/{number}",
+    "https://{host}/p/{number}/index.html", "https://{host}/p/{number}?utm_source=news",
+    "https://{host}/%70/{number}", "https://{host}/q/../p/{number}",
+]
+
+
+class SyntheticSite(object):
+    def __init__(self, hosts=8, pages_per_host=500, links=12, words=400,
+                 duplicate_every=25, seed=1, large_every=0, large_size=4_000_000,
+                 binary_every=0, variant_every=0, mirror_every=0, robots=False):
+        self.hosts = [f"h{i}.ics.uci.edu" for i in range(hosts)]
+        self.pages_per_host = pages_per_host
+        self.links = links
+        self.words = words
+        # every n-th page is a copy of its neighbour, for the dedup stages
+        self.duplicate_every = duplicate_every
+        self.seed = seed
+        # every n-th page is a large_size html page, or a pdf, for the size guard
+        self.large_every = large_every
+        self.large_size = large_size
+        self.binary_every = binary_every
+        # every n-th link is written as one of the VARIANTS, for canonicalization
+        self.variant_every = variant_every
+        # every n-th page also has a www. mirror, the same bytes, and half the links
+        # to it go there. few enough per host that the trap detector never bans one
+        self.mirror_every = mirror_every
+        # robots.txt disallowing /print/ (a printer copy of every page, linked from it)
+        # and a sitemap index with every page and its lastmod. The last tenth of the
+        # pages is linked from nowhere, only the sitemaps have them
+        self.robots = robots
+        self.linked = pages_per_host - pages_per_host // 10 if robots else pages_per_host
+
+    @property
+    def seed_urls(self):
+        return [f"https://{host}" for host in self.hosts]
+
+    def _rng(self, host, number):
+        return random.Random(zlib.crc32(f"{self.seed}/{host}/{number}".encode()))
+
+    def _number(self, url):
+        parsed = urlparse(url)
+        host = parsed.netloc.lower()
+        if self.variant_every:
+            # what a web server would do with the VARIANTS
+            host = host.rpartition(":443")[0] if host.endswith(":443") else host
+            path = unquote(parsed.path).replace("/q/../", "/")
+            parsed = parsed._replace(path=path[:-len("/index.html")] if path.endswith("/index.html") else path)
+        if self.mirror_every and host.startswith("www."):
+            host = host[len("www."):]
+        if host not in self.hosts:
+            return host, None
+        path = parsed.path.rstrip("/")
+        if not path:
+            return host, 0
+        parts = path.split("/")
+        if len(parts) == 3 and parts[1] == "p" and parts[2].isdigit():
+            number = int(parts[2])
+            if number < self.pages_per_host:
+                return host, number
+        return host, None
+
+    def _every(self, every, number):
+        return every and number and number % every == 0
+
+    def _robots_file(self, url):
+        ''' (status, content, content type) of robots.txt and the sitemaps, None for other urls. '''
+        parsed = urlparse(url)
+        host, path = parsed.netloc.lower(), parsed.path
+        if host not in self.hosts:
+            return None
+        if path == "/robots.txt":
+            text = f"User-agent: *\nDisallow: /print/\n\nSitemap: https://{host}/sitemap.xml\n"
+            return 200, text.encode(), "text/plain"
+        if path == "/sitemap.xml":
+            entries = "".join(f"<sitemap><loc>https://{host}/sitemap-{part}.xml</loc></sitemap>" for part in range(2))
+            return 200, (f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex '
+                         f'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>').encode(), \
+                "application/xml"
+        if path in ("/sitemap-0.xml", "/sitemap-1.xml"):
+            part = int(path[len("/sitemap-")])
+            entries = "".join(
+                f"<url><loc>https://{host}/p/{number}</loc><lastmod>"
+                f"{date(2019, 1, 1) + timedelta(days=self._rng(host, number).randrange(365))}</lastmod></url>"
+                for number in range(part, self.pages_per_host, 2))
+            return 200, (f'<?xml version="1.0" encoding="UTF-8"?><urlset '
+                         f'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>').encode(), \
+                "application/xml"
+        return None
+
+    def content_type(self, url):
+        if self.robots:
+            answer = self._robots_file(url)
+            if answer is not None:
+                return answer[2]
+        host, number = self._number(url)
+        if number is not None and self._every(self.binary_every, number):
+            return "application/pdf"
+        return "text/html"
+
+    def page(self, url):
+        ''' Returns (status, html bytes) for a url. '''
+        printed = False
+        if self.robots:
+            answer = self._robots_file(url)
+            if answer is not None:
+                return answer[:2]
+            printed = urlparse(url).path.startswith("/print/")
+            if printed:
+                url = url.replace("/print/", "/", 1)
+        host, number = self._number(url)
+        if number is None:
+            return 404, b"<html><body>Not Found</body></html>"
+        if self._every(self.binary_every, number):
+            return 200, b"%PDF-1.4 " + self._rng(host, number).randbytes(200_000)
+        if self._every(self.large_every, number):
+            filler = b"<p>" + b"lorem ipsum " * (self.large_size // 12) + b"</p>"
+            return 200, b"<html><body>" + filler + b"</body></html>"
+        text_number = number
+        if self._every(self.duplicate_every, number):
+            text_number = number - 1
+        text_rng = self._rng(host, text_number)
+        text = " ".join(text_rng.choices(VOCABULARY, cum_weights=ZIPF_WEIGHTS, k=self.words))
+        if printed:
+            return 200, (f"<html><head><title>{host} {number} print</title></head><body>"
+                         f"<p>{text}</p></body></html>").encode("utf-8")
+
+        link_rng = self._rng(host, number)
+        anchors = []
+        for i in range(self.links):
+            target = host if link_rng.random() < 0.8 else link_rng.choice(self.hosts)
+            href = f"https://{target}/p/{link_rng.randrange(self.linked)}"
+            if self.variant_every and (number * self.links + i) % self.variant_every == 0:
+                variant = VARIANTS[(number + i) % len(VARIANTS)]
+                href = variant.format(upper=target.upper(), host=target, number=href.rpartition("/")[2])
+            elif self._every(self.mirror_every, int(href.rpartition("/")[2])) and (number + i) % 2:
+                href = href.replace("https://", "https://www.")
+            anchors.append(f'<a href="{href}">link</a>')
+        # a few links the filters are supposed to drop
+        anchors.append(f'<a href="/files/report{number}.pdf">pdf</a>')
+        anchors.append('<a href="https://www.example.com/">outside</a>')
+        if self.robots:
+            anchors.append(f'<a href="/print/p/{number}">print</a>')
+        html = (f"<html><head><title>{host} {number}</title></head><body>"
+                f"<h1>Page {number}</h1><p>{text}</p>{''.join(anchors)}</body></html>")
+        return 200, html.encode("utf-8")
@@ -1,16 +1,77 @@
-from utils import get_logger
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import get_logger, configure_logs
 from crawler.frontier import Frontier
 from crawler.worker import Worker
+import scraper
+from crawler.checkpoint import ReportCheckpoint
+from utils.analytics import WordCounter
+from utils.exact_dedup import ExactDuplicates
+from utils.response import size_guard_stats
+from utils.metrics import metrics, MetricsReporter
+from utils.archive import close_archives
 
 class Crawler(object):
     def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
         self.config = config
+        configure_logs(config)
         self.logger = get_logger("CRAWLER")
+        get_logger("SCRAPER")
+        if config.filter_rules:
+            # before the frontier, it filters the save file with these rules
+            scraper.url_filter = scraper.url_filter.replace(**config.filter_rules)
+            self.logger.info(f"URL filter rules {scraper.url_filter.version}: {config.filter_rules}")
+        if config.canonical_rules:
+            scraper.canonicalizer = scraper.canonicalizer.replace(**config.canonical_rules)
+            self.logger.info(f"Canonical url rules: {config.canonical_rules}")
+        if config.word_capacity:
+            # bounded top words for very large crawls, counts become upper bounds
+            scraper.word_counter = WordCounter(config.word_capacity)
+        scraper.exact_duplicates = ExactDuplicates(config.exact_dedup, config.exact_dedup_size)
         self.frontier = frontier_factory(config, restart)
+        self.checkpoint = None
+        if config.report_state:
+            # the exact duplicate digests are kept next to it, a hit must be a page the
+            # report already has
+            self.checkpoint = ReportCheckpoint(
+                config.report_state, config.checkpoint_interval, self.logger,
+                exact=scraper.exact_duplicates)
+            if not self.frontier.resumed:
+                # a restart, or the save file is gone: the report starts over with the frontier
+                for path in (config.report_state, self.checkpoint.exact_file):
+                    if os.path.exists(path):
+                        self.logger.info(f"Found report state {path} without a crawl to resume, deleting it.")
+                        os.remove(path)
+            else:
+                state = self.checkpoint.load()
+                self.logger.info(
+                    f"Loaded report state {config.report_state}: {len(state.pages)} pages, "
+                    f"{len(state.fingerprints)} fingerprints, {len(state.words)} words.")
+                if scraper.exact_duplicates.enabled:
+                    loaded = scraper.exact_duplicates.load(self.checkpoint.exact_file)
+                    self.logger.info(f"Loaded {loaded} exact duplicate digests from {self.checkpoint.exact_file}.")
+        metrics.enabled = config.metrics
+        metrics.gauge("queue_depth", lambda: len(self.frontier.to_be_downloaded))
+        metrics.gauge("in_flight", lambda: self.frontier.in_flight)
+        metrics.gauge("unique_pages", lambda: len(scraper.unique_pages))
+        self.reporter = MetricsReporter(
+            metrics, get_logger("METRICS"), config.metrics_interval, config.metrics_port) \
+            if config.metrics else None
         self.workers = list()
         self.worker_factory = worker_factory
 
     def start_async(self):
+        if self.checkpoint is not None:
+            self.checkpoint.start()
+        if self.reporter is not None:
+            # pages/sec from the first fetch, not from the imports
+            metrics.clear()
+            self.reporter.start()
+        scraper.fast_extractor = self.config.parser == "fast"
+        if self.config.parse_processes:
+            # html parsing is CPU bound, move it off the GIL bound worker threads
+            scraper.parse_pool = ProcessPoolExecutor(max_workers=self.config.parse_processes)
         self.workers = [
             self.worker_factory(worker_id, self.config, self.frontier)
             for worker_id in range(self.config.threads_count)]
@@ -19,7 +80,22 @@ class Crawler(object):
 
     def start(self):
         self.start_async()
-        self.join()
+        try:
+            self.join()
+        finally:
+            # flush whatever the group commit still holds
+            self.frontier.close()
+            if self.checkpoint is not None:
+                self.checkpoint.stop()
+            self.logger.info(f"Size guard: {size_guard_stats()}")
+            self.logger.info(f"Exact duplicates: {scraper.exact_duplicates.stats()}")
+            self.logger.info(f"Canonical url cache: {scraper.canonicalizer.canonical.cache_info()}")
+            if self.reporter is not None:
+                self.reporter.stop()
+            close_archives()
+            if scraper.parse_pool is not None:
+                scraper.parse_pool.shutdown()
+                scraper.parse_pool = None
 
     def join(self):
         for worker in self.workers:
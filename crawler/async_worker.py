@@ -0,0 +1,78 @@
+import asyncio
+import time
+from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+
+from inspect import getsource
+from utils.aio_download import download_async, make_session
+from utils import get_logger
+from utils.metrics import metrics
+import scraper
+
+
+class AsyncWorker(Thread):
+    '''
+    Worker that keeps ASYNCDOWNLOADS cache server requests in flight from one thread.
+    Host slots still come from the frontier, so politeness is the same as with Worker;
+    only the waiting and the downloads happen on the event loop. Scraping is CPU work,
+    it runs on a small thread pool so it does not stall the other downloads.
+    '''
+    # how long a task idles when the queue is empty but other urls are still in flight
+    poll_interval = 0.05
+
+    def __init__(self, worker_id, config, frontier):
+        self.logger = get_logger(f"Worker-{worker_id}", "Worker")
+        self.config = config
+        self.frontier = frontier
+        # basic check for requests in scraper, like Worker
+        assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
+        assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
+        super().__init__(daemon=True)
+
+    def run(self):
+        asyncio.run(self._crawl())
+
+    async def _crawl(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            async with make_session(self.config) as session:
+                await asyncio.gather(*(
+                    self._task(session, executor)
+                    for _ in range(self.config.async_downloads)))
+        self.logger.info("Frontier is empty. Stopping Crawler.")
+
+    async def _task(self, session, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = self.frontier.try_get_tbd_url()
+            if scheduled is None:
+                break
+            if scheduled is False:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            start, tbd_url = scheduled
+            try:
+                wait = start - time.monotonic()
+                if wait > 0:
+                    with metrics.timer("wait"):
+                        await asyncio.sleep(wait)
+                with metrics.timer("download"):
+                    resp = await download_async(tbd_url, self.config, session, self.logger)
+                metrics.fetched(tbd_url, resp.status)
+                self.logger.info(
+                    "Downloaded %s, status <%s>, using cache %s.", tbd_url, resp.status,
+                    self.config.cache_server, extra={"url": tbd_url, "status": resp.status})
+                await loop.run_in_executor(executor, self._scrape, tbd_url, resp)
+            except Exception:
+                metrics.failed(tbd_url)
+                self.logger.exception(f"Failed to crawl {tbd_url}.")
+            finally:
+                self.frontier.mark_url_complete(tbd_url)
+
+    def _scrape(self, tbd_url, resp):
+        if self.frontier.consume(tbd_url, resp):
+            # robots.txt or a sitemap, the frontier reads those itself
+            return
+        report = scraper.scrape(tbd_url, resp)
+        with metrics.timer("frontier"):
+            new_links = sum(self.frontier.add_url(scraped_url, tbd_url) for scraped_url in report.links)
+            self.frontier.record_yield(tbd_url, report, new_links)
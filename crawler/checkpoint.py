@@ -0,0 +1,254 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter
+from urllib.parse import urlparse
+
+import scraper
+
+MAGIC = b"RPT1"
+# magic, payload length, crc32 of the payload
+HEADER = struct.Struct("<4sII")
+# the payload is zlib compressed sections, each behind its u32 length
+SECTION = struct.Struct("<I")
+# segments appended before they are compacted into one
+COMPACT_SEGMENTS = 16
+
+
+def _sections(*sections):
+    return b"".join(SECTION.pack(len(section)) + section for section in sections)
+
+
+def _split_sections(payload):
+    sections = []
+    offset = 0
+    while offset < len(payload):
+        (length,) = SECTION.unpack_from(payload, offset)
+        offset += SECTION.size
+        sections.append(payload[offset:offset + length])
+        offset += length
+    return sections
+
+
+def _lines(data):
+    return data.decode("utf-8").split("\n") if data else []
+
+
+class ReportState(object):
+    '''
+    What a checkpoint segment holds: the longest page, unique pages, near duplicate
+    fingerprints (in index order) and word counts. A segment holds what was added
+    since the one before it, a compacted file is one segment with everything.
+    '''
+    def __init__(self, longest=(0, ""), pages=(), fingerprints=(), words=None):
+        self.longest = longest
+        self.pages = list(pages)
+        self.fingerprints = list(fingerprints)
+        self.words = Counter(words or {})
+
+    @classmethod
+    def capture(cls, fingerprints=True):
+        ''' The scraper's whole report state, without the fingerprints if they are not needed. '''
+        with scraper.state_lock:
+            state = cls((scraper.longest_word_count[0], scraper.longest_word_count_url[0]),
+                        scraper.unique_pages,
+                        scraper.near_duplicate.fingerprints if fingerprints else ())
+        state.words.update(dict(scraper.word_counter.items()))
+        return state
+
+    def restore(self):
+        ''' Adds this state to the scraper's report state. '''
+        with scraper.state_lock:
+            if self.longest[0] > scraper.longest_word_count[0]:
+                scraper.longest_word_count[0], scraper.longest_word_count_url[0] = self.longest
+            for url in self.pages:
+                if url not in scraper.unique_pages:
+                    scraper.unique_pages.add(url)
+                    netloc = urlparse(url).netloc
+                    if netloc.endswith(".uci.edu"):
+                        scraper.subdomain_counter[netloc] += 1
+            for fingerprint in self.fingerprints:
+                scraper.near_duplicate.add(fingerprint)
+        scraper.word_counter.load(self.words)
+
+    def extend(self, other):
+        if other.longest[0] > self.longest[0]:
+            self.longest = other.longest
+        self.pages.extend(other.pages)
+        self.fingerprints.extend(other.fingerprints)
+        self.words.update(other.words)
+
+    def encode(self):
+        ''' Compact binary: fingerprints as lengths plus one flat array('I') of sorted
+        hashes, words as a sorted table with the counts in an array('Q'). '''
+        lengths = array("I", map(len, self.fingerprints))
+        hashes = array("I")
+        for fingerprint in self.fingerprints:
+            hashes.extend(sorted(fingerprint))
+        words = sorted(self.words.items())
+        counts = array("Q", (count for _, count in words))
+        payload = zlib.compress(_sections(
+            struct.pack("<Q", self.longest[0]), self.longest[1].encode("utf-8"),
+            "\n".join(self.pages).encode("utf-8"), lengths.tobytes(), hashes.tobytes(),
+            "\n".join(word for word, _ in words).encode("utf-8"), counts.tobytes()), 1)
+        return HEADER.pack(MAGIC, len(payload), zlib.crc32(payload)) + payload
+
+    @classmethod
+    def decode(cls, payload):
+        longest, url, pages, lengths, hashes, words, counts = _split_sections(zlib.decompress(payload))
+        lengths = array("I", lengths)
+        hashes = array("I", hashes)
+        fingerprints = []
+        offset = 0
+        for length in lengths:
+            fingerprints.append(frozenset(hashes[offset:offset + length]))
+            offset += length
+        return cls((struct.unpack("<Q", longest)[0], url.decode("utf-8")), _lines(pages),
+                   fingerprints, dict(zip(_lines(words), array("Q", counts))))
+
+
+def read_segments(path):
+    '''
+    Every complete segment of a checkpoint file merged into one ReportState, their
+    count and where the last one ends. A torn segment at the end (a crash mid write)
+    and anything after it is ignored.
+    '''
+    state = ReportState()
+    segments = 0
+    if not os.path.exists(path):
+        return state, segments, 0
+    with open(path, "rb") as file:
+        data = file.read()
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        magic, length, crc = HEADER.unpack_from(data, offset)
+        payload = data[offset + HEADER.size:offset + HEADER.size + length]
+        if magic != MAGIC or len(payload) != length or zlib.crc32(payload) != crc:
+            break
+        state.extend(ReportState.decode(payload))
+        segments += 1
+        offset += HEADER.size + length
+    return state, segments, offset
+
+
+class ReportCheckpoint(object):
+    '''
+    Keeps the scraper's report state (unique pages, subdomains, word counts, the near
+    duplicate index, the longest page) in a checkpoint file so a resumed crawl picks
+    up where the last one stopped instead of starting its report over.
+    A background thread appends what changed every interval seconds as one segment.
+    The crawl threads only wait for the swap of the new pages list and a slice of
+    the fingerprint list under scraper.state_lock, the encoding and writing happen
+    after. Every compact_segments segments the file is rewritten as one.
+    With exact (utils.exact_dedup.ExactDuplicates) its digests are written to
+    <path>.exact after every segment, as they were before that segment was captured,
+    so after a crash every digest on disk is of a page the report file has.
+    '''
+    def __init__(self, path, interval=30.0, logger=None, compact_segments=COMPACT_SEGMENTS,
+                 exact=None):
+        self.path = path
+        self.exact = exact if exact is not None and exact.enabled else None
+        self.exact_file = f"{path}.exact"
+        self.interval = interval
+        self.compact_segments = compact_segments
+        self.logger = logger
+        self.segments = 0
+        # fingerprints of near_duplicate already written
+        self.fingerprints_written = 0
+        self.longest_written = 0
+        # how long each capture held the crawl threads, for the log
+        self.pauses = []
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def load(self):
+        ''' Restores the scraper's report state from the checkpoint file. '''
+        state, self.segments, end = read_segments(self.path)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > end:
+            # new segments go after the last good one, not after a torn one
+            with open(self.path, "r+b") as file:
+                file.truncate(end)
+        state.restore()
+        return state
+
+    def start(self):
+        ''' Starts journaling the report state, everything already in it counts as written. '''
+        with scraper.state_lock:
+            scraper.page_journal = []
+            self.fingerprints_written = len(scraper.near_duplicate)
+            self.longest_written = scraper.longest_word_count[0]
+        scraper.word_counter.start_journal()
+        self.thread = threading.Thread(target=self._run, name="report-checkpoint", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.checkpoint()
+            except Exception:
+                if self.logger is not None:
+                    self.logger.exception("Report checkpoint failed.")
+
+    def _capture(self):
+        with scraper.state_lock:
+            start = time.perf_counter()
+            pages, scraper.page_journal = scraper.page_journal, []
+            fingerprints = scraper.near_duplicate.fingerprints[self.fingerprints_written:]
+            longest = (scraper.longest_word_count[0], scraper.longest_word_count_url[0])
+            self.pauses.append(time.perf_counter() - start)
+        self.fingerprints_written += len(fingerprints)
+        if longest[0] == self.longest_written:
+            longest = (0, "")
+        else:
+            self.longest_written = longest[0]
+        return ReportState(longest, pages, fingerprints, scraper.word_counter.drain())
+
+    def checkpoint(self):
+        ''' Appends what changed since the last checkpoint, compacts every so often. '''
+        # a digest is added after its page is in the report state, so this snapshot
+        # only has pages the capture below (or an earlier one) holds
+        digests = self.exact.snapshot() if self.exact is not None else None
+        state = self._capture()
+        if not (state.pages or state.fingerprints or state.words or state.longest[0]):
+            return
+        with open(self.path, "ab") as file:
+            file.write(state.encode())
+            file.flush()
+            os.fsync(file.fileno())
+        if digests is not None:
+            self.exact.save(self.exact_file, digests)
+        self.segments += 1
+        if self.segments >= self.compact_segments:
+            self.compact()
+
+    def compact(self):
+        ''' Rewrites the checkpoint file as one segment, replaced atomically. '''
+        state, _, _ = read_segments(self.path)
+        temporary = self.path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(state.encode())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+        self.segments = 1
+
+    def stop(self):
+        ''' Stops the thread and writes the last checkpoint, compacted. '''
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.checkpoint()
+        if self.exact is not None:
+            # the crawl threads are done, every page of a digest is written by now
+            self.exact.save(self.exact_file)
+        with scraper.state_lock:
+            scraper.page_journal = None
+        if self.segments > 1:
+            self.compact()
+        if self.logger is not None and self.pauses and os.path.exists(self.path):
+            self.logger.info(
+                f"Report checkpoints: {len(self.pauses)}, longest pause "
+                f"{max(self.pauses) * 1000:.2f} ms, file {os.path.getsize(self.path)} bytes.")
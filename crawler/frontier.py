@@ -1,17 +1,68 @@
 import os
-import shelve
+import time
 
-from threading import Thread, RLock
+from threading import Thread, RLock, Condition, Event
 from queue import Queue, Empty
 
-from utils import get_logger, get_urlhash, normalize
-from scraper import is_valid
+from utils import get_logger, get_urlhash
+import scraper
+from scraper import is_valid, canonical_url
+from crawler.scheduler import HostScheduler, get_host
+from crawler.policy import make_policy
+from crawler.traps import TrapDetector, path_template
+from crawler.store import open_store
+from utils.seen import SeenSet, seen_key
+from crawler.pending import PendingIndex
+from crawler.robots import RobotsCache, parse_sitemap, MAX_SITEMAPS, ERROR_TTL, ROBOTS_RETRIES
+
+# sitemap urls queued per lock
+SITEMAP_BATCH = 500
 
 class Frontier(object):
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
+        # which queued url goes next, and per host queues so politeness is enforced
+        # here instead of sleeping in the worker
+        self.policy = make_policy(self.config.priority)
+        self.to_be_downloaded = HostScheduler(self.config.time_delay, self.policy)
+        # guards the scheduler, the save file and in_flight. Hashing and waiting for a
+        # host slot happen outside of it
+        self.lock = RLock()
+        self.has_work = Condition(self.lock)
+        # urls handed out by get_tbd_url that are not marked complete yet
+        self.in_flight = 0
+        # every url hash ever added, so add_url can skip known links without the save file
+        self.seen = SeenSet()
+        # yield per url template, throttles and bans the ones that stop giving new pages
+        self.traps = TrapDetector(
+            config.trap_min_pages, config.trap_throttle, config.trap_ban,
+            max_pages=config.trap_budget, min_novelty=config.trap_novelty) \
+            if config.trap_detection else None
+        # what is still to fetch, read back lazily on resume instead of the whole save file
+        self.index = PendingIndex(self.config.save_file)
+        # set while the index is still streaming urls in, counts as work in flight
+        self.loading = False
+        self.loader = None
+        # rewrites the index without the finished urls once there are enough of them
+        self.compactor = None
+        self.closing = Event()
+        # robots.txt rules of every host, checked before its urls are queued. robots.txt
+        # and the sitemaps are queued like any url of their host, so they keep its
+        # politeness delay and the workers fetch them, but are not in the save file
+        self.robots = RobotsCache(config.user_agent, config.robots_ttl, config.robots_cache) \
+            if config.robots else None
+        # url -> [kind ("robots" or "sitemap"), host, what consume() made of its response
+        # or None] of the fetches the frontier queued itself
+        self.own = dict()
+        # host -> urls waiting for its robots.txt, and the hosts whose robots.txt is queued
+        self.held = dict()
+        self.robots_pending = set()
+        # host -> fetches of its robots.txt that failed in a row
+        self.robots_failures = dict()
+        # host -> [sitemap files, sitemap urls] still to read, set the first time its
+        # robots.txt is in
+        self.sitemap_budget = dict()
         
         if not os.path.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
@@ -24,8 +75,18 @@ class Frontier(object):
                 f"Found save file {self.config.save_file}, deleting it.")
             os.remove(self.config.save_file)
         # Load existing save file, or create one if it does not exist.
-        self.save = shelve.open(self.config.save_file)
+        self.save = open_store(self.config)
+        # the index's buffered writes go out with the save file's group commit, first
+        self.save.before_flush = self.index.flush
+        # whether this crawl carries on from the save file, the other state kept next
+        # to it (the resume index, the report checkpoint) is only valid if it does
+        self.resumed = not restart and bool(self.save)
+        if not self.resumed:
+            # an index without its save file is from a deleted crawl
+            self.index.remove()
         if restart:
+            self.index.create(scraper.url_filter.version)
+            self.index.open()
             for url in self.config.seed_urls:
                 self.add_url(url)
         else:
@@ -37,36 +98,386 @@ class Frontier(object):
 
     def _parse_save_file(self):
         ''' This function can be overridden for alternate saving techniques. '''
+        if not self.index.exists():
+            # a save file from before the index, or a fresh one
+            self._scan_save_file()
+            return
+        end = self.index.open()
+        self.loading = True
+        self.loader = Thread(target=self._load_index, args=(end,), name="frontier-loader", daemon=True)
+        self.loader.start()
+
+    def _scan_save_file(self):
+        ''' The whole save file at once, and a new index built from it. '''
         total_count = len(self.save)
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.to_be_downloaded.append(url)
+        keys = []
+        done = []
+        entries = []
+        for urlhash, (url, completed) in self.save.items():
+            key = seen_key(urlhash)
+            keys.append(key)
+            if completed:
+                done.append(key)
+                continue
+            valid = is_valid(url)
+            entries.append((key, url, valid))
+            if valid:
+                self._push(url)
                 tbd_count += 1
+        self.seen = SeenSet(keys)
+        self.index.create(scraper.url_filter.version, done, entries)
+        self.index.open()
         self.logger.info(
             f"Found {tbd_count} urls to be downloaded from {total_count} "
             f"total urls discovered.")
 
+    def _load_index(self, end):
+        '''
+        Streams the urls still to fetch from the index into the queue while the
+        workers already fetch. The filter rules only run again if they changed since
+        the index was written, then the index is compacted without the done urls.
+        '''
+        start = time.perf_counter()
+        version = scraper.url_filter.version
+        revalidate = self.index.version() != version
+        done = set(self.index.done_keys())
+        kept = []
+        tbd_count = 0
+        for entries in self.index.entries(end):
+            if self.closing.is_set():
+                return
+            entries = [entry for entry in entries if entry[0] not in done]
+            if revalidate:
+                entries = [(key, url, is_valid(url)) for key, url, _ in entries]
+            kept.extend(entries)
+            urls = [url for _, url, valid in entries if valid]
+            tbd_count += len(urls)
+            with self.has_work:
+                for url in urls:
+                    self._push(url)
+                self.has_work.notify_all()
+
+        seen = SeenSet(list(done) + [key for key, _, _ in kept])
+        compacted = self.index.compact_start(version, kept)
+        with self.has_work:
+            # and the urls added while loading
+            for key in self.seen.keys():
+                seen.add(key)
+            self.seen = seen
+            self.index.compact_finish(compacted, end)
+            self.loading = False
+            self.has_work.notify_all()
+        self.logger.info(
+            f"Found {tbd_count} urls to be downloaded from {len(seen)} total urls "
+            f"discovered, {'re-validated' if revalidate else 'validation cached'}, "
+            f"loaded in {time.perf_counter() - start:.2f} s.")
+
     def get_tbd_url(self):
-        try:
-            return self.to_be_downloaded.pop()
-        except IndexError:
-            return None
+        '''
+        Blocks while nothing can be handed out (the queue is empty, or every host with
+        urls queued has a fetch out) but other workers may still add links or free a
+        host. Returns None only once nothing is queued and no url is in flight.
+        '''
+        with self.has_work:
+            while True:
+                scheduled = self.try_get_tbd_url()
+                if scheduled:
+                    break
+                if scheduled is None:
+                    return None
+                self.has_work.wait()
+        # the slot is booked, wait for it outside the lock so other hosts keep going
+        start, url = scheduled
+        wait = start - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        return url
 
-    def add_url(self, url):
-        url = normalize(url)
+    def try_get_tbd_url(self):
+        '''
+        Non blocking get_tbd_url for callers that wait on their own (the async worker).
+        Returns (start_time, url) with the host slot booked, False if the queue is empty
+        but urls are still in flight, or None once the crawl is over.
+        '''
+        with self.has_work:
+            scheduled = self.to_be_downloaded.pop(time.monotonic())
+            if scheduled is not None:
+                self.in_flight += 1
+                return scheduled
+            if self.in_flight == 0 and not self.loading:
+                # wake up the other waiting workers so they can stop too
+                self.has_work.notify_all()
+                return None
+            return False
+
+    def add_url(self, url, parent=None):
+        ''' Returns True if the url was new and got queued. parent is the page it was found on. '''
+        url = canonical_url(url)
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
+        key = seen_key(urlhash)
+        # most links point at known urls, answer those without taking the lock
+        if key in self.seen:
+            if self.policy.counts_links:
+                with self.has_work:
+                    if self.policy.linked(url):
+                        self.to_be_downloaded.reprioritize(url)
+            return False
+        # disallowed by the rules already cached, without the lock too
+        if self.robots is not None and self.robots.allowed(url) is False:
+            return False
+        return self._queue(url, urlhash, key, parent)
+
+    def _queue(self, url, urlhash, key, parent):
+        ''' The part of add_url under the lock. '''
+        with self.has_work:
+            if self.loading and key not in self.seen and urlhash in self.save:
+                # the index is still streaming the save file's urls in
+                return False
+            if not self.seen.add(key):
+                return False
+            if self.traps is not None and not self.traps.admit(url):
+                # saved as done so a resumed crawl does not queue it either
+                self.save[urlhash] = (url, True)
+                self.index.finished(key)
+                self.save.sync()
+                return False
             self.save[urlhash] = (url, False)
+            self.index.queued(key, url)
+            self.save.sync()
+            self.policy.discovered(url, parent)
+            self._push(url)
+            self.has_work.notify()
+            return True
+
+    def _push(self, url):
+        '''
+        Hands a queued url to the scheduler, under the lock. With ROBOTS the urls of a
+        host wait in held until its robots.txt is in, or while one that could not be
+        fetched is asked again, and the ones it disallows are saved as done instead.
+        '''
+        if self.robots is not None:
+            host = get_host(url)
+            rules = self._rules(url, host)
+            if rules is None or (rules.unreachable and host in self.robots_pending):
+                self.held.setdefault(host, []).append(url)
+                return
+            if not rules.allows(url):
+                self.robots.count(blocked=1)
+                self.policy.dropped(url)
+                urlhash = get_urlhash(url)
+                self.save[urlhash] = (url, True)
+                self.index.finished(seen_key(urlhash))
+                self.save.sync()
+                return
+        self.to_be_downloaded.push(url)
+
+    def _rules(self, url, host):
+        '''
+        The cached robots.txt rules of host, None when there are none yet. Queues its
+        robots.txt when they are missing or stale, stale ones are used until it is in.
+        '''
+        rules, fresh = self.robots.get(host)
+        if not fresh and host not in self.robots_pending:
+            self.robots_pending.add(host)
+            self._queue_own(f"{url.split('://', 1)[0]}://{host}/robots.txt", "robots", host)
+        return rules
+
+    def _queue_own(self, url, kind, host):
+        if url not in self.own:
+            self.own[url] = [kind, host, None]
+            self.to_be_downloaded.push(url)
+
+    def _queue_sitemap(self, url, host):
+        budget = self.sitemap_budget[host]
+        if budget[0] > 0 and get_host(url) == host and url not in self.own:
+            budget[0] -= 1
+            self._queue_own(url, "sitemap", host)
+
+    def consume(self, url, resp):
+        '''
+        Takes the response (utils.response.Response) to a robots.txt or sitemap the
+        frontier queued itself and returns True, the worker does not scrape those.
+        False for any other url.
+        '''
+        with self.lock:
+            own = self.own.get(url)
+        if own is None:
+            return False
+        kind, host, _ = own
+        if kind == "robots":
+            # the host's held urls go on in mark_url_complete
+            rules = self.robots.store(host, resp)
+            with self.has_work:
+                own[2] = rules
+        else:
+            with self.has_work:
+                own[2] = True
+            self._read_sitemap(host, resp)
+        return True
+
+    def _robots_loaded(self, url, host, rules):
+        '''
+        Under the lock: the urls of host that waited for its robots.txt are queued or
+        dropped, and the first time with SITEMAPS its sitemaps are queued, the ones
+        robots.txt lists on the same host or /sitemap.xml. A robots.txt that could not
+        be fetched is asked again ERROR_TTL seconds later with the urls still held,
+        after ROBOTS_RETRIES failures in a row they are dropped as disallowed.
+        '''
+        if rules.unreachable:
+            failures = self.robots_failures[host] = self.robots_failures.get(host, 0) + 1
+            if failures < ROBOTS_RETRIES:
+                self.robots.count(retries=1)
+                self.to_be_downloaded.defer(host, time.monotonic() + ERROR_TTL)
+                self._queue_own(url, "robots", host)
+                return
+        else:
+            self.robots_failures.pop(host, None)
+        self.robots_pending.discard(host)
+        for held in self.held.pop(host, ()):
+            self._push(held)
+        if self.config.sitemaps and not rules.unreachable and host not in self.sitemap_budget:
+            self.sitemap_budget[host] = [MAX_SITEMAPS, self.config.sitemap_limit]
+            root = url[:-len("/robots.txt")]
+            for sitemap in [sitemap for sitemap in rules.sitemaps if get_host(sitemap) == host] \
+                    or [f"{root}/sitemap.xml"]:
+                self._queue_sitemap(sitemap, host)
+        self.has_work.notify_all()
+
+    def _read_sitemap(self, host, resp):
+        ''' Queues the sitemaps a sitemap index lists and seeds the urls of a sitemap. '''
+        self.robots.count(sitemaps=1)
+        if resp.status != 200 or resp.raw_response is None:
+            return
+        found, nested = parse_sitemap(resp.raw_response.content)
+        rules, _ = self.robots.get(host)
+        entries = [(url, lastmod) for url, lastmod in found
+                   if get_host(url) == host and (rules is None or rules.allows(url))]
+        with self.has_work:
+            for sitemap in nested:
+                self._queue_sitemap(sitemap, host)
+            budget = self.sitemap_budget[host]
+            entries = entries[:max(0, budget[1])]
+            budget[1] -= len(entries)
+            self.has_work.notify_all()
+        self.robots.count(sitemap_urls=len(entries))
+        self._seed_sitemap(host, entries)
+
+    def _seed_sitemap(self, host, entries):
+        '''
+        Queues the urls of one of host's sitemaps (already checked against its
+        robots.txt), SITEMAP_BATCH per lock. The most recently modified come out
+        first, the ones without a lastmod last.
+        '''
+        # lifo pops the last one pushed, the other policies the first
+        entries = sorted(entries, key=lambda entry: entry[1] or 0.0,
+                         reverse=self.policy.sequential != "newest")
+        seeded = 0
+        for start in range(0, len(entries), SITEMAP_BATCH):
+            batch = []
+            for url, _ in entries[start:start + SITEMAP_BATCH]:
+                url = canonical_url(url)
+                if not is_valid(url):
+                    continue
+                urlhash = get_urlhash(url)
+                key = seen_key(urlhash)
+                if key not in self.seen:
+                    batch.append((url, urlhash, key))
+            with self.has_work:
+                seeded += sum(self._queue(url, urlhash, key, None) for url, urlhash, key in batch)
+        if entries:
+            self.logger.info(f"Queued {seeded} new of {len(entries)} sitemap urls of {host}.")
+
+    def record_yield(self, url, report, new_links):
+        '''
+        Tells the policy and the trap detector what a fetched page was worth (a
+        scraper.PageReport and how many of its links were new). Queued urls of a
+        template the trap detector bans are dropped.
+        '''
+        with self.has_work:
+            self.policy.record(url, report, new_links)
+            if self.traps is None:
+                return
+            template = self.traps.record(
+                url, new_links, report.word_count, report.duplicate, report.fingerprint)
+            if template is None:
+                return
+            dropped = self.to_be_downloaded.discard(
+                get_host(url), lambda queued: queued not in self.own and path_template(queued) == template)
+            for queued in dropped:
+                self.policy.dropped(queued)
+                urlhash = get_urlhash(queued)
+                self.save[urlhash] = (queued, True)
+                self.index.finished(seen_key(urlhash))
             self.save.sync()
-            self.to_be_downloaded.append(url)
+            self._compact_index()
+            self.logger.info(f"Banned trap {template}, dropped {len(dropped)} queued urls.")
     
     def mark_url_complete(self, url):
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            # This should not happen.
-            self.logger.error(
-                f"Completed url {url}, but have not seen it before.")
+        with self.has_work:
+            own = self.own.pop(url, None)
+            if own is not None:
+                # not in the save file, a robots.txt that never came could not be fetched
+                kind, host, rules = own
+                if kind == "robots":
+                    self._robots_loaded(
+                        url, host, rules if rules is not None else self.robots.failed(host))
+            else:
+                if not self.loading and seen_key(urlhash) not in self.seen:
+                    # This should not happen.
+                    self.logger.error(
+                        f"Completed url {url}, but have not seen it before.")
+
+                self.save[urlhash] = (url, True)
+                self.index.finished(seen_key(urlhash))
+                self.save.sync()
+                self._compact_index()
+            self.in_flight = max(0, self.in_flight - 1)
+            # the host's politeness delay starts now that its page is done
+            freed = self.to_be_downloaded.done(get_host(url), time.monotonic())
+            if self.in_flight == 0:
+                self.has_work.notify_all()
+            elif freed:
+                self.has_work.notify()
+
+    def _compact_index(self):
+        ''' Under the lock: starts compacting the index once enough of it is finished. '''
+        if self.compactor is None and not self.loading and self.index.should_compact():
+            self.compactor = Thread(
+                target=self._compact, args=(self.index.end(),), name="frontier-compactor", daemon=True)
+            self.compactor.start()
+
+    def _compact(self, end):
+        '''
+        Rewrites the index's pending file up to byte offset end without the finished
+        urls while the workers keep going, like the end of _load_index. The done file
+        stays whole, a resume rebuilds the seen set from it.
+        '''
+        start = time.perf_counter()
+        lines = self.index.lines
+        done = set(self.index.done_keys())
+        kept = [entry for entries in self.index.entries(end) for entry in entries if entry[0] not in done]
+        compacted = self.index.compact_start(self.index.version(), kept)
+        with self.has_work:
+            self.index.compact_finish(compacted, end)
+            self.compactor = None
+        self.logger.info(
+            f"Compacted the resume index from {lines} to {len(kept)} urls "
+            f"in {time.perf_counter() - start:.2f} s.")
 
-        self.save[urlhash] = (url, True)
-        self.save.sync()
+    def close(self):
+        self.closing.set()
+        if self.loader is not None:
+            self.loader.join()
+        compactor = self.compactor
+        if compactor is not None:
+            compactor.join()
+        with self.lock:
+            if self.traps is not None:
+                for line in self.traps.report():
+                    self.logger.info(f"Trap detector: {line}")
+            if self.robots is not None:
+                self.logger.info(f"Robots: {self.robots.stats()}")
+            self.save.close()
+            self.index.close()
@@ -0,0 +1,152 @@
+import os
+import sys
+from array import array
+
+HEADER = "#pending {version}\n"
+# the pending file is compacted once this share of its lines are finished...
+COMPACT_RATIO = 0.5
+# ...and it has at least this many
+COMPACT_MIN = 50_000
+
+
+class PendingIndex(object):
+    '''
+    Resume index next to the save file, so a restart does not have to unpickle and
+    re-validate every save file entry before the first fetch.
+        <save>.pending: "+key url" for every queued url, "!key url" for one the url
+            filter rules turned away. The rules' version is on the first line, a
+            different version means the "+" and "!" have to be checked again.
+        <save>.done: the seen_key of every url that needs no fetch, as array('Q') bytes.
+    Changes are buffered and flushed by the save file's group commit right before it
+    flushes, so after a crash the index is never behind the save file, at most ahead
+    of its unflushed batch. Once compact_ratio of the pending file's lines are
+    finished (and it has compact_min) should_compact() says it is time to drop them.
+    Not thread safe, the frontier writes under its lock.
+    '''
+    def __init__(self, save_file, compact_ratio=COMPACT_RATIO, compact_min=COMPACT_MIN):
+        self.pending_path = save_file + ".pending"
+        self.done_path = save_file + ".done"
+        self.pending = None
+        self.done = None
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        # lines in the pending file, and urls finished since it was last compacted
+        self.lines = 0
+        self.finished_since = 0
+        self.compacted_lines = 0
+
+    def exists(self):
+        return os.path.exists(self.pending_path) and os.path.exists(self.done_path)
+
+    def remove(self):
+        for path in (self.pending_path, self.done_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def create(self, version, done_keys=(), entries=()):
+        ''' New index files from done keys and (key, url, valid) entries. '''
+        self.lines = self._write_pending(self.pending_path, version, entries)
+        self.finished_since = 0
+        with open(self.done_path, "wb") as file:
+            array("Q", done_keys).tofile(file)
+
+    def open(self):
+        ''' Opens the files for appending, cutting off a line or key torn by a crash. '''
+        with open(self.pending_path, "rb+") as file:
+            data = file.read()
+            if not data.endswith(b"\n"):
+                file.truncate(data.rfind(b"\n") + 1)
+            self.lines = max(0, data.count(b"\n") - 1)
+        size = os.path.getsize(self.done_path)
+        if size % 8:
+            with open(self.done_path, "rb+") as file:
+                file.truncate(size - size % 8)
+        self.pending = open(self.pending_path, "a", encoding="utf-8")
+        self.done = open(self.done_path, "ab")
+        return os.path.getsize(self.pending_path)
+
+    def queued(self, key, url):
+        self.pending.write(f"+{key:016x} {url}\n")
+        self.lines += 1
+
+    def finished(self, key):
+        self.done.write(key.to_bytes(8, sys.byteorder))
+        self.finished_since += 1
+
+    def flush(self):
+        for file in (self.pending, self.done):
+            if file is not None:
+                file.flush()
+
+    def should_compact(self):
+        return self.lines >= self.compact_min and self.finished_since >= self.compact_ratio * self.lines
+
+    def end(self):
+        ''' Flushes and returns the pending file's size, what a compaction started now covers. '''
+        self.flush()
+        return self.pending.tell()
+
+    def version(self):
+        with open(self.pending_path, encoding="utf-8") as file:
+            return file.readline()[len("#pending "):].strip()
+
+    def done_keys(self):
+        keys = array("Q")
+        with open(self.done_path, "rb") as file:
+            data = file.read()
+        keys.frombytes(data[:len(data) - len(data) % 8])
+        return keys
+
+    def entries(self, end, batch=4096):
+        ''' Batches of (key, url, valid) from the pending file up to byte offset end. '''
+        with open(self.pending_path, "rb") as file:
+            file.readline()
+            entries = []
+            while file.tell() < end:
+                line = file.readline().decode("utf-8")
+                if not line:
+                    break
+                entries.append((int(line[1:17], 16), line[18:-1], line[0] == "+"))
+                if len(entries) >= batch:
+                    yield entries
+                    entries = []
+            if entries:
+                yield entries
+
+    def _write_pending(self, path, version, entries):
+        ''' Returns the number of entries written. '''
+        count = 0
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(HEADER.format(version=version))
+            for key, url, valid in entries:
+                file.write(f"{'+' if valid else '!'}{key:016x} {url}\n")
+                count += 1
+        return count
+
+    def compact_start(self, version, entries):
+        ''' Writes the compacted pending file next to the old one, returns its path. '''
+        temporary = self.pending_path + ".tmp"
+        self.compacted_lines = self._write_pending(temporary, version, entries)
+        return temporary
+
+    def compact_finish(self, temporary, since):
+        '''
+        Adds what was appended to the pending file after byte offset since and replaces
+        it with the compacted one. The caller holds the lock the writes happen under.
+        '''
+        self.pending.close()
+        with open(self.pending_path, "rb") as file:
+            file.seek(since)
+            tail = file.read()
+        with open(temporary, "ab") as file:
+            file.write(tail)
+        os.replace(temporary, self.pending_path)
+        self.pending = open(self.pending_path, "a", encoding="utf-8")
+        self.lines = self.compacted_lines + tail.count(b"\n")
+        self.finished_since = 0
+
+    def close(self):
+        for file in (self.pending, self.done):
+            if file is not None:
+                file.close()
+        self.pending = self.done = None
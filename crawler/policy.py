@@ -0,0 +1,134 @@
+import math
+from urllib.parse import urlparse
+
+from crawler.traps import path_template
+
+
+def _host(url):
+    # crawler.scheduler.get_host, the scheduler imports this module
+    return urlparse(url).netloc.lower()
+
+
+class LIFOPolicy(object):
+    '''
+    The order urls leave the HostScheduler in. A policy gives every queued url a
+    priority (smaller goes first) and says how a host is picked:
+        by_priority False: the host whose politeness slot frees up first, then its best url.
+        by_priority True: among the hosts free right now, the one with the best url.
+    The frontier tells it about new urls (discovered), links to urls already queued
+    (linked, only if counts_links) and what fetched pages were worth (record).
+    This one is the old frontier: newest url first, which dives deep into one subtree.
+    '''
+    name = "lifo"
+    by_priority = False
+    counts_links = False
+    # "newest" or "oldest" when the priority only follows seq, the scheduler then packs
+    # a host's urls in arrival order instead of keeping a heap of them. None otherwise
+    sequential = "newest"
+
+    def priority(self, url, seq):
+        return -seq
+
+    def discovered(self, url, parent):
+        pass
+
+    def linked(self, url):
+        ''' Returns True if the url's priority changed. '''
+        return False
+
+    def record(self, url, report, new_links):
+        pass
+
+    def dropped(self, url):
+        ''' A queued url left without a fetch (its trap template was banned, or robots.txt disallows it). '''
+        pass
+
+
+class RoundRobinPolicy(LIFOPolicy):
+    ''' Hosts take turns as their politeness slots free up, oldest url first in each. '''
+    name = "roundrobin"
+    sequential = "oldest"
+
+    def priority(self, url, seq):
+        return seq
+
+
+class BFSPolicy(LIFOPolicy):
+    ''' Breadth first: the oldest url among the hosts that are free, in discovery order. '''
+    name = "bfs"
+    by_priority = True
+    sequential = "oldest"
+
+    def priority(self, url, seq):
+        return seq
+
+
+class ScorePolicy(LIFOPolicy):
+    '''
+    Best estimated page value first, among the hosts that are free:
+        depth: 1 / (1 + links from a seed)
+        in-links: log(1 + links to it seen while it was queued), it moves up on every one
+        host yield: moving average of the host's fetched pages that were not duplicates,
+            not thin and gave new links
+        novelty: 1 / urls queued so far with its path template
+    each times its weight. The host yield and novelty are taken when the url is queued.
+    '''
+    name = "score"
+    by_priority = True
+    counts_links = True
+    sequential = None
+
+    def __init__(self, depth_weight=1.0, inlink_weight=0.5, yield_weight=1.0,
+                 novelty_weight=1.0, smoothing=0.1):
+        self.depth_weight = depth_weight
+        self.inlink_weight = inlink_weight
+        self.yield_weight = yield_weight
+        self.novelty_weight = novelty_weight
+        self.smoothing = smoothing
+        # queued and in flight urls, dropped once their page is recorded
+        self.depth = dict()
+        self.inlinks = dict()
+        self.host_yield = dict()
+        self.templates = dict()
+
+    def priority(self, url, seq):
+        template = path_template(url)
+        score = (self.depth_weight / (1 + self.depth.get(url, 0))
+                 + self.inlink_weight * math.log1p(self.inlinks.get(url, 0))
+                 + self.yield_weight * self.host_yield.get(_host(url), 1.0)
+                 + self.novelty_weight / self.templates.get(template, 1))
+        return -score
+
+    def discovered(self, url, parent):
+        self.depth[url] = self.depth[parent] + 1 if parent in self.depth else 0
+        self.inlinks[url] = 0
+        template = path_template(url)
+        self.templates[template] = self.templates.get(template, 0) + 1
+
+    def linked(self, url):
+        if url not in self.inlinks:
+            return False
+        self.inlinks[url] += 1
+        return True
+
+    def dropped(self, url):
+        self.depth.pop(url, None)
+        self.inlinks.pop(url, None)
+
+    def record(self, url, report, new_links):
+        self.dropped(url)
+        host = _host(url)
+        useful = 1.0 if report.word_count and not report.duplicate and new_links else 0.0
+        current = self.host_yield.get(host, 1.0)
+        self.host_yield[host] = current + self.smoothing * (useful - current)
+
+
+POLICIES = {policy.name: policy for policy in (LIFOPolicy, RoundRobinPolicy, BFSPolicy, ScorePolicy)}
+
+
+def make_policy(name):
+    ''' The policy called name in config.ini (PRIORITY). '''
+    try:
+        return POLICIES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown PRIORITY {name}, expected one of {', '.join(POLICIES)}.")
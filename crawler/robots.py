@@ -0,0 +1,237 @@
+'''
+robots.txt and sitemaps: parsing, and a bounded cache of the rules per host. The
+frontier fetches them itself, as urls of their host in the HostScheduler like any
+page, checks every url against the rules of its host before it is queued and queues
+the urls of the host's sitemaps in batches.
+The rules follow RFC 9309: the groups naming our user agent (or * when none does),
+the longest matching Allow or Disallow wins, Allow on a tie, * and $ in patterns.
+'''
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
+
+# RFC 9309 asks to read at least 500 KiB of a robots.txt
+MAX_ROBOTS = 500 * 1024
+# a sitemap is at most 50 MB uncompressed, gzipped ones are cut there
+MAX_SITEMAP = 50 * 1024 * 1024
+# sitemap files read per host: the index and the sitemaps it lists
+MAX_SITEMAPS = 10
+# seconds a robots.txt that could not be fetched (errors, 5xx) disallows everything
+# before it is asked again
+ERROR_TTL = 300.0
+# fetches of a robots.txt that fail in a row before the urls of its host are dropped
+ROBOTS_RETRIES = 3
+
+
+def _compile(pattern):
+    ''' A pattern with * (any run of characters) or a final $ (end of the url) as a regex. '''
+    end = pattern.endswith("$")
+    body = pattern[:-1] if end else pattern
+    regex = ".*".join(re.escape(part) for part in body.split("*"))
+    return re.compile(regex + ("$" if end else ""), re.DOTALL)
+
+
+class RobotsRules(object):
+    '''
+    The Allow and Disallow rules of one robots.txt that apply to us, compiled: longest
+    pattern first so the first one that matches decides, plain prefixes checked with
+    startswith and patterns with * or $ as regexes. No rules allows everything.
+    unreachable ones stand for a robots.txt that could not be fetched.
+    '''
+    __slots__ = ("rules", "sitemaps", "unreachable")
+
+    def __init__(self, rules=(), sitemaps=(), unreachable=False):
+        compiled = sorted(
+            ((len(pattern), allow, pattern) for allow, pattern in rules),
+            key=lambda rule: (-rule[0], not rule[1]))
+        self.rules = [
+            (allow, pattern, _compile(pattern).match if "*" in pattern or pattern.endswith("$") else None)
+            for _, allow, pattern in compiled]
+        self.sitemaps = list(sitemaps)
+        self.unreachable = unreachable
+
+    def __len__(self):
+        return len(self.rules)
+
+    def allowed(self, path):
+        ''' path is the url's path and query. '''
+        for allow, pattern, match in self.rules:
+            if match(path) if match is not None else path.startswith(pattern):
+                return allow
+        return True
+
+    def allows(self, url):
+        ''' allowed() for a whole url, the robots.txt itself always is. '''
+        path = _path(urlsplit(url))
+        return path == "/robots.txt" or self.allowed(path)
+
+
+def parse_robots(text, agent):
+    '''
+    RobotsRules from the text of a robots.txt: the groups whose User-agent our agent
+    starts with, all of them merged, or the * groups when there are none. The Sitemap
+    lines of the whole file come along.
+    '''
+    agent = agent.lower()
+    # [agents, rules, whether a rule line closed the group]
+    groups = []
+    group = None
+    sitemaps = []
+    for line in text.splitlines():
+        key, colon, value = line.split("#", 1)[0].partition(":")
+        if not colon:
+            continue
+        key, value = key.strip().lower(), value.strip()
+        if key == "user-agent":
+            if group is None or group[2]:
+                group = [set(), [], False]
+                groups.append(group)
+            group[0].add(value.lower())
+        elif key in ("allow", "disallow") and group is not None:
+            group[2] = True
+            if value:
+                group[1].append((key == "allow", value))
+        elif key == "sitemap" and value:
+            sitemaps.append(value)
+    mine = [rules for agents, rules, _ in groups if any(name != "*" and agent.startswith(name) for name in agents)]
+    if not mine:
+        mine = [rules for agents, rules, _ in groups if "*" in agents]
+    return RobotsRules([rule for rules in mine for rule in rules], sitemaps)
+
+
+def parse_lastmod(text):
+    ''' A W3C datetime (2019-10-21, 2019-10-21T10:00:00+00:00, ...Z) as POSIX seconds, None if it is not one. '''
+    text = (text or "").strip()
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    try:
+        moment = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _local(tag):
+    # {http://www.sitemaps.org/schemas/sitemap/0.9}url -> url
+    return tag.rpartition("}")[2]
+
+
+def parse_sitemap(content):
+    '''
+    ([(url, lastmod or None)], [sitemap url]) from a sitemap (urlset) or a sitemap
+    index, gzipped or not. Anything that does not parse gives nothing.
+    '''
+    if content[:2] == b"\x1f\x8b":
+        try:
+            content = zlib.decompressobj(zlib.MAX_WBITS | 16).decompress(content, MAX_SITEMAP)
+        except zlib.error:
+            return [], []
+    try:
+        root = ElementTree.fromstring(content)
+    except ElementTree.ParseError:
+        return [], []
+    urls, sitemaps = [], []
+    for element in root:
+        kind = _local(element.tag)
+        location = lastmod = None
+        for field in element:
+            name = _local(field.tag)
+            if name == "loc":
+                location = (field.text or "").strip()
+            elif name == "lastmod":
+                lastmod = parse_lastmod(field.text)
+        if not location:
+            continue
+        if kind == "url":
+            urls.append((location, lastmod))
+        elif kind == "sitemap":
+            sitemaps.append(location)
+    return urls, sitemaps
+
+
+def _path(parsed):
+    return (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+
+
+class RobotsCache(object):
+    '''
+    host -> RobotsRules, each fresh for ttl seconds, at most capacity hosts (the least
+    recently used dropped first). Stale rules are still handed out, the frontier
+    keeps using them while it fetches the robots.txt again. A robots.txt that is not
+    there (4xx) allows everything, one that could not be fetched (5xx, errors)
+    disallows everything (RFC 9309 2.3.1.4) and goes stale after ERROR_TTL seconds.
+    '''
+    def __init__(self, agent, ttl=86400.0, capacity=10_000):
+        self.agent = agent
+        self.ttl = ttl
+        self.capacity = capacity
+        # host -> (rules, monotonic time they go stale)
+        self.hosts = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = Counter()
+
+    def count(self, **amounts):
+        with self.lock:
+            self.counters.update(amounts)
+
+    def get(self, host):
+        ''' (RobotsRules or None when the host has none cached, whether they are fresh). '''
+        with self.lock:
+            entry = self.hosts.get(host)
+            if entry is None:
+                return None, False
+            self.hosts.move_to_end(host)
+        return entry[0], entry[1] > time.monotonic()
+
+    def allowed(self, url):
+        '''
+        False when the cached rules of url's host disallow it, None when there are none
+        yet or its robots.txt could not be fetched, the frontier decides those.
+        '''
+        rules, _ = self.get(urlsplit(url).netloc.lower())
+        if rules is None or rules.unreachable:
+            return None
+        if rules.allows(url):
+            return True
+        self.count(blocked=1)
+        return False
+
+    def _put(self, host, rules, ttl):
+        with self.lock:
+            self.hosts[host] = (rules, time.monotonic() + ttl)
+            self.hosts.move_to_end(host)
+            if len(self.hosts) > self.capacity:
+                self.hosts.popitem(last=False)
+                self.counters["evicted"] += 1
+        return rules
+
+    def store(self, host, resp):
+        ''' Caches the rules of host from the response (utils.response.Response) to its robots.txt. '''
+        if resp.status == 200 and resp.raw_response is not None:
+            text = resp.raw_response.content[:MAX_ROBOTS].decode("utf-8", "replace")
+            rules = parse_robots(text, self.agent)
+            self.count(fetched=1, rules=len(rules))
+            return self._put(host, rules, self.ttl)
+        if 400 <= resp.status < 500:
+            self.count(fetched=1, missing=1)
+            return self._put(host, RobotsRules(), self.ttl)
+        return self.failed(host)
+
+    def failed(self, host):
+        ''' Disallows everything on host for ERROR_TTL seconds, its robots.txt could not be fetched. '''
+        self.count(fetched=1, errors=1)
+        return self._put(host, RobotsRules([(False, "/")], unreachable=True), ERROR_TTL)
+
+    def stats(self):
+        ''' Hosts cached, robots.txt fetched (missing, errors, retries), urls blocked, sitemap files and urls read. '''
+        with self.lock:
+            stats = dict(self.counters)
+            stats["hosts"] = len(self.hosts)
+        return stats
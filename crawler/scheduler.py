@@ -0,0 +1,293 @@
+import heapq
+from array import array
+from itertools import count
+from urllib.parse import urlparse
+
+from crawler.policy import LIFOPolicy
+from utils.urlstore import PackedURLs
+
+
+def get_host(url):
+    return urlparse(url).netloc.lower()
+
+
+class _Sequence(object):
+    '''
+    The queue of one host for a sequential policy, whose priorities only follow the
+    order urls came in: packed urls (utils/urlstore.py), newest or oldest out first,
+    and their seqs when the scheduler needs the head's priority (by_priority).
+    '''
+    __slots__ = ("urls", "seqs", "start", "newest")
+
+    def __init__(self, newest, keep_seqs):
+        self.urls = PackedURLs()
+        self.seqs = array("Q") if keep_seqs else None
+        # first live seq when oldest first
+        self.start = 0
+        self.newest = newest
+
+    def __bool__(self):
+        return bool(self.urls)
+
+    def push(self, priority, seq, url):
+        self.urls.append(url)
+        if self.seqs is not None:
+            self.seqs.append(seq)
+
+    def head(self):
+        ''' (priority, seq) of the next url, None when empty. '''
+        if not self.urls:
+            return None
+        if self.seqs is None:
+            return 0, 0
+        seq = self.seqs[-1] if self.newest else self.seqs[self.start]
+        return (-seq if self.newest else seq), seq
+
+    def pop(self):
+        if self.newest:
+            if self.seqs is not None:
+                self.seqs.pop()
+            return self.urls.pop()
+        if self.seqs is not None:
+            self.start += 1
+            if self.start == len(self.seqs):
+                self.seqs = array("Q")
+                self.start = 0
+            elif self.start > 4096 and self.start * 2 > len(self.seqs):
+                del self.seqs[:self.start]
+                self.start = 0
+        return self.urls.popleft()
+
+    def discard(self, predicate):
+        seqs = self.seqs[self.start:] if self.seqs is not None else None
+        kept = _Sequence(self.newest, seqs is not None)
+        removed = []
+        for i, url in enumerate(self.urls):
+            if predicate(url):
+                removed.append(url)
+            else:
+                kept.push(None, seqs[i] if seqs is not None else 0, url)
+        self.urls, self.seqs, self.start = kept.urls, kept.seqs, 0
+        return removed
+
+
+class _Heap(object):
+    '''
+    The queue of one host for any other policy: a heap of (priority, seq, url). With
+    live (url -> seq of its current entry, for policies that change priorities later)
+    the entries replaced by reprioritize are stale and skipped.
+    '''
+    __slots__ = ("entries", "live")
+
+    def __init__(self, live):
+        self.entries = list()
+        self.live = live
+
+    def __bool__(self):
+        return self.head() is not None
+
+    def push(self, priority, seq, url):
+        heapq.heappush(self.entries, (priority, seq, url))
+
+    def head(self):
+        entries, live = self.entries, self.live
+        while entries and live is not None and live.get(entries[0][2]) != entries[0][1]:
+            heapq.heappop(entries)
+        return entries[0][:2] if entries else None
+
+    def pop(self):
+        _, _, url = heapq.heappop(self.entries)
+        if self.live is not None:
+            del self.live[url]
+        return url
+
+    def discard(self, predicate):
+        kept, removed = [], []
+        live = self.live
+        for entry in self.entries:
+            if live is not None and live.get(entry[2]) != entry[1]:
+                continue
+            if predicate(entry[2]):
+                removed.append(entry[2])
+                if live is not None:
+                    del live[entry[2]]
+            else:
+                kept.append(entry)
+        heapq.heapify(kept)
+        self.entries = kept
+        return removed
+
+
+class HostScheduler(object):
+    '''
+    Politeness aware queue of urls to be downloaded.
+    Every host has its own heap of urls ordered by the policy (crawler/policy.py, LIFO
+    like the old frontier list by default) and the hosts that have urls waiting sit in
+    a heap keyed on the earliest time they may be fetched again. pop() hands out the
+    host that becomes available first, so N workers end up on N different hosts
+    instead of all waiting on the same one. A host is busy from pop() until done():
+    it gets no other fetch meanwhile and is free again delay seconds after done(), so
+    a download slower than the delay never overlaps the next one of its host. With a by_priority
+    policy the hosts whose slot is free are kept in a second heap keyed on their best
+    url, and pop() takes the best of those. Every operation is O(log n).
+    For the sequential policies (lifo, roundrobin, bfs) a host's queue is its urls
+    packed in one buffer instead of a heap of tuples, ~30 bytes a url instead of ~250.
+    The scheduler never reads a clock itself, the caller passes the current time in.
+    '''
+    def __init__(self, delay, policy=None):
+        self.delay = delay
+        self.policy = policy if policy is not None else LIFOPolicy()
+        # host -> _Sequence or _Heap
+        self.queues = dict()
+        self.next_fetch = dict()
+        # hosts with a fetch out, they are in neither heap until done()
+        self.busy = set()
+        # (ready_at, order, host) of the hosts waiting for their slot
+        self.heap = list()
+        # (best priority, order, host) of the hosts free now, by_priority only. ready
+        # holds the key of each host's live entry, the others are stale
+        self.free = list()
+        self.ready = dict()
+        self.count = 0
+        self._order = count()
+        self._seq = count()
+        # url -> seq of its live entry, for policies that change priorities later
+        self.live = dict() if self.policy.counts_links and self.policy.sequential is None else None
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count > 0
+
+    def _new_queue(self):
+        sequential = self.policy.sequential
+        if sequential is None:
+            return _Heap(self.live)
+        return _Sequence(sequential == "newest", self.policy.by_priority)
+
+    def _make_free(self, host, queue):
+        key = queue.head()
+        if self.ready.get(host) != key:
+            self.ready[host] = key
+            heapq.heappush(self.free, (key, next(self._order), host))
+
+    def _enqueue(self, url, host, queue):
+        seq = next(self._seq)
+        priority = self.policy.priority(url, seq) if self.policy.sequential is None else None
+        queue.push(priority, seq, url)
+        if self.live is not None:
+            self.live[url] = seq
+        if host in self.ready:
+            self._make_free(host, queue)
+
+    def push(self, url):
+        if self.live is not None and url in self.live:
+            # queued already, only its priority can change
+            self.reprioritize(url)
+            return
+        host = get_host(url)
+        queue = self.queues.get(host)
+        if queue is None:
+            queue = self.queues[host] = self._new_queue()
+            if host not in self.busy:
+                heapq.heappush(
+                    self.heap, (self.next_fetch.get(host, 0.0), next(self._order), host))
+        self._enqueue(url, host, queue)
+        self.count += 1
+
+    def reprioritize(self, url):
+        ''' Queues the url again under its new priority, if it is still queued. '''
+        if self.live is None or url not in self.live:
+            return
+        host = get_host(url)
+        self._enqueue(url, host, self.queues[host])
+
+    def discard(self, host, predicate):
+        ''' Removes the urls of host that predicate is true for, returns them. '''
+        queue = self.queues.get(host)
+        if not queue:
+            return []
+        # an emptied queue keeps its heap entry, pop skips it
+        removed = queue.discard(predicate)
+        self.count -= len(removed)
+        if host in self.ready and queue:
+            self._make_free(host, queue)
+        return removed
+
+    def _release(self, now):
+        # hosts whose slot has come move to the free heap
+        while self.heap and self.heap[0][0] <= now:
+            _, _, host = heapq.heappop(self.heap)
+            queue = self.queues[host]
+            if not queue:
+                del self.queues[host]
+                continue
+            self._make_free(host, queue)
+
+    def _pop_free(self):
+        while self.free:
+            key, _, host = heapq.heappop(self.free)
+            if self.ready.get(host) != key:
+                continue
+            del self.ready[host]
+            queue = self.queues[host]
+            if queue:
+                return host, queue
+            del self.queues[host]
+        return None
+
+    def pop(self, now):
+        '''
+        Returns (start_time, url) for the host that can be fetched soonest, or None if
+        nothing is queued for a host that is not busy. start_time may be in the future,
+        the caller waits until then. The caller calls done() once the fetch is over.
+        '''
+        picked = None
+        if self.policy.by_priority:
+            self._release(now)
+            picked = self._pop_free()
+            ready_at = now
+        if picked is None:
+            while self.heap:
+                ready_at, _, host = heapq.heappop(self.heap)
+                queue = self.queues[host]
+                if queue:
+                    picked = host, queue
+                    break
+                del self.queues[host]
+            else:
+                return None
+        host, queue = picked
+        url = queue.pop()
+        self.count -= 1
+
+        start = max(ready_at, now)
+        self.next_fetch[host] = start + self.delay
+        self.busy.add(host)
+        if not queue:
+            del self.queues[host]
+        return start, url
+
+    def done(self, host, now):
+        '''
+        The fetch pop() handed out for host finished at now, its next url may start
+        delay seconds later. Returns True if the host has urls waiting again.
+        '''
+        if host not in self.busy:
+            return False
+        self.busy.discard(host)
+        self.next_fetch[host] = max(self.next_fetch.get(host, 0.0), now + self.delay)
+        queue = self.queues.get(host)
+        if queue is None:
+            return False
+        if not queue:
+            # emptied by discard() while the fetch was out
+            del self.queues[host]
+            return False
+        heapq.heappush(self.heap, (self.next_fetch[host], next(self._order), host))
+        return True
+
+    def defer(self, host, until):
+        ''' No url of host starts before until. Called while its fetch is out, before done(). '''
+        self.next_fetch[host] = max(self.next_fetch.get(host, 0.0), until)
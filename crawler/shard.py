@@ -0,0 +1,283 @@
+import threading
+import time
+import zlib
+from multiprocessing.connection import Client, Listener
+
+from utils import get_logger
+from scraper import canonical_url
+from crawler.checkpoint import HEADER, ReportState
+from crawler.frontier import Frontier
+from crawler.scheduler import get_host
+
+# forwarded links are sent once this many are buffered for a shard, or every interval
+FORWARD_BATCH = 500
+FORWARD_INTERVAL = 0.05
+# how often shard 0 checks whether every shard ran out of work
+PROBE_INTERVAL = 0.5
+# how long to keep trying to reach a shard that is not listening yet, and to wait for reports
+CONNECT_TIMEOUT = 60.0
+REPORT_TIMEOUT = 300.0
+
+
+def shard_of(url, shards):
+    '''
+    The shard that owns url. By host, so one process keeps all of a host's politeness
+    state, with crc32 because hash() of a str differs between processes.
+    '''
+    return zlib.crc32(get_host(url).encode("utf-8")) % shards
+
+
+def parse_address(address):
+    host, port = address.strip().rsplit(":", 1)
+    return host, int(port)
+
+
+class ShardFrontier(Frontier):
+    '''
+    The frontier of one shard: queues only the urls it owns and hands the others to
+    the shard transport. Running out of urls only ends the crawl once shard 0 saw
+    every shard idle with no links in transit (Shard.finished).
+    '''
+    def __init__(self, config, restart, shard):
+        self.shard = shard
+        super().__init__(config, restart)
+
+    def add_url(self, url, parent=None):
+        url = canonical_url(url)
+        owner = shard_of(url, self.shard.count)
+        if owner != self.shard.index:
+            self.shard.forward(owner, url, parent)
+            # counted as new by the shard that owns it
+            return False
+        return super().add_url(url, parent)
+
+    def try_get_tbd_url(self):
+        with self.has_work:
+            scheduled = super().try_get_tbd_url()
+            if scheduled is None and not self.shard.finished.is_set():
+                # idle here, but other shards may still send links
+                return False
+            return scheduled
+
+    def idle(self):
+        with self.has_work:
+            return not self.to_be_downloaded and self.in_flight == 0 and not self.loading
+
+
+class Shard(object):
+    '''
+    One process of a crawl sharded by host over the SHARDS addresses in config.ini.
+    Every shard has its own frontier, save file, dedup index and politeness state, and
+    listens on its address (multiprocessing.connection, authenticated with the user
+    agent) for batches of links the other shards found for it.
+    Shard 0 also detects the end of the crawl: it asks every shard for (idle, links
+    sent, links received) and stops them all once two rounds in a row see every shard
+    idle and the same totals with as many links received as sent. Then the other
+    shards send it their report state and it merges them for the report.
+    '''
+    def __init__(self, config, index):
+        self.config = config
+        self.addresses = [parse_address(address) for address in config.shards]
+        self.count = len(self.addresses)
+        self.index = index
+        self.logger = get_logger(f"SHARD-{index}", "SHARD")
+        self.authkey = config.user_agent.encode("utf-8")
+        # a save file, report state and json log of its own, for shards sharing a folder
+        config.save_file = f"{config.save_file}.shard{index}"
+        if config.report_state:
+            config.report_state = f"{config.report_state}.shard{index}"
+        if config.log_json:
+            # rotated by size, one writer per file
+            config.log_json = f"{config.log_json}.shard{index}"
+        self.frontier = None
+        self.lock = threading.Lock()
+        self.buffers = [list() for _ in range(self.count)]
+        self.connections = [None] * self.count
+        self.send_locks = [threading.Lock() for _ in range(self.count)]
+        self.sent = 0
+        self.received = 0
+        # replies to shard 0's probes and the reports, by sender
+        self.replies = threading.Condition()
+        self.statuses = dict()
+        self.reports = dict()
+        self.finished = threading.Event()
+        self.closed = threading.Event()
+        self.listener = None
+
+    def frontier_factory(self, config, restart):
+        self.frontier = ShardFrontier(config, restart, self)
+        return self.frontier
+
+    def start(self):
+        ''' Listens for the other shards, after the frontier is made. '''
+        self.listener = Listener(self.addresses[self.index], authkey=self.authkey)
+        threading.Thread(target=self._accept, name="shard-listener", daemon=True).start()
+        threading.Thread(target=self._flush_loop, name="shard-flush", daemon=True).start()
+        if self.index == 0:
+            threading.Thread(target=self._coordinate, name="shard-coordinator", daemon=True).start()
+        self.logger.info(f"Shard {self.index} of {self.count} listening on {self.addresses[self.index]}.")
+
+    # sending
+
+    def _connect(self, shard):
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while True:
+            try:
+                return Client(self.addresses[shard], authkey=self.authkey)
+            except (ConnectionError, OSError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+
+    def _send(self, shard, message):
+        with self.send_locks[shard]:
+            if self.connections[shard] is None:
+                self.connections[shard] = self._connect(shard)
+            self.connections[shard].send(message)
+
+    def forward(self, shard, url, parent):
+        with self.lock:
+            buffer = self.buffers[shard]
+            buffer.append((url, parent))
+            if len(buffer) < FORWARD_BATCH:
+                return
+        self._flush(shard)
+
+    def _flush(self, shard):
+        with self.send_locks[shard]:
+            with self.lock:
+                batch, self.buffers[shard] = self.buffers[shard], []
+            if not batch:
+                return
+            if self.connections[shard] is None:
+                self.connections[shard] = self._connect(shard)
+            self.connections[shard].send(("links", self.index, batch))
+            with self.lock:
+                self.sent += len(batch)
+
+    def _flush_loop(self):
+        while not self.closed.wait(FORWARD_INTERVAL):
+            for shard in range(self.count):
+                if shard != self.index and self.buffers[shard]:
+                    try:
+                        self._flush(shard)
+                    except Exception:
+                        self.logger.exception(f"Could not forward links to shard {shard}.")
+
+    # receiving
+
+    def _accept(self):
+        while not self.closed.is_set():
+            try:
+                connection = self.listener.accept()
+            except Exception:
+                # closed, or a peer that failed the authentication
+                continue
+            threading.Thread(target=self._receive, args=(connection,), daemon=True).start()
+
+    def _receive(self, connection):
+        with connection:
+            while True:
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    return
+                kind = message[0]
+                if kind == "links":
+                    _, sender, batch = message
+                    for url, parent in batch:
+                        self.frontier.add_url(url, parent)
+                    # only counted once they are queued, so this shard is not idle before
+                    with self.lock:
+                        self.received += len(batch)
+                elif kind == "probe":
+                    self._send(0, ("status", self.index, message[1]) + self.status())
+                elif kind == "status":
+                    _, sender, wave, idle, sent, received = message
+                    with self.replies:
+                        self.statuses[sender] = (wave, idle, sent, received)
+                        self.replies.notify_all()
+                elif kind == "stop":
+                    self._finish()
+                elif kind == "report":
+                    _, sender, data = message
+                    with self.replies:
+                        self.reports[sender] = data
+                        self.replies.notify_all()
+
+    def status(self):
+        ''' (idle, links sent, links received) of this shard. '''
+        with self.lock:
+            buffered = any(self.buffers)
+            sent, received = self.sent, self.received
+        return not buffered and self.frontier.idle(), sent, received
+
+    # the end of the crawl
+
+    def _finish(self):
+        self.finished.set()
+        with self.frontier.has_work:
+            self.frontier.has_work.notify_all()
+
+    def _probe(self, wave):
+        for shard in range(1, self.count):
+            self._send(shard, ("probe", wave))
+        with self.replies:
+            self.statuses[0] = (wave,) + self.status()
+            self.replies.wait_for(
+                lambda: all(self.statuses.get(shard, (None,))[0] == wave for shard in range(self.count)),
+                timeout=CONNECT_TIMEOUT)
+            return [self.statuses.get(shard) for shard in range(self.count)]
+
+    def _coordinate(self):
+        previous = None
+        wave = 0
+        while not self.finished.wait(PROBE_INTERVAL):
+            wave += 1
+            try:
+                statuses = self._probe(wave)
+            except Exception:
+                self.logger.exception("Could not probe the shards.")
+                continue
+            if any(status is None or status[0] != wave for status in statuses):
+                previous = None
+                continue
+            idle = all(status[1] for status in statuses)
+            totals = (sum(status[2] for status in statuses), sum(status[3] for status in statuses))
+            if idle and totals[0] == totals[1] and totals == previous:
+                self.logger.info(f"Every shard is idle, {totals[0]} links forwarded. Stopping.")
+                for shard in range(1, self.count):
+                    self._send(shard, ("stop",))
+                self._finish()
+                return
+            previous = totals if idle else None
+
+    def merge_reports(self):
+        '''
+        After the crawl: shard 0 adds every other shard's report state to its own,
+        the others send theirs to it. The near duplicate fingerprints stay behind,
+        the report does not need them.
+        '''
+        if self.index != 0:
+            self._send(0, ("report", self.index, ReportState.capture(fingerprints=False).encode()))
+            return
+        with self.replies:
+            self.replies.wait_for(lambda: len(self.reports) == self.count - 1, timeout=REPORT_TIMEOUT)
+            reports = dict(self.reports)
+        for sender, data in sorted(reports.items()):
+            state = ReportState.decode(data[HEADER.size:])
+            state.restore()
+            self.logger.info(f"Merged the report of shard {sender}: {len(state.pages)} pages.")
+        missing = set(range(1, self.count)) - set(reports)
+        if missing:
+            self.logger.error(f"No report from shards {sorted(missing)}, the report lacks their pages.")
+
+    def close(self):
+        self.closed.set()
+        for shard, connection in enumerate(self.connections):
+            if connection is not None:
+                with self.send_locks[shard]:
+                    connection.close()
+        if self.listener is not None:
+            self.listener.close()
+        self.logger.info(f"Shard {self.index}: {self.sent} links forwarded, {self.received} received.")
@@ -0,0 +1,165 @@
+import os
+import shelve
+import sqlite3
+import time
+
+from utils.metrics import metrics
+
+
+class ShelveStore(object):
+    '''
+    The original shelve save file, but sync() only flushes to disk once FLUSHBATCH
+    writes are pending or FLUSHINTERVAL seconds passed since the last flush.
+    before_flush, when set, runs first on every flush (the frontier flushes its
+    resume index there).
+    '''
+    def __init__(self, path, flush_interval=1.0, flush_batch=500):
+        self.save = shelve.open(path)
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.pending = 0
+        self.last_flush = time.monotonic()
+        self.before_flush = None
+
+    def __contains__(self, urlhash):
+        return urlhash in self.save
+
+    def __getitem__(self, urlhash):
+        return self.save[urlhash]
+
+    def __setitem__(self, urlhash, value):
+        self.save[urlhash] = value
+        self.pending += 1
+
+    def __len__(self):
+        return len(self.save)
+
+    def __bool__(self):
+        return len(self.save) > 0
+
+    def keys(self):
+        return self.save.keys()
+
+    def values(self):
+        return self.save.values()
+
+    def items(self):
+        return self.save.items()
+
+    def sync(self):
+        ''' Group commit: flushes only when the batch is full or the interval ran out. '''
+        if (self.pending >= self.flush_batch
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            with metrics.timer("flush"):
+                self.flush()
+
+    def flush(self):
+        if self.before_flush is not None:
+            self.before_flush()
+        self.save.sync()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.save.close()
+
+
+class SQLiteStore(object):
+    '''
+    Save file as a sqlite database in WAL mode.
+    Writes are kept in memory and committed in one transaction per batch, so a crash
+    loses at most the last unflushed batch and never leaves a half written one behind.
+    durability maps to PRAGMA synchronous (off, normal or full). before_flush as in
+    ShelveStore.
+    '''
+    def __init__(self, path, flush_interval=1.0, flush_batch=500, durability="normal"):
+        if not os.path.exists(path):
+            # leftovers from a deleted database would be replayed into the new one
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(f"PRAGMA synchronous={durability.upper()}")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS urls "
+            "(urlhash TEXT PRIMARY KEY, url TEXT NOT NULL, completed INTEGER NOT NULL)")
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.pending = dict()
+        self.last_flush = time.monotonic()
+        self.before_flush = None
+
+    def __contains__(self, urlhash):
+        if urlhash in self.pending:
+            return True
+        return self.db.execute(
+            "SELECT 1 FROM urls WHERE urlhash = ?", (urlhash,)).fetchone() is not None
+
+    def __getitem__(self, urlhash):
+        if urlhash in self.pending:
+            return self.pending[urlhash]
+        row = self.db.execute(
+            "SELECT url, completed FROM urls WHERE urlhash = ?", (urlhash,)).fetchone()
+        if row is None:
+            raise KeyError(urlhash)
+        return row[0], bool(row[1])
+
+    def __setitem__(self, urlhash, value):
+        self.pending[urlhash] = value
+
+    def __len__(self):
+        self.flush()
+        return self.db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def keys(self):
+        self.flush()
+        return (row[0] for row in self.db.execute("SELECT urlhash FROM urls ORDER BY rowid"))
+
+    def values(self):
+        self.flush()
+        return ((url, bool(completed)) for url, completed in
+                self.db.execute("SELECT url, completed FROM urls ORDER BY rowid"))
+
+    def items(self):
+        self.flush()
+        return ((urlhash, (url, bool(completed))) for urlhash, url, completed in
+                self.db.execute("SELECT urlhash, url, completed FROM urls ORDER BY rowid"))
+
+    def sync(self):
+        ''' Group commit: flushes only when the batch is full or the interval ran out. '''
+        if (len(self.pending) >= self.flush_batch
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            with metrics.timer("flush"):
+                self.flush()
+
+    def flush(self):
+        if self.before_flush is not None:
+            self.before_flush()
+        if self.pending:
+            rows = [(urlhash, url, int(completed))
+                    for urlhash, (url, completed) in self.pending.items()]
+            self.db.execute("BEGIN")
+            self.db.executemany(
+                "INSERT OR REPLACE INTO urls (urlhash, url, completed) VALUES (?, ?, ?)", rows)
+            self.db.execute("COMMIT")
+            self.pending.clear()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+def open_store(config):
+    ''' Opens the save file with the backend picked by STORE in config.ini. '''
+    if config.store == "sqlite":
+        return SQLiteStore(
+            config.save_file, config.flush_interval, config.flush_batch, config.durability)
+    if config.store == "shelve":
+        return ShelveStore(config.save_file, config.flush_interval, config.flush_batch)
+    raise ValueError(f"Unknown STORE {config.store}, expected shelve or sqlite.")
@@ -0,0 +1,149 @@
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+# path segments that are ids: long hex runs and uuids
+ID_SEGMENT = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|(?=[a-z]*\d)[0-9a-f]{12,}",
+    re.IGNORECASE)
+DIGITS = re.compile(r"\d+")
+# fingerprint hashes kept per template to tell how new a page's text is: 1 in SAMPLE,
+# at most MAX_SAMPLES of them
+SAMPLE = 4
+MAX_SAMPLES = 4096
+
+
+@lru_cache(maxsize=1 << 16)
+def path_template(url):
+    '''
+    host + path with digit runs collapsed to {n} and id segments to {id}, then the
+    sorted query keys without their values:
+        https://wiki.ics.uci.edu/doku.php?id=start&rev=16 -> wiki.ics.uci.edu/doku.php?id&rev
+        https://www.ics.uci.edu/events/day/2019-10-21 -> www.ics.uci.edu/events/day/{n}-{n}-{n}
+    '''
+    parsed = urlsplit(url)
+    segments = [
+        "{id}" if ID_SEGMENT.fullmatch(segment) else DIGITS.sub("{n}", segment)
+        for segment in parsed.path.split("/")]
+    keys = sorted({field.partition("=")[0] for field in parsed.query.split("&") if field})
+    template = parsed.netloc.lower() + "/".join(segments)
+    return f"{template}?{'&'.join(keys)}" if keys else template
+
+
+class TemplateStats(object):
+    __slots__ = ("admitted", "dropped", "fetched", "new_links", "duplicates", "thin",
+                 "words", "novelty", "useful", "state", "samples")
+
+    def __init__(self):
+        # urls let into the frontier and turned away while throttled or banned
+        self.admitted = 0
+        self.dropped = 0
+        self.fetched = 0
+        # links found on these pages that the frontier had not seen
+        self.new_links = 0
+        self.duplicates = 0
+        self.thin = 0
+        self.words = 0
+        # moving averages: share of a page's sampled text hashes new to the template, and
+        # of pages that were useful (not a duplicate, not thin, enough new text)
+        self.novelty = 1.0
+        self.useful = 1.0
+        self.state = "ok"
+        self.samples = set()
+
+    def as_dict(self):
+        stats = {name: getattr(self, name) for name in self.__slots__ if name != "samples"}
+        stats["non_duplicate_rate"] = 1 - self.duplicates / self.fetched if self.fetched else 1.0
+        stats["new_links_per_page"] = self.new_links / self.fetched if self.fetched else 0.0
+        return stats
+
+
+class TrapDetector(object):
+    '''
+    Groups urls by path_template and follows the yield of every template online.
+    A page is useful when it is not a near duplicate, not thin, and at least
+    min_novelty of its text (sampled fingerprint hashes) is new to its template: trap
+    pages are the same few pieces of text over and over even when no two of them are
+    near duplicates. Once a template has min_pages fetched, one whose share of useful
+    pages (moving average) falls under throttle_yield only gets every
+    throttle_every-th new url in, and under ban_yield none at all. A template with
+    max_pages fetched is banned too (0 for no budget).
+    Not thread safe, the frontier calls it under its lock.
+    '''
+    def __init__(self, min_pages=20, throttle_yield=0.5, ban_yield=0.1, throttle_every=4,
+                 max_pages=0, min_novelty=0.15, smoothing=0.1):
+        self.min_pages = min_pages
+        self.min_novelty = min_novelty
+        self.throttle_yield = throttle_yield
+        self.ban_yield = ban_yield
+        self.throttle_every = throttle_every
+        self.max_pages = max_pages
+        self.smoothing = smoothing
+        self.templates = dict()
+
+    def _stats(self, template):
+        stats = self.templates.get(template)
+        if stats is None:
+            stats = self.templates[template] = TemplateStats()
+        return stats
+
+    def admit(self, url):
+        ''' Whether a newly discovered url should be queued. '''
+        stats = self._stats(path_template(url))
+        if stats.state == "banned" or \
+                (stats.state == "throttled" and (stats.admitted + stats.dropped) % self.throttle_every):
+            stats.dropped += 1
+            return False
+        stats.admitted += 1
+        return True
+
+    def _novelty(self, stats, fingerprint):
+        sample = {h for h in fingerprint if h % SAMPLE == 0} if fingerprint else None
+        if not sample:
+            # too little text to tell
+            return 1.0
+        new = sample - stats.samples
+        if len(stats.samples) < MAX_SAMPLES:
+            stats.samples |= new
+        return len(new) / len(sample)
+
+    def record(self, url, new_links, word_count, duplicate, fingerprint=None):
+        '''
+        Adds one fetched page to its template. Returns the template if this page got
+        it banned, so the caller can drop what is still queued for it.
+        '''
+        template = path_template(url)
+        stats = self._stats(template)
+        stats.fetched += 1
+        stats.new_links += new_links
+        stats.words += word_count
+        stats.duplicates += bool(duplicate)
+        stats.thin += not word_count
+        novelty = self._novelty(stats, fingerprint)
+        stats.novelty += self.smoothing * (novelty - stats.novelty)
+        useful = 0.0 if duplicate or not word_count or novelty < self.min_novelty else 1.0
+        stats.useful += self.smoothing * (useful - stats.useful)
+
+        if stats.state == "banned" or stats.fetched < self.min_pages:
+            return None
+        if stats.useful < self.ban_yield or (self.max_pages and stats.fetched >= self.max_pages):
+            stats.state = "banned"
+            return template
+        stats.state = "throttled" if stats.useful < self.throttle_yield else "ok"
+        return None
+
+    def stats(self):
+        ''' template -> dict of its counters, for inspection. '''
+        return {template: stats.as_dict() for template, stats in self.templates.items()}
+
+    def report(self, limit=20):
+        ''' Lines for the log: banned and throttled templates, then the most fetched. '''
+        order = {"banned": 0, "throttled": 1, "ok": 2}
+        ranked = sorted(self.templates.items(),
+                        key=lambda item: (order[item[1].state], -item[1].fetched))
+        return [
+            f"{stats.state:>9} {template} fetched {stats.fetched}, useful {stats.useful:.2f}, "
+            f"novelty {stats.novelty:.2f}, "
+            f"{stats.duplicates} duplicates, {stats.thin} thin, {stats.new_links} new links, "
+            f"{stats.dropped} dropped"
+            for template, stats in ranked[:limit]]
@@ -3,8 +3,8 @@ from threading import Thread
 from inspect import getsource
 from utils.download import download
 from utils import get_logger
+from utils.metrics import metrics
 import scraper
-import time
 
 
 class Worker(Thread):
@@ -19,16 +19,29 @@ class Worker(Thread):
         
     def run(self):
         while True:
-            tbd_url = self.frontier.get_tbd_url()
+            with metrics.timer("wait"):
+                tbd_url = self.frontier.get_tbd_url()
             if not tbd_url:
                 self.logger.info("Frontier is empty. Stopping Crawler.")
                 break
-            resp = download(tbd_url, self.config, self.logger)
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            scraped_urls = scraper.scraper(tbd_url, resp)
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
-            self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
+            try:
+                with metrics.timer("download"):
+                    resp = download(tbd_url, self.config, self.logger)
+                metrics.fetched(tbd_url, resp.status)
+                # one per page, in the files and the json lines but kept off the console
+                self.logger.info(
+                    "Downloaded %s, status <%s>, using cache %s.", tbd_url, resp.status,
+                    self.config.cache_server, extra={"url": tbd_url, "status": resp.status})
+                if self.frontier.consume(tbd_url, resp):
+                    # robots.txt or a sitemap, the frontier reads those itself
+                    continue
+                report = scraper.scrape(tbd_url, resp)
+                with metrics.timer("frontier"):
+                    new_links = sum(self.frontier.add_url(scraped_url, tbd_url) for scraped_url in report.links)
+                    self.frontier.record_yield(tbd_url, report, new_links)
+            except Exception:
+                metrics.failed(tbd_url)
+                self.logger.exception(f"Failed to crawl {tbd_url}.")
+            finally:
+                # always release the url, other workers wait on it before stopping
+                self.frontier.mark_url_complete(tbd_url)
@@ -4,27 +4,57 @@ from argparse import ArgumentParser
 from utils.server_registration import get_cache_server
 from utils.config import Config
 from crawler import Crawler
+from crawler.worker import Worker
+from crawler.async_worker import AsyncWorker
+from crawler.shard import Shard
 
 from scraper import write_report
 
 
-def main(config_file, restart):
+def main(config_file, restart, cache_server=None, shard_index=0):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
-    config.cache_server = get_cache_server(config, restart)
-    crawler = Crawler(config, restart)
-    crawler.start()
+    if config.replay:
+        # everything comes from the archive, nothing to register with
+        config.cache_server = ("replay", config.replay)
+    elif cache_server:
+        # a local stand-in server (benchmarks/cache_server.py), skips registration
+        host, port = cache_server.rsplit(":", 1)
+        config.cache_server = (host, int(port))
+    else:
+        config.cache_server = get_cache_server(config, restart)
+    worker_factory = AsyncWorker if config.async_downloads else Worker
+    if not config.shards:
+        crawler = Crawler(config, restart, worker_factory=worker_factory)
+        crawler.start()
+        return
+    # one of the SHARDS processes, it only crawls the hosts it owns
+    shard = Shard(config, shard_index)
+    try:
+        crawler = Crawler(config, restart, frontier_factory=shard.frontier_factory,
+                          worker_factory=worker_factory)
+        shard.start()
+        crawler.start()
+        shard.merge_reports()
+    finally:
+        shard.close()
 
 
 if __name__ == "__main__":
+    report = "report.txt"
     try:
         parser = ArgumentParser()
         parser.add_argument("--restart", action="store_true", default=False)
         parser.add_argument("--config_file", type=str, default="config.ini")
+        parser.add_argument("--cache_server", type=str, default=None)
+        parser.add_argument("--shard", type=int, default=0)
         args = parser.parse_args()
-        main(args.config_file, args.restart)
+        if args.shard:
+            # the merged report is shard 0's, the others keep their own part
+            report = f"report.shard{args.shard}.txt"
+        main(args.config_file, args.restart, args.cache_server, args.shard)
     except:
-        write_report()
-    write_report()
+        write_report(report)
+    write_report(report)
 
@@ -1,325 +1,422 @@
-import re
-from urllib.parse import urlparse, urldefrag, urljoin, parse_qs
-from bs4 import BeautifulSoup as Bs
-from typing import List, Mapping
-from collections import defaultdict
-import string 
-
-#set of all defragmented urls (for q1)
-unique_pages = set()
-
-# word count 
-# made into list because lists are mutable
-longest_word_count: List[int] = [0]
-longest_word_count_url: List[str] = [""]
-
-#all stopwords given to ignore
-# can't use previous assignment tokenization because some of these stopwords use certain punctuation
-stop_words = {
-    "a", "about", "above", "after", "again", "against", "all", "am", "an", "and", "any", 
-    "are", "aren't", "as", "at", "be", "because", "been", "before", "being", "below", 
-    "between", "both", "but", "by", "can't", "cannot", "could", "couldn't", "did", 
-    "didn't", "do", "does", "doesn't", "doing", "don't", "down", "during", "each", "few", 
-    "for", "from", "further", "had", "hadn't", "has", "hasn't", "have", "haven't", 
-    "having", "he", "he'd", "he'll", "he's", "her", "here", "here's", "hers", "herself", 
-    "him", "himself", "his", "how", "how's", "i", "i'd", "i'll", "i'm", "i've", "if", "in", 
-    "into", "is", "isn't", "it", "it's", "its", "itself", "let's", "me", "more", "most", 
-    "mustn't", "my", "myself", "no", "nor", "not", "of", "off", "on", "once", "only", "or", 
-    "other", "ought", "our", "ours", "ourselves", "out", "over", "own", "same", "shan't", 
-    "she", "she'd", "she'll", "she's", "should", "shouldn't", "so", "some", "such", 
-    "than", "that", "that's", "the", "their", "theirs", "them", "themselves", "then", 
-    "there", "there's", "these", "they", "they'd", "they'll", "they're", "they've", 
-    "this", "those", "through", "to", "too", "under", "until", "up", "very", "was", 
-    "wasn't", "we", "we'd", "we'll", "we're", "we've", "were", "weren't", "what", 
-    "what's", "when", "when's", "where", "where's", "which", "while", "who", "who's", 
-    "whom", "why", "why's", "with", "won't", "would", "wouldn't", "you", "you'd", 
-    "you'll", "you're", "you've", "your", "yours", "yourself", "yourselves"
-}
-
-blocked_extensions = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.css', '.js', '.zip', '.mp4', '.doc', '.docx', '.ppt', '.pptx', '.md')
-
-word_counter: Mapping[str, int] = defaultdict(int)
-
-subdomain_counter: Mapping[str, int] = defaultdict(int)
-
-near_duplicate = set()
-
-MAX_SIZE = 1_000_000
-
-# some blocked params that appeared in some traps
-#add more later
-blocked_params: List[str]= [
-    'share', 'tab_details', 'tab_files', 'do', 'image', 'ns', 'ical','outlook-ical', 'do', 'image' 
-]
-
-def scraper(url, resp):
-    links = extract_next_links(url, resp)
-    
-    # remove fragment and add to unique set
-    defragmented_url, _ = urldefrag(resp.url)
-
-    if defragmented_url not in unique_pages:
-        unique_pages.add(defragmented_url)
-        parsed = urlparse(defragmented_url)
-
-        #make sure its in uci.edu domain
-        if parsed.netloc.endswith(".uci.edu"):
-            subdomain_counter[parsed.netloc] += 1
-    
-    return [link for link in links if is_valid(link)]
-
-def tokenize(text: str) -> List[str]:
-    text = text.lower()
-    
-    tokens = re.findall(r'\b[a-zA-Z]{2,}\b', text)
-    return tokens
-
-def custom_hash(s):
-    """
-    Took this from Geeks for Geeks since we aren't allowed to use a library for the hashing
-    """
-    n = len(s)
-
-    # p is a prime number
-    # m is a large prime number
-    p = 31
-    m = int(1e9 + 7)
-
-    # to store hash value
-    hashVal = 0
-
-    # to store p^i
-    pPow = 1
-
-    # Calculating hash value
-    for i in range(n):
-        hashVal = (hashVal + (ord(s[i]) - ord('a') + 1) * pPow) % m
-        pPow = (pPow * p) % m
-    return hashVal
-
-def is_duplicate(tokens) -> bool:
-    global near_duplicate
-
-    #seemed to perform the best
-    similarity_treshold = 0.85
-    
-    min_token_count = 10
-    #too small
-    if len(tokens) < min_token_count:
-        return False
-    
-    trigrams = []
-    for i in range(len(tokens) - 2):
-        trigram = ' '.join(tokens[i:i + 3])
-        trigrams.append(trigram)
-
-    #hash it
-    trigram_hashes = set()
-    for ngram in trigrams:
-        trigram_hashes.add(custom_hash(ngram))
-
-    #select a fingerprint subset 
-    selected_hashes = set()
-    for h in trigram_hashes:
-        if h % 4 == 0:
-            selected_hashes.add(h)
-
-    #compare to already existing fingerprints
-    for fingerprint in near_duplicate:
-        intersection = selected_hashes.intersection(fingerprint)
-        union = selected_hashes.union(fingerprint)
-        if union:
-            similarity_score = len(intersection) / len(union)
-        else:
-            similarity_score = 0.0
-        if similarity_score >= similarity_treshold:
-            return True
-
-    # changed because sets need to have
-    near_duplicate.add(frozenset(selected_hashes))    
-    return False
-
-    
-    
-def extract_next_links(url, resp) -> List[str]:
-    # Implementation required.
-    # url: the URL that was used to get the page
-    # resp.url: the actual url of the page
-    # resp.status: the status code returned by the server. 200 is OK, you got the page. Other numbers mean that there was some kind of problem.
-    # resp.error: when status is not 200, you can check the error here, if needed.
-    # resp.raw_response: this is where the page actually is. More specifically, the raw_response has two parts:
-    #         resp.raw_response.url: the url, again
-    #         resp.raw_response.content: the content of the page!
-    # Return a list with the hyperlinks (as strings) scrapped from resp.raw_response.content
-
-    all_links = []
-
-    if resp.status != 200:
-        print(f"error is {resp.error}")
-        return []
-    
-    #if the raw file is too large, don't go through it
-    raw_content = resp.raw_response.content
-    if len(raw_content) > MAX_SIZE:
-        return []
-    
-    soup = Bs(raw_content, 'html.parser')
-    
-    #tokenize content
-    #check is near
-    # return
-    
-
-    # count words (for q2)
-    text = soup.get_text(separator=" ")
-    words = text.split()
-    word_count = len(words)
-
-    #if the file it too small, it is not meaningful
-    if word_count < 100:
-        return []
-
-    #file is too large and not enough content in it 
-    if word_count < 300 and len(raw_content) > 500_000:
-        return []
-        
-    
-    tokenized_text = tokenize(text)
-    if is_duplicate(tokenized_text):
-        return []
-
-    if word_count > longest_word_count[0]:
-        longest_word_count[0] = word_count
-        longest_word_count_url[0] = resp.url
-    
-    #increment the word counter for each word not in stopwords
-    for word in words:
-        #get rid of the punctioation like periods and commas
-        normalized_word = word.lower().strip(string.punctuation)
-
-        #make sure only words are added and not junk
-        if normalized_word not in stop_words and word.isalpha():
-            word_counter[normalized_word] += 1
-
-        
-    links = soup.find_all('a', href=True)
-
-    for tag in links:
-        href = tag['href']
-
-        #join urls
-        absolute_url = urljoin(resp.url, href)
-
-        #take away fragment
-        defragmented_url, _ = urldefrag(absolute_url)
-
-        all_links.append(defragmented_url)
-
-    return all_links
-
-def is_valid(url) -> bool:
-    # Decide whether to crawl this url or not. 
-    # If you decide to crawl it, return True; otherwise return False.
-    # There are already some conditions that return False.
-    valid_domains = {
-        "ics.uci.edu",
-        "cs.uci.edu",
-        "informatics.uci.edu",
-        "stat.uci.edu",
-        #"today.uci.edu/department/information_computer_sciences/"
-        #this is an odd case, make sure to implement correctly
-        "today.uci.edu"
-    }
-    
-    
-    try:
-        parsed = urlparse(url)
-        if parsed.scheme not in set(["http", "https"]):
-            return False
-        
-        #get domain
-        domain = parsed.netloc.lower()
-
-        #initialize to falase
-        is_valid_domain = False
-        for valid_domain in valid_domains:
-            #if the domain is valid
-            if domain.endswith(valid_domain):
-                
-                #special case where the domain and begining of path is diff
-                if valid_domain == "today.uci.edu":
-                    if not parsed.path.startswith("/department/information_computer_sciences/"):
-                        return False
-                is_valid_domain = True
-                break
-        
-        if not is_valid_domain:
-            return False
-        
-        #block the most common extensions that I found that weren't webpages
-        if parsed.path.lower().endswith(blocked_extensions):
-            return False
-        #need to add this to make sure it doesn't get stuck in calendar traps
-        if re.search(r'/day/\d{4}-\d{2}-\d{2}', parsed.path):
-            return False
-        #another calendar format
-        if re.search(r'/\d{4}-\d{2}', parsed.path):
-            return False
-        #based on query parse out the traps and lengths
-        if not good_query(parsed.query):
-            return False
-        
-        return not re.match(
-            r".*\.(css|js|bmp|gif|jpe?g|ico"
-            + r"|png|tiff?|mid|mp2|mp3|mp4"
-            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            + r"|epub|dll|cnf|tgz|sha1"
-            + r"|thmx|mso|arff|rtf|jar|csv"
-            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower())
-
-    except TypeError:
-        print ("TypeError for ", parsed)
-        raise
-
-def good_query(parsed_query):
-    
-    query_params = parse_qs(parsed_query)
-    for param in blocked_params:
-        if param in query_params:
-            return False
-
-    # really long querys tend to seem to be traps
-    if len(parsed_query) > 100:
-        return False
-    return True
-        
-def write_report():
-    top_50_words = sorted(word_counter.items(), key=lambda item: item[1], reverse=True)[:50]
-
-    with open("report.txt", "w") as file:
-        file.write(f"Unique pages: {len(unique_pages)}\n")
-        file.write(f"Longest word count url: {longest_word_count_url[0]}\n")
-        file.write(f"Longest word count: {longest_word_count[0]}\n")
-        for word, count in top_50_words:
-            file.write(f"{word}: {count}\n")       
-        
-        file.write(f"Total subdomains: {len(subdomain_counter)}\n")
-
-        for key in sorted(subdomain_counter.keys()):
-            file.write(f"{key}: {subdomain_counter[key]}\n")
-            
-def test_is_valid():
-    url1 = "https://ics.uci.edu/"
-    url2 = 'https://ics.uci.edu/research-areas/'
-    url3 = "https://today.uci.edu/department/information_computer_sciences/"
-    url4  = "https://today.uci.edu/department/nah/fdsadfasfasd"
-    
-    assert(is_valid(url1) == True)
-    assert(is_valid(url2) == True)
-    assert(is_valid(url3) == True)
-    assert(is_valid(url4) == False)
-    
-if __name__ == "__main__":
+import logging
+import re
+from urllib.parse import urlparse, urldefrag, urljoin, parse_qs
+from bs4 import BeautifulSoup as Bs
+from typing import List, Mapping, Optional, Set
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+from threading import RLock
+import string 
+import time
+from utils.lsh import MinHashLSH
+from utils.extract import extract
+from utils.url_filter import URLFilter
+from utils.canonical import Canonicalizer
+from utils.analytics import WordCounter, report_words
+from utils.exact_dedup import ExactDuplicates
+from utils.urlstore import URLSet
+from utils.metrics import metrics
+
+# Logs/SCRAPER.log once the Crawler attaches it to the log pipeline
+logger = logging.getLogger("SCRAPER")
+
+# guards the module level report state below when THREADCOUNT > 1
+state_lock = RLock()
+
+#set of all defragmented urls (for q1), packed, millions of strs take gigabytes
+unique_pages = URLSet()
+# new unique pages since the last report checkpoint, None when there is no checkpoint
+page_journal: Optional[List[str]] = None
+
+# word count 
+# made into list because lists are mutable
+longest_word_count: List[int] = [0]
+longest_word_count_url: List[str] = [""]
+
+#all stopwords given to ignore
+# can't use previous assignment tokenization because some of these stopwords use certain punctuation
+stop_words = {
+    "a", "about", "above", "after", "again", "against", "all", "am", "an", "and", "any", 
+    "are", "aren't", "as", "at", "be", "because", "been", "before", "being", "below", 
+    "between", "both", "but", "by", "can't", "cannot", "could", "couldn't", "did", 
+    "didn't", "do", "does", "doesn't", "doing", "don't", "down", "during", "each", "few", 
+    "for", "from", "further", "had", "hadn't", "has", "hasn't", "have", "haven't", 
+    "having", "he", "he'd", "he'll", "he's", "her", "here", "here's", "hers", "herself", 
+    "him", "himself", "his", "how", "how's", "i", "i'd", "i'll", "i'm", "i've", "if", "in", 
+    "into", "is", "isn't", "it", "it's", "its", "itself", "let's", "me", "more", "most", 
+    "mustn't", "my", "myself", "no", "nor", "not", "of", "off", "on", "once", "only", "or", 
+    "other", "ought", "our", "ours", "ourselves", "out", "over", "own", "same", "shan't", 
+    "she", "she'd", "she'll", "she's", "should", "shouldn't", "so", "some", "such", 
+    "than", "that", "that's", "the", "their", "theirs", "them", "themselves", "then", 
+    "there", "there's", "these", "they", "they'd", "they'll", "they're", "they've", 
+    "this", "those", "through", "to", "too", "under", "until", "up", "very", "was", 
+    "wasn't", "we", "we'd", "we'll", "we're", "we've", "were", "weren't", "what", 
+    "what's", "when", "when's", "where", "where's", "which", "while", "who", "who's", 
+    "whom", "why", "why's", "with", "won't", "would", "wouldn't", "you", "you'd", 
+    "you'll", "you're", "you've", "your", "yours", "yourself", "yourselves"
+}
+
+blocked_extensions = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.css', '.js', '.zip', '.mp4', '.doc', '.docx', '.ppt', '.pptx', '.md')
+
+# sharded per thread, the Crawler swaps in a bounded one when WORDCAPACITY is set
+word_counter = WordCounter()
+
+subdomain_counter: Mapping[str, int] = defaultdict(int)
+
+#seemed to perform the best
+SIMILARITY_THRESHOLD = 0.85
+# more bands catch more near duplicates (recall), more rows per band means fewer
+# candidates to verify (precision). 10 x 6 catches ~99% of pairs at 0.85
+LSH_BANDS = 10
+LSH_ROWS = 6
+
+near_duplicate = MinHashLSH(SIMILARITY_THRESHOLD, LSH_BANDS, LSH_ROWS)
+
+MAX_SIZE = 1_000_000
+# the pickled response carries headers and such on top of the page, bigger than this
+# the page is over MAX_SIZE for sure and is never unpickled
+MAX_RAW_SIZE = MAX_SIZE + 65_536
+
+# pages with fewer tokens than this are never checked for near duplicates
+MIN_TOKEN_COUNT = 10
+
+# concurrent.futures.ProcessPoolExecutor set by the Crawler when PARSEPROCESSES > 0
+parse_pool = None
+
+# PARSER = fast swaps the soup for the single pass extractor in utils.extract
+fast_extractor = False
+
+# pages with the same bytes as one parsed before, the Crawler swaps in the EXACTDEDUP settings
+exact_duplicates = ExactDuplicates()
+
+# some blocked params that appeared in some traps
+#add more later
+blocked_params: List[str]= [
+    'share', 'tab_details', 'tab_files', 'do', 'image', 'ns', 'ical','outlook-ical', 'do', 'image' 
+]
+
+valid_domains: List[str] = [
+    "ics.uci.edu",
+    "cs.uci.edu",
+    "informatics.uci.edu",
+    "stat.uci.edu",
+    #only this part of today.uci.edu is ics
+    "today.uci.edu/department/information_computer_sciences/"
+]
+
+#not webpages, on top of blocked_extensions
+more_blocked_extensions: List[str] = (
+    "css|js|bmp|gif|jpeg|jpg|ico"
+    "|png|tiff|tif|mid|mp2|mp3|mp4"
+    "|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+    "|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+    "|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+    "|epub|dll|cnf|tgz|sha1"
+    "|thmx|mso|arff|rtf|jar|csv"
+    "|rm|smil|wmv|swf|wma|zip|rar|gz").split("|")
+
+trap_patterns: List[str] = [
+    #need to add this to make sure it doesn't get stuck in calendar traps
+    r'/day/\d{4}-\d{2}-\d{2}',
+    #another calendar format
+    r'/\d{4}-\d{2}',
+]
+
+# really long querys tend to seem to be traps
+MAX_QUERY_LENGTH = 100
+
+# all of the above compiled once, the Crawler swaps in the [FILTER] rules from config.ini
+url_filter = URLFilter(
+    valid_domains, list(blocked_extensions) + more_blocked_extensions, trap_patterns,
+    blocked_params, MAX_QUERY_LENGTH)
+
+# equivalent urls collapsed to one form, the Crawler swaps in the [CANONICAL] rules
+canonicalizer = Canonicalizer()
+
+def canonical_url(url) -> str:
+    return canonicalizer.canonical(url)
+
+def scraper(url, resp):
+    return scrape(url, resp).links
+
+def scrape(url, resp) -> "PageReport":
+    """
+    scraper() plus what the page was worth, for the frontier's trap detector.
+    """
+    report = scrape_page(url, resp)
+    
+    # remove fragment and add to unique set
+    defragmented_url, _ = urldefrag(resp.url)
+
+    with state_lock:
+        if defragmented_url not in unique_pages:
+            unique_pages.add(defragmented_url)
+            if page_journal is not None:
+                page_journal.append(defragmented_url)
+            parsed = urlparse(defragmented_url)
+
+            #make sure its in uci.edu domain
+            if parsed.netloc.endswith(".uci.edu"):
+                subdomain_counter[parsed.netloc] += 1
+    
+    with metrics.timer("filter"):
+        links = url_filter.filter_links(canonicalizer.canonical_links(report.links))
+    return report._replace(links=links)
+
+def tokenize(text: str) -> List[str]:
+    text = text.lower()
+    
+    tokens = re.findall(r'\b[a-zA-Z]{2,}\b', text)
+    return tokens
+
+def custom_hash(s):
+    """
+    Took this from Geeks for Geeks since we aren't allowed to use a library for the hashing
+    """
+    n = len(s)
+
+    # p is a prime number
+    # m is a large prime number
+    p = 31
+    m = int(1e9 + 7)
+
+    # to store hash value
+    hashVal = 0
+
+    # to store p^i
+    pPow = 1
+
+    # Calculating hash value
+    for i in range(n):
+        hashVal = (hashVal + (ord(s[i]) - ord('a') + 1) * pPow) % m
+        pPow = (pPow * p) % m
+    return hashVal
+
+# same constants as custom_hash
+HASH_BASE = 31
+HASH_MOD = int(1e9 + 7)
+# the ' ' joining the words of a trigram, weighted the way custom_hash weighs characters
+SPACE_WEIGHT = ord(' ') - ord('a') + 1
+
+@lru_cache(maxsize=1 << 16)
+def token_hash(token):
+    """
+    Per word pieces needed to combine custom_hash values without touching characters again.
+    Returns (custom_hash(token), p^len, (space + p * hash) % m, p^(len + 1)).
+    """
+    h = custom_hash(token)
+    power = pow(HASH_BASE, len(token), HASH_MOD)
+    tail = (SPACE_WEIGHT + HASH_BASE * h) % HASH_MOD
+    return h, power, tail, (power * HASH_BASE) % HASH_MOD
+
+def fingerprint(tokens) -> Set[int]:
+    """
+    Returns the same selected hashes as running custom_hash over every ' '.join(trigram)
+    and keeping h % 4 == 0, but hashes each distinct word once and combines the three
+    word hashes with the polynomial shift rule:
+        hash(a + ' ' + b + ' ' + c) = hash(a) + p^len(a) * (tail(b) + p^(len(b) + 1) * tail(c))
+    """
+    hashed = [token_hash(token) for token in tokens]
+    m = HASH_MOD
+
+    selected_hashes = set()
+    for i in range(len(hashed) - 2):
+        h1, power1, _, _ = hashed[i]
+        _, _, tail2, shift2 = hashed[i + 1]
+        tail3 = hashed[i + 2][2]
+        h = (h1 + power1 * ((tail2 + shift2 * tail3) % m)) % m
+        if h % 4 == 0:
+            selected_hashes.add(h)
+    return selected_hashes
+
+def is_duplicate(tokens) -> bool:
+    #too small
+    if len(tokens) < MIN_TOKEN_COUNT:
+        return False
+    
+    #hash the trigrams and select a fingerprint subset
+    return is_near_duplicate(fingerprint(tokens))
+
+def is_near_duplicate(selected_hashes) -> bool:
+    #compare to already existing fingerprints through the lsh buckets
+    with state_lock:
+        return near_duplicate.check_and_add(selected_hashes)
+
+# what analyze_page hands back, plain data so it can come back from a parse process
+PageStats = namedtuple("PageStats", ["links", "word_count", "counted_words", "fingerprint"])
+
+# what a fetched page gave the crawl: its links, its word count (0 when it was thin or
+# never parsed), whether it was a near duplicate of a page seen before and its fingerprint
+PageReport = namedtuple("PageReport", ["links", "word_count", "duplicate", "fingerprint"])
+NOTHING = PageReport([], 0, False, None)
+
+def analyze_page(page_url, raw_content, fast=False) -> Optional[PageStats]:
+    """
+    All the parsing for one page, without touching any of the global report state.
+    Runs in the worker thread, or in a parse process when PARSEPROCESSES is set.
+    Returns None for pages that are not worth keeping.
+    """
+    if fast:
+        #same text and hrefs as the soup, in one pass without building the tree
+        text, hrefs = extract(raw_content)
+    else:
+        soup = Bs(raw_content, 'html.parser')
+        text = soup.get_text(separator=" ")
+        hrefs = [tag['href'] for tag in soup.find_all('a', href=True)]
+
+    # count words (for q2)
+    words = text.split()
+    word_count = len(words)
+
+    #if the file it too small, it is not meaningful
+    if word_count < 100:
+        return None
+
+    #file is too large and not enough content in it 
+    if word_count < 300 and len(raw_content) > 500_000:
+        return None
+
+    tokenized_text = tokenize(text)
+    #too small to fingerprint, never a duplicate
+    selected_hashes = fingerprint(tokenized_text) if len(tokenized_text) >= MIN_TOKEN_COUNT else None
+
+    #count each word not in stopwords, merged into word_counter by record_page
+    #only words are added and not junk, in one batch for the whole page
+    counted_words = report_words(words, stop_words)
+
+    all_links = []
+    for href in hrefs:
+        #join urls
+        absolute_url = urljoin(page_url, href)
+
+        #take away fragment
+        defragmented_url, _ = urldefrag(absolute_url)
+
+        all_links.append(defragmented_url)
+
+    return PageStats(all_links, word_count, counted_words, selected_hashes)
+
+def record_page(page_url, stats) -> PageReport:
+    """
+    Applies an analyze_page result to the report state, returns the page's PageReport.
+    """
+    if stats is None:
+        return NOTHING
+    with metrics.timer("dedup"):
+        duplicate = stats.fingerprint is not None and is_near_duplicate(stats.fingerprint)
+    if duplicate:
+        return PageReport([], stats.word_count, True, stats.fingerprint)
+
+    with state_lock:
+        if stats.word_count > longest_word_count[0]:
+            longest_word_count[0] = stats.word_count
+            longest_word_count_url[0] = page_url
+
+
+    #its own shard, no need for the state lock
+    word_counter.update(stats.counted_words)
+    return PageReport(stats.links, stats.word_count, False, stats.fingerprint)
+
+def extract_next_links(url, resp) -> List[str]:
+    # Implementation required.
+    # url: the URL that was used to get the page
+    # resp.url: the actual url of the page
+    # resp.status: the status code returned by the server. 200 is OK, you got the page. Other numbers mean that there was some kind of problem.
+    # resp.error: when status is not 200, you can check the error here, if needed.
+    # resp.raw_response: this is where the page actually is. More specifically, the raw_response has two parts:
+    #         resp.raw_response.url: the url, again
+    #         resp.raw_response.content: the content of the page!
+    # Return a list with the hyperlinks (as strings) scrapped from resp.raw_response.content
+
+    return scrape_page(url, resp).links
+
+def scrape_page(url, resp) -> PageReport:
+    """
+    extract_next_links with the word count and duplicate check result kept.
+    """
+    if resp.status != 200:
+        logger.info("error is %s", resp.error, extra={"url": url, "status": resp.status})
+        return NOTHING
+    
+    #if the raw file is too large, don't go through it, check before unpickling it
+    if resp.raw_size > MAX_RAW_SIZE:
+        resp.skip_raw_response()
+        return NOTHING
+    raw_response = resp.raw_response
+    if raw_response is None or not is_html(raw_response.headers.get("Content-Type", "")):
+        return NOTHING
+    raw_content = raw_response.content
+    if len(raw_content) > MAX_SIZE:
+        return NOTHING
+
+    #same bytes as a page parsed before, same answer without parsing it again
+    digest = None
+    if exact_duplicates.enabled:
+        with metrics.timer("dedup"):
+            digest = exact_duplicates.digest(raw_content)
+            known = exact_duplicates.get(digest)
+        if known is not None:
+            return PageReport([], known, True, None) if known else NOTHING
+
+    #parse in another process if there is a pool, this thread just waits on it
+    clock = time.perf_counter if parse_pool is not None else time.thread_time
+    start = clock()
+    with metrics.timer("parse"):
+        if parse_pool is not None:
+            stats = parse_pool.submit(analyze_page, resp.url, raw_content, fast_extractor).result()
+        else:
+            stats = analyze_page(resp.url, raw_content, fast_extractor)
+    report = record_page(resp.url, stats)
+    if digest is not None:
+        #only thin pages and the ones the near duplicate index saw, see ExactDuplicates
+        word_count = 0 if stats is None else stats.word_count if stats.fingerprint is not None else None
+        exact_duplicates.add(digest, word_count, clock() - start)
+    return report
+
+def is_html(content_type) -> bool:
+    #pdfs, images, archives and such have no text or links worth parsing
+    #no header or any text/* and xml type is still parsed like before
+    content_type = content_type.split(";")[0].strip().lower()
+    return not content_type or content_type.startswith("text/") or "html" in content_type or "xml" in content_type
+
+def is_valid(url) -> bool:
+    # Decide whether to crawl this url or not. 
+    # If you decide to crawl it, return True; otherwise return False.
+    # The rules are the lists at the top of this file, see utils/url_filter.py
+    try:
+        return url_filter.is_valid(url)
+    except TypeError:
+        logger.error("TypeError for %s", url)
+        raise
+
+def good_query(parsed_query):
+    return url_filter.good_query(parsed_query)
+        
+def write_report(path="report.txt"):
+    top_50_words = word_counter.most_common(50)
+
+    with open(path, "w") as file:
+        file.write(f"Unique pages: {len(unique_pages)}\n")
+        file.write(f"Longest word count url: {longest_word_count_url[0]}\n")
+        file.write(f"Longest word count: {longest_word_count[0]}\n")
+        for word, count in top_50_words:
+            file.write(f"{word}: {count}\n")       
+        
+        file.write(f"Total subdomains: {len(subdomain_counter)}\n")
+
+        for key in sorted(subdomain_counter.keys()):
+            file.write(f"{key}: {subdomain_counter[key]}\n")
+            
+def test_is_valid():
+    url1 = "https://ics.uci.edu/"
+    url2 = 'https://ics.uci.edu/research-areas/'
+    url3 = "https://today.uci.edu/department/information_computer_sciences/"
+    url4  = "https://today.uci.edu/department/nah/fdsadfasfasd"
+    
+    assert(is_valid(url1) == True)
+    assert(is_valid(url2) == True)
+    assert(is_valid(url3) == True)
+    assert(is_valid(url4) == False)
+    
+if __name__ == "__main__":
     test_is_valid()
\ No newline at end of file
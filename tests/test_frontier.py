@@ -0,0 +1,43 @@
+import random
+import threading
+from collections import Counter
+
+import pytest
+
+from benchmarks.stress_frontier import StressConfig, make_graph, reachable
+from crawler.frontier import Frontier
+
+
+def crawl(frontier, graph, fetched):
+    while True:
+        url = frontier.get_tbd_url()
+        if not url:
+            break
+        fetched.append(url)
+        for link in graph.get(url, []):
+            frontier.add_url(link, url)
+        frontier.mark_url_complete(url)
+
+
+@pytest.mark.parametrize("store", ["shelve", "sqlite"])
+@pytest.mark.parametrize("threads", [1, 8])
+def test_threads_drain_the_frontier(tmp_path, store, threads):
+    graph = make_graph(random.Random(threads), 8, 400, 10)
+    config = StressConfig(str(tmp_path / "save"), store, 8)
+    frontier = Frontier(config, True)
+    fetched = []
+    workers = [threading.Thread(target=crawl, args=(frontier, graph, fetched), daemon=True)
+               for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+    try:
+        assert not any(worker.is_alive() for worker in workers)
+        assert not [url for url, times in Counter(fetched).items() if times > 1]
+        assert set(fetched) == reachable(graph, config.seed_urls)
+        assert all(completed for _, completed in frontier.save.values())
+        assert frontier.in_flight == 0 and not frontier.to_be_downloaded
+        assert frontier.get_tbd_url() is None
+    finally:
+        frontier.close()
@@ -0,0 +1,32 @@
+from utils.lsh import MinHashLSH
+
+
+def test_signature_of_empty_fingerprint():
+    lsh = MinHashLSH()
+    assert lsh.signature(frozenset()) is None
+    assert lsh.signature([]) is None
+    assert lsh.signature(iter(())) is None
+
+
+def test_signature_fills_every_bin():
+    lsh = MinHashLSH()
+    signature = lsh.signature({12345})
+    assert len(signature) == lsh.num_perm
+    assert None not in signature
+
+
+def test_empty_fingerprint_has_no_candidates():
+    lsh = MinHashLSH()
+    lsh.add(set(range(100)))
+    lsh.add(set())
+    assert lsh.candidates(set()) == set()
+    assert lsh.candidates(iter(())) == set()
+    assert not lsh.query(set())
+    assert not lsh.check_and_add(set())
+
+
+def test_near_duplicates_are_found():
+    lsh = MinHashLSH(threshold=0.85)
+    assert not lsh.check_and_add(range(1000))
+    assert lsh.check_and_add(range(10, 1000))
+    assert not lsh.check_and_add(range(5000, 6000))
@@ -0,0 +1,85 @@
+import pytest
+
+from crawler.policy import POLICIES, make_policy
+from crawler.scheduler import HostScheduler
+
+
+def scheduler(name, delay=1.0):
+    return HostScheduler(delay, make_policy(name))
+
+
+@pytest.mark.parametrize("name", POLICIES)
+def test_busy_host_is_not_handed_out(name):
+    urls = scheduler(name)
+    urls.push("https://a.ics.uci.edu/1")
+    urls.push("https://a.ics.uci.edu/2")
+    start, url = urls.pop(0.0)
+    assert start == 0.0
+    # the other url waits for done(), however late it is asked for
+    assert urls.pop(100.0) is None
+    assert len(urls) == 1
+    assert urls.done("a.ics.uci.edu", 100.0)
+    assert urls.pop(100.0)[1] != url
+    assert not urls
+
+
+@pytest.mark.parametrize("name", POLICIES)
+def test_other_hosts_go_while_one_is_busy(name):
+    urls = scheduler(name)
+    urls.push("https://a.ics.uci.edu/1")
+    urls.push("https://a.ics.uci.edu/2")
+    urls.push("https://b.ics.uci.edu/1")
+    hosts = {urls.pop(0.0)[1].split("/")[2], urls.pop(0.0)[1].split("/")[2]}
+    assert hosts == {"a.ics.uci.edu", "b.ics.uci.edu"}
+    assert urls.pop(0.0) is None
+
+
+@pytest.mark.parametrize("name", POLICIES)
+def test_delay_starts_when_the_fetch_is_done(name):
+    urls = scheduler(name, delay=1.0)
+    urls.push("https://a.ics.uci.edu/1")
+    urls.push("https://a.ics.uci.edu/2")
+    urls.pop(0.0)
+    # a fetch slower than the delay, the next one still waits a delay after it
+    urls.done("a.ics.uci.edu", 5.0)
+    start, _ = urls.pop(5.0)
+    assert start == 6.0
+
+
+@pytest.mark.parametrize("name", POLICIES)
+def test_done_without_urls_waiting(name):
+    urls = scheduler(name)
+    urls.push("https://a.ics.uci.edu/1")
+    urls.pop(0.0)
+    assert not urls.done("a.ics.uci.edu", 0.5)
+    # done() for a host with no fetch out changes nothing
+    assert not urls.done("a.ics.uci.edu", 0.5)
+    urls.push("https://a.ics.uci.edu/2")
+    assert urls.pop(0.5)[0] == 1.5
+
+
+@pytest.mark.parametrize("name", POLICIES)
+def test_discard_while_busy(name):
+    urls = scheduler(name)
+    for page in range(3):
+        urls.push(f"https://a.ics.uci.edu/{page}")
+    _, url = urls.pop(0.0)
+    removed = urls.discard("a.ics.uci.edu", lambda queued: True)
+    assert len(removed) == 2 and url not in removed
+    assert not urls
+    # the emptied host is freed without being handed out again
+    assert not urls.done("a.ics.uci.edu", 1.0)
+    assert urls.pop(10.0) is None
+    urls.push("https://a.ics.uci.edu/3")
+    assert urls.pop(10.0) == (10.0, "https://a.ics.uci.edu/3")
+
+
+@pytest.mark.parametrize("name", POLICIES)
+def test_defer_holds_the_host_back(name):
+    urls = scheduler(name)
+    urls.push("https://a.ics.uci.edu/1")
+    urls.push("https://a.ics.uci.edu/2")
+    urls.pop(0.0)
+    urls.defer("a.ics.uci.edu", 300.0)
+    assert urls.done("a.ics.uci.edu", 0.5)
+    assert urls.pop(0.5)[0] == 300.0
@@ -0,0 +1,86 @@
+import asyncio
+
+import cbor
+
+from utils.download import CHUNK_SIZE, too_large
+from utils.response import Response, count
+from utils.archive import record, replay
+
+try:
+    import aiohttp
+except ImportError:
+    # optional, only needed when ASYNCDOWNLOADS is set
+    aiohttp = None
+
+# statuses worth another try, same as the pooled session in utils.download
+RETRY_STATUSES = {502, 503, 504}
+
+
+def make_session(config):
+    if aiohttp is None:
+        raise RuntimeError("ASYNCDOWNLOADS needs aiohttp, python -m pip install aiohttp")
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=config.async_downloads),
+        timeout=aiohttp.ClientTimeout(total=config.timeout))
+
+
+async def read_limited(resp, limit):
+    ''' utils.download.read_limited for an aiohttp response. '''
+    length = resp.content_length
+    if limit and length is not None and length > limit:
+        count(skipped=1, bytes_saved=length)
+        return None
+    chunks = []
+    read = 0
+    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+        chunks.append(chunk)
+        read += len(chunk)
+        if limit and read > limit:
+            count(aborted=1, bytes_read=read,
+                  bytes_saved=max(length - read, 0) if length is not None else 0)
+            return None
+    count(bytes_read=read)
+    return b"".join(chunks)
+
+
+async def download_async(url, config, session, logger=None):
+    ''' Same contract as utils.download.download, for use inside an event loop. '''
+    if config.replay:
+        if config.replay_latency:
+            await asyncio.sleep(config.replay_latency)
+        return replay(url, config)
+    host, port = config.cache_server
+    params = [("q", f"{url}"), ("u", f"{config.user_agent}")]
+    error = None
+    for attempt in range(config.retries + 1):
+        if attempt:
+            await asyncio.sleep(config.backoff * (2 ** (attempt - 1)))
+        try:
+            async with session.get(f"http://{host}:{port}/", params=params) as resp:
+                if resp.status in RETRY_STATUSES and attempt < config.retries:
+                    continue
+                content = await read_limited(resp, config.max_download)
+                if content is None:
+                    logger.info(f"Skipped {url}, over {config.max_download} bytes.")
+                    return too_large(url, config.max_download)
+                try:
+                    if resp.status < 400 and content:
+                        response = Response(cbor.loads(content))
+                        record(config, url, response.status, content)
+                        return response
+                except (EOFError, ValueError):
+                    pass
+                logger.error(f"Spacetime Response error {resp.status} with url {url}.")
+                error = {
+                    "error": f"Spacetime Response error {resp.status} with url {url}.",
+                    "status": resp.status,
+                    "url": url}
+                record(config, url, resp.status, cbor.dumps(error))
+                return Response(error)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = e
+    logger.error(f"Spacetime Request error {error} with url {url}.")
+    return Response({
+        "error": f"Spacetime Request error {error} with url {url}.",
+        "status": 0,
+        "url": url})
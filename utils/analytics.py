@@ -0,0 +1,157 @@
+import heapq
+import threading
+from collections import Counter
+from operator import itemgetter
+
+
+def report_words(words, stop_words):
+    '''
+    The page's words the report counts: letters only, lower cased, no stop words. Same
+    words as the old per word lower/strip/isalpha loop, a word that is all letters has
+    no punctuation to strip. A list and not a Counter, Counter.update counts a list in C.
+    '''
+    return [word for word in map(str.lower, filter(str.isalpha, words))
+            if word not in stop_words]
+
+
+class SpaceSaving(object):
+    '''
+    Bounded top-k summary (Space-Saving, Metwally et al.). Keeps at most 2 * capacity
+    words, when full it keeps the capacity largest and remembers the largest count it
+    dropped. A word that comes back starts from that count, so every count is an upper
+    bound, over by at most its error, and any word counted more often than the floor
+    is in the summary.
+    '''
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = dict()
+        self.errors = dict()
+        self.floor = 0
+
+    def update(self, counts):
+        summary = self.counts
+        errors = self.errors
+        for word, count in counts.items():
+            if word in summary:
+                summary[word] += count
+            else:
+                summary[word] = self.floor + count
+                if self.floor:
+                    errors[word] = self.floor
+        if len(summary) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self):
+        keep = heapq.nlargest(self.capacity, self.counts.items(), key=itemgetter(1))
+        kept = dict(keep)
+        self.floor = max(self.floor, max(count for word, count in self.counts.items()
+                                         if word not in kept))
+        # kept in first seen order like a Counter, ties in the top k come out the same
+        self.counts = {word: count for word, count in self.counts.items() if word in kept}
+        self.errors = {word: error for word, error in self.errors.items() if word in kept}
+
+    def items(self):
+        return self.counts.items()
+
+    def error(self, word):
+        return self.errors.get(word, 0)
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class WordCounter(object):
+    '''
+    Word frequencies for the report. Every thread counts a page's words into its own
+    shard without a shared lock, shards are folded into the total once they hold
+    shard_size words and when the counts are read. The total is a Counter (exact)
+    or, with capacity set, a SpaceSaving summary of bounded size.
+    '''
+    def __init__(self, capacity=0, shard_size=1 << 16):
+        self.capacity = capacity
+        self.shard_size = shard_size
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.shards = []
+        self.total = SpaceSaving(capacity) if capacity else Counter()
+        # folded counts drain() has not handed out yet, None until start_journal()
+        self.journal = None
+
+    def _shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = [threading.Lock(), Counter()]
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+
+    def update(self, words):
+        ''' Counts one page's words (a list, or a mapping of counts). '''
+        shard = self._shard()
+        with shard[0]:
+            shard[1].update(words)
+            full = len(shard[1]) >= self.shard_size
+        if full:
+            self._fold(shard)
+
+    def _fold(self, shard):
+        with shard[0]:
+            counts, shard[1] = shard[1], Counter()
+        with self.lock:
+            self.total.update(counts)
+            if self.journal is not None:
+                self.journal.append(counts)
+
+    def merge(self):
+        ''' Folds every shard into the total, returns the total. '''
+        with self.lock:
+            shards = list(self.shards)
+        for shard in shards:
+            self._fold(shard)
+        return self.total
+
+    def start_journal(self):
+        ''' From now on drain() returns the counts added since its last call. '''
+        self.merge()
+        with self.lock:
+            self.journal = []
+
+    def drain(self):
+        ''' The counts added since the last drain, for checkpoints. '''
+        self.merge()
+        with self.lock:
+            journal, self.journal = self.journal, []
+        delta = Counter()
+        for counts in journal:
+            delta.update(counts)
+        return delta
+
+    def load(self, counts):
+        ''' Adds counts restored from a checkpoint, before counting starts. '''
+        with self.lock:
+            self.total.update(counts)
+
+    def most_common(self, k):
+        ''' The k most counted words, ties in first counted order like sorted(). '''
+        total = self.merge()
+        with self.lock:
+            return heapq.nlargest(k, total.items(), key=itemgetter(1))
+
+    def items(self):
+        total = self.merge()
+        with self.lock:
+            return list(total.items())
+
+    def values(self):
+        return [count for _, count in self.items()]
+
+    def __len__(self):
+        return len(self.merge())
+
+    def clear(self):
+        with self.lock:
+            for shard in self.shards:
+                with shard[0]:
+                    shard[1].clear()
+            self.total = SpaceSaving(self.capacity) if self.capacity else Counter()
+            self.journal = None
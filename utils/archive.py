@@ -0,0 +1,176 @@
+'''
+Recorded cache server responses, so a crawl can be replayed offline and runs compared.
+The archive is one append only file of records:
+    url length, body length, status (<IIiI with the crc32 of the body), url, body
+where the body is the cache server's cbor answer (status, url, error and the pickled
+page) compressed with zlib. <archive>.idx holds the offset of every url, written when
+the recorder closes; without it, or when the archive grew since, opening the archive
+scans the record headers instead and drops a record torn by a crash.
+'''
+import os
+import struct
+import threading
+import zlib
+from array import array
+
+import cbor
+
+from utils.response import Response
+
+RECORD = struct.Struct("<IIiI")
+# archive size the index was written at, how many urls
+INDEX = struct.Struct("<QQ")
+
+# one recorder and one reader per archive path, shared by every worker thread
+_recorders = dict()
+_archives = dict()
+_lock = threading.Lock()
+
+
+class ArchiveRecorder(object):
+    ''' Appends responses to an archive, thread safe. A url recorded again replaces the older one. '''
+    def __init__(self, path):
+        self.path = path
+        self.offsets = dict()
+        if os.path.exists(path):
+            # carry on after the last whole record, a torn one is dropped
+            offsets, end = _scan(path)
+            self.offsets.update(offsets)
+            with open(path, "r+b") as file:
+                file.truncate(end)
+        self.file = open(path, "ab")
+        self.lock = threading.Lock()
+
+    def add(self, url, status, content):
+        ''' content is the cbor body as the cache server sent it. '''
+        body = zlib.compress(content, 6)
+        encoded = url.encode("utf-8")
+        record = RECORD.pack(len(encoded), len(body), status, zlib.crc32(body)) + encoded + body
+        with self.lock:
+            self.offsets[url] = self.file.tell()
+            self.file.write(record)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+            _write_index(self.path, self.offsets)
+
+
+class Archive(object):
+    ''' Read side of an archive: url -> Response, thread safe. '''
+    def __init__(self, path):
+        self.path = path
+        self.offsets = _read_index(path)
+        if self.offsets is None:
+            self.offsets, _ = _scan(path)
+            self.offsets = dict(self.offsets)
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, url):
+        return url in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def content(self, url):
+        ''' The recorded cbor body of url, None if it was never recorded. '''
+        offset = self.offsets.get(url)
+        if offset is None:
+            return None
+        header = os.pread(self.fd, RECORD.size, offset)
+        url_length, body_length, _, _ = RECORD.unpack(header)
+        body = os.pread(self.fd, body_length, offset + RECORD.size + url_length)
+        return zlib.decompress(body)
+
+    def get(self, url):
+        ''' The recorded Response of url, a 404 like the cache server's when it was never recorded. '''
+        content = self.content(url)
+        if content is None:
+            return Response({
+                "error": f"{url} is not in the archive {self.path}.",
+                "status": 404,
+                "url": url})
+        return Response(cbor.loads(content))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _scan(path):
+    ''' [(url, offset)] of every complete record and where the last one ends. '''
+    offsets = []
+    with open(path, "rb") as file:
+        data = file.read()
+    offset = 0
+    while offset + RECORD.size <= len(data):
+        url_length, body_length, _, crc = RECORD.unpack_from(data, offset)
+        start = offset + RECORD.size
+        end = start + url_length + body_length
+        if end > len(data) or zlib.crc32(data[start + url_length:end]) != crc:
+            break
+        offsets.append((data[start:start + url_length].decode("utf-8"), offset))
+        offset = end
+    return offsets, offset
+
+
+def _write_index(path, offsets):
+    urls = list(offsets)
+    positions = array("Q", (offsets[url] for url in urls))
+    temporary = path + ".idx.tmp"
+    with open(temporary, "wb") as file:
+        file.write(INDEX.pack(os.path.getsize(path), len(urls)))
+        file.write(positions.tobytes())
+        file.write(zlib.compress("\n".join(urls).encode("utf-8")))
+    os.replace(temporary, path + ".idx")
+
+
+def _read_index(path):
+    ''' url -> offset from the index, None if there is none or the archive changed since. '''
+    try:
+        with open(path + ".idx", "rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+    size, count = INDEX.unpack_from(data)
+    if size != os.path.getsize(path):
+        return None
+    positions = array("Q", data[INDEX.size:INDEX.size + 8 * count])
+    urls = zlib.decompress(data[INDEX.size + 8 * count:]).decode("utf-8").split("\n") if count else []
+    return dict(zip(urls, positions))
+
+
+def recorder(path):
+    with _lock:
+        if path not in _recorders:
+            _recorders[path] = ArchiveRecorder(path)
+        return _recorders[path]
+
+
+def archive(path):
+    with _lock:
+        if path not in _archives:
+            _archives[path] = Archive(path)
+        return _archives[path]
+
+
+def record(config, url, status, content):
+    ''' Records a cache server answer when RECORD is set. '''
+    if config.record:
+        recorder(config.record).add(url, status, content)
+
+
+def replay(url, config):
+    ''' download() from the REPLAY archive, the caller waits REPLAYLATENCY seconds first. '''
+    return archive(config.replay).get(url)
+
+
+def close_archives():
+    ''' Writes the indexes of the archives being recorded, at the end of the crawl. '''
+    with _lock:
+        for item in list(_recorders.values()) + list(_archives.values()):
+            item.close()
+        _recorders.clear()
+        _archives.clear()
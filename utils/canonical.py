@@ -0,0 +1,132 @@
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit
+
+# every step, in the order they run. slash is the old utils.normalize
+STEPS = ("lowercase", "ports", "percent", "dots", "index", "tracking", "sortquery",
+         "fragment", "slash")
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+INDEX_PAGES = frozenset(["index.html", "index.htm", "index.php", "index.shtml",
+                         "default.htm", "default.html", "default.aspx"])
+# a trailing * matches any parameter starting with the rest
+TRACKING_PARAMS = ("utm_*", "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid",
+                   "_hsenc", "_hsmi")
+ESCAPE = re.compile(r"%[0-9a-fA-F]{2}")
+UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+
+def _unescape_unreserved(match):
+    # %7E and ~ are the same url, %2F and / are not
+    character = chr(int(match.group()[1:], 16))
+    return character if character in UNRESERVED else match.group().upper()
+
+
+def _remove_dot_segments(path):
+    # RFC 3986 5.2.4, /a/./b/../c -> /a/c
+    output = []
+    for segment in path.split("/"):
+        if segment == "..":
+            if len(output) > 1:
+                output.pop()
+        elif segment != ".":
+            output.append(segment)
+    if path.endswith(("/.", "/..")):
+        output.append("")
+    return "/".join(output)
+
+
+class Canonicalizer(object):
+    '''
+    Rewrites equivalent urls to one form before they are hashed. Which STEPS run can
+    be set for all hosts and per host (host_steps, a domain also covers its
+    subdomains):
+        lowercase: scheme and host   ports: :80 on http and :443 on https
+        percent: %7e -> ~, other escapes upper case   dots: /a/./b/../c -> /a/c
+        index: /dir/index.html -> /dir/   tracking: utm_* and such query params dropped
+        sortquery: params sorted by name   fragment: #... dropped
+        slash: a trailing / dropped, like utils.normalize
+    canonical(url) is memoized, the same hrefs show up on every page of a site.
+    '''
+    def __init__(self, steps=STEPS, host_steps=None, tracking_params=TRACKING_PARAMS,
+                 cache_size=1 << 16):
+        self.rules = {"steps": tuple(steps), "host_steps": dict(host_steps or {}),
+                      "tracking_params": tuple(tracking_params)}
+        for step_list in [self.rules["steps"]] + list(self.rules["host_steps"].values()):
+            unknown = set(step_list) - set(STEPS)
+            if unknown:
+                raise ValueError(f"Unknown canonicalization steps {sorted(unknown)}")
+        self.steps = frozenset(self.rules["steps"])
+        self.host_steps = {host.lower(): frozenset(step_list)
+                           for host, step_list in self.rules["host_steps"].items()}
+        self.tracking = frozenset(p for p in self.rules["tracking_params"] if not p.endswith("*"))
+        self.tracking_prefixes = tuple(p[:-1] for p in self.rules["tracking_params"] if p.endswith("*"))
+        self.canonical = lru_cache(maxsize=cache_size)(self._canonical)
+
+    def replace(self, **rules):
+        ''' Same canonicalizer with some rules swapped, e.g. the ones from config.ini. '''
+        return Canonicalizer(**{**self.rules, **rules})
+
+    def steps_for(self, host):
+        if self.host_steps:
+            labels = host.split(".")
+            for i in range(len(labels)):
+                steps = self.host_steps.get(".".join(labels[i:]))
+                if steps is not None:
+                    return steps
+        return self.steps
+
+    def _tracking(self, name):
+        return name in self.tracking or (self.tracking_prefixes and name.startswith(self.tracking_prefixes))
+
+    def _canonical(self, url):
+        try:
+            scheme, netloc, path, query, fragment = urlsplit(url)
+        except ValueError:
+            scheme = None
+        if scheme not in DEFAULT_PORTS:
+            # mailto:, broken urls and such, only the old trailing slash rule
+            return url.rstrip("/") if "slash" in self.steps else url
+        host, _, port = netloc.rpartition("@")[2].lower().partition(":")
+        steps = self.steps_for(host.rstrip("."))
+        if not steps - {"slash"}:
+            return url.rstrip("/") if steps and url.endswith("/") else url
+
+        if "lowercase" in steps:
+            scheme = scheme.lower()
+            userinfo, at, hostport = netloc.rpartition("@")
+            netloc = userinfo + at + hostport.lower()
+        if "ports" in steps and ":" in netloc.rpartition("@")[2]:
+            head, _, port = netloc.rpartition(":")
+            if port in ("", DEFAULT_PORTS[scheme.lower()]):
+                netloc = head
+        if "percent" in steps:
+            if "%" in path:
+                path = ESCAPE.sub(_unescape_unreserved, path)
+            if "%" in query:
+                query = ESCAPE.sub(_unescape_unreserved, query)
+        if "dots" in steps and "." in path:
+            path = _remove_dot_segments(path)
+        if "index" in steps:
+            directory, slash, last = path.rpartition("/")
+            if slash and last.lower() in INDEX_PAGES:
+                path = directory + "/"
+        if query and ("tracking" in steps or "sortquery" in steps):
+            fields = [field for field in query.split("&") if field]
+            if "tracking" in steps:
+                fields = [field for field in fields
+                          if not self._tracking(field.partition("=")[0])]
+            if "sortquery" in steps:
+                fields.sort(key=lambda field: field.partition("=")[0])
+            query = "&".join(fields)
+        if "fragment" in steps:
+            fragment = ""
+
+        url = urlunsplit((scheme, netloc, path, query, fragment))
+        if "slash" in steps and url.endswith("/"):
+            url = url.rstrip("/")
+        return url
+
+    def canonical_links(self, links):
+        ''' The canonical form of every link, first occurrence order, no repeats. '''
+        canonical = self.canonical
+        return list(dict.fromkeys(canonical(link) for link in links))
@@ -9,11 +9,78 @@ class Config(object):
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.store = config["LOCAL PROPERTIES"].get("STORE", "shelve").strip().lower()
+        self.flush_interval = float(config["LOCAL PROPERTIES"].get("FLUSHINTERVAL", "1.0"))
+        self.flush_batch = int(config["LOCAL PROPERTIES"].get("FLUSHBATCH", "500"))
+        self.durability = config["LOCAL PROPERTIES"].get("DURABILITY", "normal").strip().lower()
+        self.async_downloads = int(config["LOCAL PROPERTIES"].get("ASYNCDOWNLOADS", "0"))
+        self.parse_processes = int(config["LOCAL PROPERTIES"].get("PARSEPROCESSES", "0"))
+        self.parser = config["LOCAL PROPERTIES"].get("PARSER", "soup").strip().lower()
+        self.word_capacity = int(config["LOCAL PROPERTIES"].get("WORDCAPACITY", "0"))
+        self.exact_dedup = config["LOCAL PROPERTIES"].get("EXACTDEDUP", "raw").strip().lower()
+        self.exact_dedup_size = int(config["LOCAL PROPERTIES"].get("EXACTDEDUPSIZE", "100000"))
+        self.report_state = config["LOCAL PROPERTIES"].get("REPORTSTATE", "").strip()
+        self.checkpoint_interval = float(config["LOCAL PROPERTIES"].get("CHECKPOINTINTERVAL", "30"))
+        self.metrics = config["LOCAL PROPERTIES"].getboolean("METRICS", True)
+        self.metrics_interval = float(config["LOCAL PROPERTIES"].get("METRICSINTERVAL", "60"))
+        self.metrics_port = int(config["LOCAL PROPERTIES"].get("METRICSPORT", "0"))
+        self.log_level = config["LOCAL PROPERTIES"].get("LOGLEVEL", "info").strip().lower()
+        self.log_json = config["LOCAL PROPERTIES"].get("LOGJSON", "Logs/crawl.jsonl").strip()
+        self.log_max_bytes = int(config["LOCAL PROPERTIES"].get("LOGMAXBYTES", "50000000"))
+        self.log_backups = int(config["LOCAL PROPERTIES"].get("LOGBACKUPS", "5"))
+        self.shards = [address.strip() for address in
+                       config["LOCAL PROPERTIES"].get("SHARDS", "").split(",") if address.strip()]
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
+        self.timeout = float(config["CONNECTION"].get("TIMEOUT", "30"))
+        self.retries = int(config["CONNECTION"].get("RETRIES", "3"))
+        self.backoff = float(config["CONNECTION"].get("BACKOFF", "0.5"))
+        self.max_download = int(config["CONNECTION"].get("MAXDOWNLOAD", "0"))
+        self.record = config["CONNECTION"].get("RECORD", "").strip()
+        self.replay = config["CONNECTION"].get("REPLAY", "").strip()
+        self.replay_latency = float(config["CONNECTION"].get("REPLAYLATENCY", "0"))
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.priority = config["CRAWLER"].get("PRIORITY", "lifo").strip().lower()
+        self.trap_detection = config["CRAWLER"].getboolean("TRAPDETECTION", True)
+        self.trap_min_pages = int(config["CRAWLER"].get("TRAPMINPAGES", "20"))
+        self.trap_throttle = float(config["CRAWLER"].get("TRAPTHROTTLE", "0.5"))
+        self.trap_ban = float(config["CRAWLER"].get("TRAPBAN", "0.1"))
+        self.trap_budget = int(config["CRAWLER"].get("TRAPBUDGET", "0"))
+        self.trap_novelty = float(config["CRAWLER"].get("TRAPNOVELTY", "0.15"))
+        self.robots = config["CRAWLER"].getboolean("ROBOTS", True)
+        self.robots_ttl = float(config["CRAWLER"].get("ROBOTSTTL", "86400"))
+        self.robots_cache = int(config["CRAWLER"].get("ROBOTSCACHE", "10000"))
+        self.sitemaps = config["CRAWLER"].getboolean("SITEMAPS", False)
+        self.sitemap_limit = int(config["CRAWLER"].get("SITEMAPLIMIT", "50000"))
+
+        # optional [FILTER] section, each key replaces that rule of scraper.url_filter
+        self.filter_rules = dict()
+        rules = config["FILTER"] if config.has_section("FILTER") else dict()
+        for key, rule in (("DOMAINS", "domains"), ("EXTENSIONS", "extensions"),
+                          ("BLOCKEDPARAMS", "blocked_params")):
+            if key in rules:
+                self.filter_rules[rule] = [item.strip() for item in rules[key].split(",") if item.strip()]
+        if "TRAPS" in rules:
+            # one regex per line, they can have commas
+            self.filter_rules["traps"] = [line.strip() for line in rules["TRAPS"].splitlines() if line.strip()]
+        if "MAXQUERY" in rules:
+            self.filter_rules["max_query_length"] = int(rules["MAXQUERY"])
+
+        # optional [CANONICAL] section: STEPS, TRACKINGPARAMS, any other key is a host
+        # with its own steps
+        self.canonical_rules = dict()
+        rules = config["CANONICAL"] if config.has_section("CANONICAL") else dict()
+        split = lambda value: [item.strip() for item in value.split(",") if item.strip()]
+        if "STEPS" in rules:
+            self.canonical_rules["steps"] = split(rules["STEPS"])
+        if "TRACKINGPARAMS" in rules:
+            self.canonical_rules["tracking_params"] = split(rules["TRACKINGPARAMS"])
+        host_steps = {host: split(steps) for host, steps in rules.items()
+                      if host.upper() not in ("STEPS", "TRACKINGPARAMS")}
+        if host_steps:
+            self.canonical_rules["host_steps"] = host_steps
 
         self.cache_server = None
\ No newline at end of file
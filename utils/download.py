@@ -1,21 +1,106 @@
 import requests
 import cbor
 import time
+from threading import Lock
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.response import Response, count
+from utils.archive import record, replay
+
+# read the cache server response in pieces of this many bytes
+CHUNK_SIZE = 65536
+
+# one pooled session per cache server, shared by every worker thread
+_sessions = dict()
+_sessions_lock = Lock()
+
+
+def get_session(config):
+    ''' Keep-alive session with a connection pool and retry with backoff on transient errors. '''
+    host, port = config.cache_server
+    with _sessions_lock:
+        session = _sessions.get((host, port))
+        if session is None:
+            retry = Retry(
+                total=config.retries, backoff_factor=config.backoff,
+                status_forcelist=(502, 503, 504), allowed_methods=("GET",),
+                raise_on_status=False)
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=max(10, config.threads_count),
+                max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            _sessions[(host, port)] = session
+        return session
+
+
+def read_limited(resp, limit):
+    '''
+    Body of a streamed response, or None when it is over limit bytes (0 means no limit).
+    Content-Length is checked before anything is read, the stream is cut at the limit
+    in case the header is missing or wrong.
+    '''
+    length = resp.headers.get("Content-Length", "")
+    if limit and length.isdigit() and int(length) > limit:
+        count(skipped=1, bytes_saved=int(length))
+        return None
+    chunks = []
+    read = 0
+    for chunk in resp.iter_content(CHUNK_SIZE):
+        chunks.append(chunk)
+        read += len(chunk)
+        if limit and read > limit:
+            count(aborted=1, bytes_read=read,
+                  bytes_saved=max(int(length) - read, 0) if length.isdigit() else 0)
+            return None
+    count(bytes_read=read)
+    return b"".join(chunks)
+
+
+def too_large(url, limit):
+    return Response({
+        "error": f"Skipped {url}, the cache server response is over {limit} bytes.",
+        "status": 0,
+        "url": url})
 
-from utils.response import Response
 
 def download(url, config, logger=None):
+    if config.replay:
+        # offline, from a recorded crawl
+        if config.replay_latency:
+            time.sleep(config.replay_latency)
+        return replay(url, config)
     host, port = config.cache_server
-    resp = requests.get(
-        f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
     try:
-        if resp and resp.content:
-            return Response(cbor.loads(resp.content))
+        resp = get_session(config).get(
+            f"http://{host}:{port}/",
+            params=[("q", f"{url}"), ("u", f"{config.user_agent}")],
+            timeout=config.timeout, stream=True)
+        with resp:
+            content = read_limited(resp, config.max_download)
+    except requests.RequestException as e:
+        # out of retries, treat it like any other failed download
+        logger.error(f"Spacetime Request error {e} with url {url}.")
+        return Response({
+            "error": f"Spacetime Request error {e} with url {url}.",
+            "status": 0,
+            "url": url})
+    if content is None:
+        logger.info(f"Skipped {url}, over {config.max_download} bytes.")
+        return too_large(url, config.max_download)
+    try:
+        if resp and content:
+            response = Response(cbor.loads(content))
+            record(config, url, response.status, content)
+            return response
     except (EOFError, ValueError) as e:
         pass
     logger.error(f"Spacetime Response error {resp} with url {url}.")
-    return Response({
+    error = {
         "error": f"Spacetime Response error {resp} with url {url}.",
         "status": resp.status_code,
-        "url": url})
+        "url": url}
+    record(config, url, resp.status_code, cbor.dumps(error))
+    return Response(error)
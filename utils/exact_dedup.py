@@ -0,0 +1,125 @@
+'''
+Exact duplicate pages caught before any parsing: mirrors and other spellings of a
+page the canonicalizer cannot fold (www. and the bare host, a page served by several
+hosts) send the same bytes, and a blake2b digest of the body is much cheaper than
+the soup, the tokenizer and the near duplicate index.
+'''
+import os
+import struct
+import threading
+from array import array
+from collections import OrderedDict
+from hashlib import blake2b
+
+MODES = ("off", "raw", "normalized")
+DIGEST_SIZE = 16
+MAGIC = b"EXD1"
+# magic, number of digests
+HEADER = struct.Struct("<4sQ")
+
+
+class ExactDuplicates(object):
+    '''
+    Bounded LRU of body digest -> what parsing that body gave: its word count, or 0
+    for a page that was not worth keeping. A page whose body is in it gets the same
+    answer without being parsed: a duplicate report, or nothing for a thin page.
+    Only pages the near duplicate index saw (fingerprinted) or that were thrown away
+    go in, so the report comes out the same as without it.
+    mode raw hashes the body as is, normalized collapses runs of whitespace first,
+    which does not change the text, the tokens or the fingerprint of the page.
+    '''
+    def __init__(self, mode="raw", capacity=100_000):
+        if mode not in MODES:
+            raise ValueError(f"EXACTDEDUP is one of {', '.join(MODES)}, not {mode}")
+        self.mode = mode
+        self.capacity = capacity
+        self.digests = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        # time spent parsing the pages that were not in it, to estimate what the hits saved
+        self.parse_seconds = 0.0
+        self.parsed = 0
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def digest(self, content):
+        if self.mode == "normalized":
+            content = b" ".join(content.split())
+        return blake2b(content, digest_size=DIGEST_SIZE).digest()
+
+    def get(self, digest):
+        ''' The word count recorded for digest (0 for a thin page), None when it is new. '''
+        with self.lock:
+            word_count = self.digests.get(digest)
+            if word_count is None:
+                self.misses += 1
+                return None
+            self.digests.move_to_end(digest)
+            self.hits += 1
+            return word_count
+
+    def add(self, digest, word_count, seconds):
+        with self.lock:
+            self.parse_seconds += seconds
+            self.parsed += 1
+            if word_count is None:
+                return
+            self.digests[digest] = word_count
+            self.digests.move_to_end(digest)
+            if len(self.digests) > self.capacity:
+                self.digests.popitem(last=False)
+                self.evicted += 1
+
+    def stats(self):
+        with self.lock:
+            looked_up = self.hits + self.misses
+            mean = self.parse_seconds / self.parsed if self.parsed else 0.0
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / looked_up if looked_up else 0.0,
+                    "saved_seconds": self.hits * mean, "size": len(self.digests),
+                    "evicted": self.evicted}
+
+    def __len__(self):
+        return len(self.digests)
+
+    def snapshot(self):
+        ''' [(digest, word count)] in LRU order, oldest first, for save(). '''
+        with self.lock:
+            return list(self.digests.items())
+
+    def save(self, path, digests=None):
+        ''' Writes the digests (a snapshot(), now if None) in LRU order, oldest first. '''
+        if digests is None:
+            digests = self.snapshot()
+        counts = array("I", (word_count for _, word_count in digests))
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(HEADER.pack(MAGIC, len(digests)))
+            file.write(b"".join(digest for digest, _ in digests))
+            file.write(counts.tobytes())
+        os.replace(temporary, path)
+
+    def load(self, path):
+        ''' Adds the digests saved at path, returns how many. A missing or torn file adds none. '''
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            magic, count = HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return 0
+        end = HEADER.size + count * DIGEST_SIZE
+        if magic != MAGIC or len(data) != end + count * 4:
+            return 0
+        counts = array("I", data[end:])
+        with self.lock:
+            for i, word_count in enumerate(counts):
+                offset = HEADER.size + i * DIGEST_SIZE
+                self.digests[data[offset:offset + DIGEST_SIZE]] = word_count
+            while len(self.digests) > self.capacity:
+                self.digests.popitem(last=False)
+        return count
+
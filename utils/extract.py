@@ -0,0 +1,131 @@
+from html.parser import HTMLParser
+
+from bs4.dammit import EntitySubstitution, UnicodeDammit
+
+# BeautifulSoup's get_text leaves out the strings inside these tags
+SKIPPED_TAGS = frozenset(["script", "style", "template", "rt", "rp"])
+# inside these the soup keeps whitespace only strings as they are
+PRESERVE_WHITESPACE_TAGS = frozenset(["pre", "textarea"])
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+
+class _Extractor(HTMLParser):
+    '''
+    Collects visible text nodes and hrefs while html.parser streams over the page.
+    Character references are resolved the way bs4's html.parser builder does it, so
+    the text comes out identical to the soup's.
+    '''
+    def __init__(self, original_encoding=None):
+        super().__init__(convert_charrefs=False)
+        self.original_encoding = original_encoding
+        self.chunks = []
+        self.hrefs = []
+        self.skip = 0
+        self.preserve = 0
+        # pieces of the text node being read, a tag or comment ends the node
+        self.current = []
+
+    def _end_text(self):
+        if self.current:
+            if not self.skip:
+                text = "".join(self.current)
+                # the soup squashes whitespace only strings to one newline or space
+                if not self.preserve and not text.strip(ASCII_SPACES):
+                    text = "\n" if "\n" in text else " "
+                self.chunks.append(text)
+            self.current = []
+
+    def handle_starttag(self, tag, attrs):
+        self._end_text()
+        if tag == "a":
+            self._link(attrs)
+        if tag in SKIPPED_TAGS:
+            self.skip += 1
+        if tag in PRESERVE_WHITESPACE_TAGS:
+            self.preserve += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._end_text()
+        if tag == "a":
+            self._link(attrs)
+
+    def handle_endtag(self, tag):
+        self._end_text()
+        if tag in SKIPPED_TAGS and self.skip:
+            self.skip -= 1
+        if tag in PRESERVE_WHITESPACE_TAGS and self.preserve:
+            self.preserve -= 1
+
+    def handle_data(self, data):
+        self.current.append(data)
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.current.append(character if character is not None else f"&{name}")
+
+    def handle_charref(self, name):
+        try:
+            code = int(name[1:], 16) if name[:1] in ("x", "X") else int(name)
+        except ValueError:
+            self.current.append("\N{REPLACEMENT CHARACTER}")
+            return
+        data = None
+        if code < 256:
+            # pages often mean windows-1252 when they write &#150; and friends
+            for encoding in (self.original_encoding, "windows-1252"):
+                if not encoding:
+                    continue
+                try:
+                    data = bytearray([code]).decode(encoding)
+                except UnicodeDecodeError:
+                    pass
+                if data:
+                    break
+        if not data:
+            try:
+                data = chr(code)
+            except (ValueError, OverflowError):
+                pass
+        self.current.append(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_comment(self, data):
+        self._end_text()
+
+    def handle_decl(self, decl):
+        self._end_text()
+
+    def handle_pi(self, data):
+        self._end_text()
+
+    def unknown_decl(self, data):
+        self._end_text()
+        # <![CDATA[...]]> shows up in the soup text, other declarations do not
+        if data.startswith("CDATA[") and not self.skip:
+            self.chunks.append(data[6:])
+
+    def _link(self, attrs):
+        href = None
+        for name, value in attrs:
+            # the last duplicate wins, a bare href counts as an empty one
+            if name == "href":
+                href = value or ""
+        if href is not None:
+            self.hrefs.append(href)
+
+
+def extract(raw_content):
+    '''
+    One pass over the page with html.parser, no tree built.
+    Returns (text, hrefs) matching BeautifulSoup(raw_content, 'html.parser')
+    .get_text(separator=" ") and the href of every find_all('a', href=True).
+    '''
+    original_encoding = None
+    markup = raw_content
+    if isinstance(raw_content, bytes):
+        dammit = UnicodeDammit(raw_content, is_html=True)
+        markup, original_encoding = dammit.unicode_markup, dammit.original_encoding
+    extractor = _Extractor(original_encoding)
+    extractor.feed(markup or "")
+    extractor.close()
+    extractor._end_text()
+    return " ".join(extractor.chunks), extractor.hrefs
@@ -0,0 +1,204 @@
+'''
+Logging off the crawl threads. Every logger from get_logger has one QueueHandler, so
+a worker only builds the record and puts it on a queue. One QueueListener thread per
+process writes them: to Logs/<file>.log (one handler per file, however many loggers
+share it), INFO and up to the console except the per url records (the ones with a url
+in extra=), and every record as one JSON object per line
+to the LOGJSON file once configure_logs set one. The files are rotated at LOGMAXBYTES, keeping LOGBACKUPS old
+ones, and flushed when the queue runs dry or every BATCH records, so a busy crawl
+writes them in large blocks.
+'''
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = "Logs"
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# records written before the files are flushed, when the queue does not run dry first
+BATCH = 512
+# attributes every LogRecord has, the others came in extra= and go in the json
+_STANDARD = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "log_file"}
+
+
+class _BufferedRotatingHandler(RotatingFileHandler):
+    '''
+    A RotatingFileHandler that leaves flushing to the listener. The size is counted here
+    instead of seeking the file, which would flush it every record.
+    '''
+    def __init__(self, path, max_bytes, backups):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        super().__init__(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def resize(self, max_bytes, backups):
+        with self.lock:
+            self.maxBytes, self.backupCount = max_bytes, backups
+
+    def shouldRollover(self, record):
+        return self.maxBytes > 0 and self.size > 0 and self.size >= self.maxBytes
+
+    def emit(self, record):
+        line = self.format(record) + "\n"
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+                self.size = 0
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(line)
+            self.size += len(line)
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        pass
+
+    def write_out(self):
+        with self.lock:
+            if self.stream is not None:
+                self.stream.flush()
+
+
+class JsonLinesHandler(_BufferedRotatingHandler):
+    '''
+    One json object per record: time, level, logger, message, the exception if any and
+    whatever came in extra= (url, status...).
+    '''
+    def format(self, record):
+        entry = {"time": round(record.created, 6), "level": record.levelname,
+                 "logger": record.name, "message": record.getMessage()}
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _STANDARD:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+class _Enqueue(QueueHandler):
+    def __init__(self, queue, log_file):
+        super().__init__(queue)
+        self.log_file = log_file
+
+    def prepare(self, record):
+        # the message and traceback are made here, the record may outlive its arguments,
+        # the rest of the formatting happens on the listener thread
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.log_file = self.log_file
+        return record
+
+
+class LogPipeline(QueueListener):
+    '''
+    The listener: routes each record to the file of its logger, the console and the
+    json lines file (none until one is configured), and flushes them in batches.
+    '''
+    def __init__(self, level=logging.INFO, json_file=None, max_bytes=50_000_000, backups=5):
+        super().__init__(queue.SimpleQueue())
+        self.level = level
+        self.files = dict()
+        self.console = logging.StreamHandler()
+        self.console.setLevel(logging.INFO)
+        # one line per download would drown the console
+        self.console.addFilter(lambda record: not hasattr(record, "url"))
+        self.console.setFormatter(logging.Formatter(FORMAT))
+        self.json = None
+        self.configure(level, json_file, max_bytes, backups)
+        self.written = 0
+        self.lock = threading.Lock()
+
+    def configure(self, level, json_file, max_bytes, backups):
+        self.level = level
+        self.max_bytes, self.backups = max_bytes, backups
+        for handler in list(self.files.values()):
+            handler.resize(max_bytes, backups)
+        previous, self.json = self.json, JsonLinesHandler(json_file, max_bytes, backups) if json_file else None
+        if previous is not None:
+            previous.close()
+        for logger in logging.Logger.manager.loggerDict.values():
+            if isinstance(logger, logging.Logger) and any(
+                    isinstance(handler, _Enqueue) for handler in logger.handlers):
+                logger.setLevel(level)
+
+    def attach(self, logger, log_file):
+        ''' Gives logger the queue handler, once. '''
+        with self.lock:
+            if log_file not in self.files:
+                handler = _BufferedRotatingHandler(
+                    os.path.join(LOG_DIR, f"{log_file}.log"), self.max_bytes, self.backups)
+                handler.setFormatter(logging.Formatter(FORMAT))
+                self.files[log_file] = handler
+        if not any(isinstance(handler, _Enqueue) for handler in logger.handlers):
+            logger.addHandler(_Enqueue(self.queue, log_file))
+            logger.propagate = False
+        logger.setLevel(self.level)
+
+    def handle(self, record):
+        self.files[record.log_file].handle(record)
+        if record.levelno >= self.console.level:
+            self.console.handle(record)
+        if self.json is not None:
+            self.json.handle(record)
+        self.written += 1
+        if self.written % BATCH == 0:
+            self.write_out()
+
+    def dequeue(self, block):
+        if block:
+            try:
+                return self.queue.get(block=False)
+            except queue.Empty:
+                # about to wait, write out what is buffered first
+                self.write_out()
+        return self.queue.get(block)
+
+    def write_out(self):
+        for handler in list(self.files.values()):
+            handler.write_out()
+        if self.json is not None:
+            self.json.write_out()
+
+    def stop(self):
+        super().stop()
+        self.write_out()
+
+
+_pipeline = None
+_lock = threading.Lock()
+
+
+def pipeline():
+    global _pipeline
+    with _lock:
+        if _pipeline is None:
+            _pipeline = LogPipeline()
+            _pipeline.start()
+            atexit.register(_pipeline.stop)
+        return _pipeline
+
+
+def get_logger(name, filename=None):
+    ''' The logger name, writing to Logs/<filename or name>.log through the pipeline. '''
+    logger = logging.getLogger(name)
+    pipeline().attach(logger, filename if filename else name)
+    return logger
+
+
+def log_to(directory):
+    ''' Puts the <file>.log of the loggers made from now on in directory instead of Logs. '''
+    global LOG_DIR
+    LOG_DIR = directory
+
+
+def configure_logs(config):
+    ''' LOGLEVEL and the LOGJSON file from config.ini, for the loggers made so far and later. '''
+    pipeline().configure(getattr(logging, config.log_level.upper()), config.log_json,
+                         config.log_max_bytes, config.log_backups)
@@ -0,0 +1,154 @@
+import random
+from collections import defaultdict
+
+# mersenne prime, big enough for the 1e9+7 fingerprints coming out of custom_hash
+_PRIME = (1 << 61) - 1
+
+
+def jaccard(a, b) -> float:
+    if not a and not b:
+        return 0.0
+    intersection = len(a & b)
+    return intersection / (len(a) + len(b) - intersection)
+
+
+def candidate_probability(similarity, bands, rows) -> float:
+    """
+    Chance that two sets with the given jaccard similarity share at least one band bucket.
+    """
+    return 1.0 - (1.0 - similarity ** rows) ** bands
+
+
+def optimal_params(threshold, num_perm=64, false_positive_weight=0.5, false_negative_weight=0.5):
+    """
+    Pick (bands, rows) with bands * rows <= num_perm that minimizes the weighted area of
+    false positives (below threshold) and false negatives (above threshold) under the S-curve.
+    Raising false_negative_weight trades precision for recall.
+    """
+    def area(low, high, bands, rows, above):
+        steps = 100
+        width = (high - low) / steps
+        total = 0.0
+        for i in range(steps):
+            s = low + (i + 0.5) * width
+            p = candidate_probability(s, bands, rows)
+            total += (1.0 - p if above else p) * width
+        return total
+
+    best = None
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            fp = area(0.0, threshold, bands, rows, above=False)
+            fn = area(threshold, 1.0, bands, rows, above=True)
+            error = fp * false_positive_weight + fn * false_negative_weight
+            if best is None or error < best[0]:
+                best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class MinHashLSH(object):
+    '''
+    Near duplicate index over fingerprint sets.
+    Every set gets a minhash signature which is split into bands, and each band is hashed
+    into a bucket. Only sets sharing a bucket are compared with the exact jaccard score,
+    so a lookup costs about the same no matter how many pages were indexed.
+    '''
+    def __init__(self, threshold=0.85, bands=10, rows=6, seed=1):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.num_perm = bands * rows
+        rng = random.Random(seed)
+        # one universal hash h -> (a * h + b) % prime, see signature()
+        self.a = rng.randrange(1, _PRIME)
+        self.b = rng.randrange(0, _PRIME)
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+        self.fingerprints = []
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def __iter__(self):
+        return iter(self.fingerprints)
+
+    def signature(self, fingerprint):
+        '''
+        One permutation minhash: hash every element once, use the hash to pick one of
+        num_perm bins and keep the minimum per bin. Costs O(len(fingerprint)) instead of
+        O(num_perm * len(fingerprint)) for the classic k permutation version.
+        None for an empty fingerprint, it has no minhash.
+        '''
+        k = self.num_perm
+        a, b = self.a, self.b
+        signature = [None] * k
+        for h in fingerprint:
+            # low part picks the bin, high part is the rank inside the bin
+            value, bin_index = divmod((a * h + b) % _PRIME, k)
+            current = signature[bin_index]
+            if current is None or value < current:
+                signature[bin_index] = value
+        # densify empty bins by borrowing from the next filled bin to the right,
+        # negated and offset by the distance so borrowed values never collide with real ones
+        if None in signature:
+            if signature.count(None) == k:
+                # nothing hashed, no filled bin to borrow from
+                return None
+            for i in range(k):
+                if signature[i] is None:
+                    distance = 1
+                    while signature[(i + distance) % k] is None:
+                        distance += 1
+                    borrowed = signature[(i + distance) % k]
+                    signature[i] = -(borrowed * k + distance)
+        return signature
+
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [tuple(signature[i * rows:(i + 1) * rows]) for i in range(self.bands)]
+
+    def candidates(self, fingerprint, keys=None):
+        if keys is None:
+            signature = self.signature(fingerprint)
+            if signature is None:
+                return set()
+            keys = self._band_keys(signature)
+        found = set()
+        for band, key in enumerate(keys):
+            bucket = self.buckets[band].get(key)
+            if bucket:
+                found.update(bucket)
+        return found
+
+    def query(self, fingerprint, keys=None) -> bool:
+        ''' True if an indexed set has jaccard >= threshold with the fingerprint. '''
+        if not fingerprint:
+            return False
+        for doc_id in self.candidates(fingerprint, keys):
+            if jaccard(fingerprint, self.fingerprints[doc_id]) >= self.threshold:
+                return True
+        return False
+
+    def add(self, fingerprint, keys=None):
+        fingerprint = frozenset(fingerprint)
+        doc_id = len(self.fingerprints)
+        self.fingerprints.append(fingerprint)
+        # an empty set can never be similar to anything, no need to bucket it
+        if not fingerprint:
+            return
+        if keys is None:
+            keys = self._band_keys(self.signature(fingerprint))
+        for band, key in enumerate(keys):
+            self.buckets[band][key].append(doc_id)
+
+    def check_and_add(self, fingerprint) -> bool:
+        '''
+        Returns True if the fingerprint is a near duplicate of an indexed set,
+        otherwise indexes it and returns False.
+        '''
+        fingerprint = frozenset(fingerprint)
+        keys = self._band_keys(self.signature(fingerprint)) if fingerprint else None
+        if self.query(fingerprint, keys):
+            return True
+        self.add(fingerprint, keys)
+        return False
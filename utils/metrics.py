@@ -0,0 +1,287 @@
+'''
+Crawl metrics: timing histograms per stage of the crawl loop, fetch counters per host
+and status, and gauges (queue depth, urls in flight...) read only when the metrics are
+shown. The workers, scraper.py and the save file stores write to the metrics object
+below, MetricsReporter shows it as a periodic stats log line and as Prometheus text
+on http://127.0.0.1:METRICSPORT/metrics.
+Recording is a lock and a bisect, cheap enough to stay on (benchmarks/bench_metrics.py).
+'''
+import time
+from bisect import bisect_left
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Lock, Thread
+from urllib.parse import urlsplit
+
+# bucket upper bounds in seconds, the last bucket is +Inf
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# the crawl loop in order, for the stats line and the endpoint
+STAGES = ("wait", "download", "parse", "dedup", "filter", "frontier", "flush")
+
+
+class Histogram(object):
+    ''' Observation counts per bucket of BUCKETS, with their sum and count. '''
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def copy(self):
+        histogram = Histogram()
+        histogram.counts = list(self.counts)
+        histogram.sum = self.sum
+        histogram.count = self.count
+        return histogram
+
+    def quantile(self, q):
+        ''' Upper bound of the bucket the q-th observation falls in, inf past the last. '''
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class _Timer(object):
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = self.metrics.clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, self.metrics.clock() - self.start)
+        return False
+
+
+class _NoTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+class Metrics(object):
+    '''
+    Thread safe. Stage timings go through timer() or observe(), every fetched page
+    through fetched() and every url that raised through failed(). With enabled False
+    nothing is recorded. clock times the stages, time.thread_time gives their CPU time.
+    '''
+    def __init__(self, enabled=True, clock=time.perf_counter):
+        self.enabled = enabled
+        self.clock = clock
+        self.lock = Lock()
+        # name -> function returning the current value
+        self.gauges = dict()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.stages = {stage: Histogram() for stage in STAGES}
+            self.statuses = Counter()
+            self.host_fetches = Counter()
+            self.host_errors = Counter()
+            self.failures = 0
+            self.started = time.monotonic()
+
+    def timer(self, stage):
+        ''' Context manager that observes how long its block took. '''
+        return _Timer(self, stage) if self.enabled else _NO_TIMER
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def fetched(self, url, status):
+        ''' A downloaded url and its status, anything but 200 counts as an error. '''
+        if not self.enabled:
+            return
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            self.statuses[status] += 1
+            self.host_fetches[host] += 1
+            if status != 200:
+                self.host_errors[host] += 1
+
+    def failed(self, url):
+        ''' A url whose crawl raised. '''
+        if not self.enabled:
+            return
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            self.failures += 1
+            self.host_errors[host] += 1
+
+    def gauge(self, name, read):
+        self.gauges[name] = read
+
+    def snapshot(self):
+        ''' Consistent copy of everything, gauges read, for rendering outside the lock. '''
+        with self.lock:
+            snapshot = {
+                "time": time.monotonic(),
+                "started": self.started,
+                "stages": {stage: histogram.copy() for stage, histogram in self.stages.items()},
+                "statuses": Counter(self.statuses),
+                "host_fetches": Counter(self.host_fetches),
+                "host_errors": Counter(self.host_errors),
+                "failures": self.failures,
+            }
+        gauges = dict()
+        for name, read in list(self.gauges.items()):
+            try:
+                gauges[name] = read()
+            except Exception:
+                # a gauge of something already closed
+                continue
+        snapshot["gauges"] = gauges
+        return snapshot
+
+    def summary(self, previous=None):
+        '''
+        One line of stats: pages/sec since previous (a snapshot) or since the start,
+        error rate, gauges and p50/p99 and share of the time of every stage.
+        Returns the line and the snapshot it was taken from.
+        '''
+        snapshot = self.snapshot()
+        pages = sum(snapshot["statuses"].values())
+        since = previous if previous is not None else {"time": snapshot["started"], "statuses": Counter()}
+        rate = (pages - sum(since["statuses"].values())) / max(snapshot["time"] - since["time"], 1e-9)
+        errors = pages - snapshot["statuses"][200] + snapshot["failures"]
+        parts = [f"{rate:.1f} pages/s, {pages} pages, {errors / max(pages, 1):.1%} errors"]
+        parts.extend(f"{name} {value}" for name, value in snapshot["gauges"].items())
+        line = ", ".join(parts)
+        total = sum(histogram.sum for histogram in snapshot["stages"].values()) or 1.0
+        stages = [f"{stage} p50 {_ms(histogram.quantile(0.5))} p99 {_ms(histogram.quantile(0.99))} "
+                  f"({histogram.sum / total:.0%})"
+                  for stage, histogram in snapshot["stages"].items() if histogram.count]
+        if stages:
+            line += " | " + ", ".join(stages)
+        return line, snapshot
+
+    def render(self):
+        ''' Everything in the Prometheus text format. '''
+        snapshot = self.snapshot()
+        lines = ["# HELP crawler_stage_seconds Time spent in each stage of the crawl loop.",
+                 "# TYPE crawler_stage_seconds histogram"]
+        for stage, histogram in snapshot["stages"].items():
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'crawler_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'crawler_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'crawler_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'crawler_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        lines += ["# HELP crawler_pages_total Downloaded pages by status.",
+                  "# TYPE crawler_pages_total counter"]
+        lines += [f'crawler_pages_total{{status="{status}"}} {count}'
+                  for status, count in sorted(snapshot["statuses"].items())]
+        lines += ["# HELP crawler_failures_total Urls whose crawl raised.",
+                  "# TYPE crawler_failures_total counter",
+                  f"crawler_failures_total {snapshot['failures']}"]
+        for name, description, counter in (
+                ("crawler_host_fetches_total", "Downloaded pages by host.", snapshot["host_fetches"]),
+                ("crawler_host_errors_total", "Failed or non 200 pages by host.", snapshot["host_errors"])):
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+            lines += [f'{name}{{host="{host}"}} {count}' for host, count in sorted(counter.items())]
+        pages = sum(snapshot["statuses"].values())
+        uptime = max(snapshot["time"] - snapshot["started"], 1e-9)
+        lines += ["# HELP crawler_pages_per_second Downloaded pages per second since the start.",
+                  "# TYPE crawler_pages_per_second gauge",
+                  f"crawler_pages_per_second {pages / uptime:.3f}"]
+        for name, value in snapshot["gauges"].items():
+            lines += [f"# TYPE crawler_{name} gauge", f"crawler_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:g}ms" if seconds != float("inf") else "+Inf"
+
+
+# the crawl's metrics, written from every worker thread
+metrics = Metrics()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # scrapes are not crawl events
+        pass
+
+
+class MetricsReporter(object):
+    '''
+    Logs metrics.summary() every interval seconds (0 for never) and serves
+    metrics.render() on 127.0.0.1:port (0 for no endpoint) until stop().
+    '''
+    def __init__(self, metrics, logger, interval=60.0, port=0):
+        self.metrics = metrics
+        self.logger = logger
+        self.interval = interval
+        self.port = port
+        self.stopped = Event()
+        self.thread = None
+        self.server = None
+
+    def start(self):
+        if self.port:
+            self.server = ThreadingHTTPServer(("127.0.0.1", self.port), _Handler)
+            self.server.daemon_threads = True
+            self.server.metrics = self.metrics
+            Thread(target=self.server.serve_forever, name="metrics-server", daemon=True).start()
+            self.logger.info(f"Metrics on http://127.0.0.1:{self.server.server_address[1]}/metrics")
+        if self.interval > 0:
+            self.thread = Thread(target=self._run, name="metrics-log", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        previous = None
+        while not self.stopped.wait(self.interval):
+            line, previous = self.metrics.summary(previous)
+            self.logger.info(line)
+
+    def stop(self):
+        ''' Stops both and logs the stats of the whole crawl. '''
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self.logger.info(f"Crawl stats: {self.metrics.summary()[0]}")
@@ -1,14 +1,68 @@
 import pickle
+from collections import Counter
+from threading import Lock
+
+# bytes and bodies the size guard kept out of memory, see size_guard_stats
+_stats = Counter()
+_stats_lock = Lock()
+
+
+def count(**amounts):
+    with _stats_lock:
+        _stats.update(amounts)
+
+
+def peak_rss_kb():
+    ''' High water mark of this process, VmHWM starts over on exec unlike ru_maxrss. '''
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def size_guard_stats():
+    '''
+    bytes_read: cache server bytes actually read, bytes_saved: bytes never read because
+    of Content-Length or an aborted stream, skipped/aborted: how many responses,
+    unpickles_skipped/unpickle_bytes_saved: bodies the scraper never deserialized,
+    peak_rss_kb: the process high water mark.
+    '''
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["peak_rss_kb"] = peak_rss_kb()
+    return stats
+
 
 class Response(object):
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        # keep the pickled page until someone asks for it, the size can be checked first
+        self._pickled = resp_dict.get("response")
+        self.raw_size = len(self._pickled) if isinstance(self._pickled, bytes) else 0
+        self._raw_response = None
+
+    @property
+    def raw_response(self):
+        if self._pickled is not None:
+            try:
+                self._raw_response = pickle.loads(self._pickled)
+            except TypeError:
+                self._raw_response = None
+            self._pickled = None
+        return self._raw_response
+
+    def skip_raw_response(self):
+        ''' Drops the pickled page without loading it. '''
+        if self._pickled is not None:
+            count(unpickles_skipped=1, unpickle_bytes_saved=self.raw_size)
+            self._pickled = None
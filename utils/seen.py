@@ -0,0 +1,76 @@
+from array import array
+from bisect import bisect_left
+from heapq import merge
+from itertools import chain
+
+# the top bits of a key pick a slice of the sorted array, so lookups bisect a handful of entries
+_BUCKET_SHIFT = 48
+_BUCKETS = 1 << (64 - _BUCKET_SHIFT)
+
+
+def seen_key(urlhash):
+    ''' First 8 bytes of the sha256 hex digest from utils.get_urlhash as an int. '''
+    return int(urlhash[:16], 16)
+
+
+class SeenSet(object):
+    '''
+    Exact membership over 64 bit url hash prefixes, answering "seen?" without the save file.
+    Old keys live in a sorted array('Q') (8 bytes each), new ones in a small python set
+    that is merged into the array once it grows past 1/8th of it, which keeps memory
+    around 10-20 bytes per url plus a fixed 512KB bucket table. Two urls sharing a 64 bit
+    prefix would be treated as the same url, at 10M urls the odds of any such collision
+    are about 3 in a million.
+
+    Lookups are safe without a lock: a merge publishes the new array before replacing
+    the recent set, so a concurrent reader never misses a key. add() needs the caller's lock.
+    '''
+    def __init__(self, keys=(), min_merge_size=1 << 16):
+        self.min_merge_size = min_merge_size
+        self.recent = set()
+        self._publish(array('Q', sorted(set(keys))))
+
+    @property
+    def base(self):
+        return self.table[0]
+
+    def __len__(self):
+        return len(self.base) + len(self.recent)
+
+    def __contains__(self, key):
+        if key in self.recent:
+            return True
+        base, offsets = self.table
+        bucket = key >> _BUCKET_SHIFT
+        i = bisect_left(base, key, offsets[bucket], offsets[bucket + 1])
+        return i < len(base) and base[i] == key
+
+    def keys(self):
+        return chain(self.base, self.recent)
+
+    def add(self, key) -> bool:
+        ''' Adds the key, returns False if it was already there. '''
+        if key in self:
+            return False
+        self.recent.add(key)
+        if len(self.recent) >= max(self.min_merge_size, len(self.base) >> 3):
+            self._merge()
+        return True
+
+    def _merge(self):
+        self._publish(array('Q', merge(self.base, sorted(self.recent))))
+        self.recent = set()
+
+    def _publish(self, base):
+        offsets = array('Q', (bisect_left(base, bucket << _BUCKET_SHIFT)
+                              for bucket in range(_BUCKETS)))
+        offsets.append(len(base))
+        # readers need base and offsets from the same merge, publish them as one tuple
+        self.table = (base, offsets)
+
+    def memory(self):
+        ''' Rough bytes held, the array plus the python set and its int objects. '''
+        base, offsets = self.table
+        return (base.buffer_info()[1] * base.itemsize
+                + offsets.buffer_info()[1] * offsets.itemsize
+                + self.recent.__sizeof__() + 32 * len(self.recent))
@@ -0,0 +1,125 @@
+import re
+from functools import lru_cache
+from hashlib import blake2b
+from urllib.parse import unquote_plus, urlsplit
+
+SCHEMES = frozenset(["http", "https"])
+# plain http(s) urls with an ascii host and no brackets, tabs or newlines. urlsplit
+# strips and checks those, anything else goes through it
+PLAIN_URL = re.compile(
+    r"(https?)://([^/?#\[\]\x00-\x20\x7f-\U0010ffff]*)(?=[/?#]|\Z)([^?#\t\r\n]*)"
+    r"(?:\?([^#\t\r\n]*))?(?:#[^\t\r\n]*)?\Z")
+
+
+def _split(url):
+    ''' (scheme, netloc, path, query) like urlsplit. '''
+    match = PLAIN_URL.match(url)
+    if match is not None and url[-1] > " ":
+        scheme, netloc, path, query = match.groups()
+        return scheme, netloc, path, query or ""
+    parsed = urlsplit(url)
+    return parsed.scheme, parsed.netloc, parsed.path, parsed.query
+
+
+def _path(path):
+    # urlparse's path: params after a ';' in the last segment are not part of it
+    if ";" in path:
+        i = path.find(";", path.rfind("/"))
+        if i >= 0:
+            path = path[:i]
+    return path
+
+
+def _query_params(query):
+    # the names parse_qs(query) would return: fields without '=' or a value are dropped
+    for field in query.split("&"):
+        name, equals, value = field.partition("=")
+        if equals and value:
+            if "%" in name or "+" in name:
+                name = unquote_plus(name)
+            yield name
+
+
+class URLFilter(object):
+    '''
+    Compiled form of the scraper's url rules.
+        domains: "ics.uci.edu" allows the domain and its subdomains, "host/path/" only
+            urls under that path. Matched on whole labels with a reversed-label trie.
+        extensions: path endings never crawled, without the dot.
+        traps: regexes searched in the path.
+        blocked_params: query parameters that mark a trap.
+        max_query_length: longer queries are traps too.
+    version is a hash of the rules, anything cached from an older rule set is stale.
+    '''
+    def __init__(self, domains, extensions, traps, blocked_params, max_query_length=100,
+                 cache_size=1 << 16):
+        self.rules = {
+            "domains": tuple(domains), "extensions": tuple(sorted(set(extensions))),
+            "traps": tuple(traps), "blocked_params": tuple(sorted(set(blocked_params))),
+            "max_query_length": int(max_query_length)}
+        self.version = blake2b(repr(sorted(self.rules.items())).encode(), digest_size=8).hexdigest()
+
+        # label -> child, the "" key holds the path prefix of a domain that ends there
+        self.trie = dict()
+        for rule in self.rules["domains"]:
+            domain, slash, path = rule.strip().lower().partition("/")
+            node = self.trie
+            for label in reversed(domain.split(".")):
+                node = node.setdefault(label, dict())
+            node[""] = slash + path if slash else ""
+        self.extensions = frozenset(ext.lower().lstrip(".") for ext in self.rules["extensions"])
+        # one search for all of them
+        self.traps = re.compile("|".join(f"(?:{trap})" for trap in self.rules["traps"])) \
+            if self.rules["traps"] else None
+        self.blocked_params = frozenset(self.rules["blocked_params"])
+        self.max_query_length = self.rules["max_query_length"]
+        # links repeat a lot between pages of a site, lru_cache is thread safe
+        self.is_valid = lru_cache(maxsize=cache_size)(self._is_valid) if cache_size else self._is_valid
+        # a crawl sees few hosts compared to urls
+        self.domain_rule = lru_cache(maxsize=4096)(self._domain_rule)
+
+    def replace(self, **rules):
+        ''' Same filter with some rules swapped, e.g. the ones from config.ini. '''
+        return URLFilter(**{**self.rules, **rules})
+
+    def _domain_rule(self, netloc):
+        ''' Path prefix of the deepest allowed domain netloc is in ("" for any path), or None. '''
+        node = self.trie
+        found = None
+        for label in reversed(netloc.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            found = node.get("", found)
+        return found
+
+    def good_query(self, query):
+        if len(query) > self.max_query_length:
+            return False
+        if not query:
+            return True
+        blocked = self.blocked_params
+        return not any(name in blocked for name in _query_params(query))
+
+    def _is_valid(self, url):
+        scheme, netloc, path, query = _split(url)
+        if scheme not in SCHEMES:
+            return False
+        prefix = self.domain_rule(netloc.lower())
+        if prefix is None:
+            return False
+        path = _path(path)
+        if prefix and not path.startswith(prefix):
+            return False
+        lowered = path.lower()
+        dot = lowered.rfind(".")
+        if dot >= 0 and lowered[dot + 1:] in self.extensions:
+            return False
+        if self.traps is not None and self.traps.search(path):
+            return False
+        return self.good_query(query)
+
+    def filter_links(self, links):
+        ''' The valid links in order, one call per page. Repeats come from the lru cache. '''
+        is_valid = self.is_valid
+        return [link for link in links if is_valid(link)]
@@ -0,0 +1,193 @@
+'''
+Urls packed into flat buffers instead of one python str each, for the structures that
+hold millions of them (the frontier's host queues and scraper.unique_pages). A url is
+split before the last / of its path: the scheme, host and directory part is interned
+once in Prefixes and the packed url is that prefix's id (4 bytes) and the rest in utf-8.
+Once the table is full a new prefix is not interned, the url is packed whole.
+A str costs ~50 bytes of header plus the url, a tuple or set slot on top; a packed url
+costs its tail plus 8 bytes. Urls are only decoded when they are handed out.
+'''
+import threading
+from array import array
+from hashlib import blake2b
+
+from utils.seen import SeenSet
+
+PREFIX_ID = 4
+# prefixes interned at most, a crawl that keeps finding new directories (a trap) would
+# grow the table forever. About 50 MB when full
+MAX_PREFIXES = 1 << 18
+# the id of a url packed whole, with no interned prefix
+WHOLE = (1 << 8 * PREFIX_ID) - 1
+_WHOLE = WHOLE.to_bytes(PREFIX_ID, "little")
+
+
+def split_url(url):
+    ''' (scheme://host/directory/, the rest): the cut is before the query, so /?next=/a/b does not count. '''
+    start = url.find("//") + 2
+    end = url.find("?")
+    if end == -1:
+        end = len(url)
+    cut = url.rfind("/", start, end) + 1
+    if not cut:
+        # no path, the host is the prefix
+        cut = end
+    return url[:cut], url[cut:]
+
+
+class Prefixes(object):
+    '''
+    Interned url prefixes, at most capacity of them, never removed since packed urls
+    point at them. Past capacity urls with a new prefix are packed whole. Lookups need
+    no lock, adding a new prefix takes one so two threads never get the same id for
+    different prefixes.
+    '''
+    def __init__(self, capacity=MAX_PREFIXES):
+        self.strings = []
+        self.ids = dict()
+        self.capacity = min(capacity, WHOLE)
+        # urls packed whole because the table was full
+        self.whole = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.strings)
+
+    def encode(self, url) -> bytes:
+        prefix, rest = split_url(url)
+        number = self.ids.get(prefix)
+        if number is None:
+            with self.lock:
+                number = self.ids.get(prefix)
+                if number is None:
+                    if len(self.strings) >= self.capacity:
+                        self.whole += 1
+                        return _WHOLE + url.encode("utf-8")
+                    number = len(self.strings)
+                    self.strings.append(prefix)
+                    self.ids[prefix] = number
+        return number.to_bytes(PREFIX_ID, "little") + rest.encode("utf-8")
+
+    def decode(self, packed) -> str:
+        number = int.from_bytes(packed[:PREFIX_ID], "little")
+        if number == WHOLE:
+            return packed[PREFIX_ID:].decode("utf-8")
+        return self.strings[number] + packed[PREFIX_ID:].decode("utf-8")
+
+    def memory(self):
+        return sum(len(prefix) + 49 for prefix in self.strings) + self.ids.__sizeof__() \
+            + self.strings.__sizeof__()
+
+
+# one table for the whole process, hosts and directories repeat across structures
+prefixes = Prefixes()
+
+
+class PackedURLs(object):
+    '''
+    A sequence of urls in one bytearray, with the length of each in an array('I').
+    Appending and popping from either end are cheap, popping from the front moves
+    a start offset and the buffers are cut once the dead part is half of them.
+    Not thread safe, the owner locks.
+    '''
+    __slots__ = ("data", "lengths", "head", "offset")
+
+    def __init__(self, urls=()):
+        self.data = bytearray()
+        self.lengths = array("I")
+        # index of the first live url and where its bytes start
+        self.head = 0
+        self.offset = 0
+        for url in urls:
+            self.append(url)
+
+    def __len__(self):
+        return len(self.lengths) - self.head
+
+    def __bool__(self):
+        return len(self.lengths) > self.head
+
+    def __iter__(self):
+        decode = prefixes.decode
+        data = self.data
+        offset = self.offset
+        for length in self.lengths[self.head:]:
+            yield decode(data[offset:offset + length])
+            offset += length
+
+    def append(self, url):
+        packed = prefixes.encode(url)
+        self.data += packed
+        self.lengths.append(len(packed))
+
+    def pop(self):
+        ''' The last url. '''
+        if not self:
+            raise IndexError("pop from empty PackedURLs")
+        length = self.lengths.pop()
+        packed = self.data[-length:]
+        del self.data[-length:]
+        return prefixes.decode(packed)
+
+    def popleft(self):
+        ''' The first url. '''
+        if not self:
+            raise IndexError("pop from empty PackedURLs")
+        length = self.lengths[self.head]
+        packed = self.data[self.offset:self.offset + length]
+        self.head += 1
+        self.offset += length
+        if self.head == len(self.lengths):
+            self.clear()
+        elif self.offset > 4096 and self.offset * 2 > len(self.data):
+            del self.data[:self.offset]
+            del self.lengths[:self.head]
+            self.head = self.offset = 0
+        return prefixes.decode(packed)
+
+    def clear(self):
+        self.data = bytearray()
+        self.lengths = array("I")
+        self.head = self.offset = 0
+
+    def memory(self):
+        return self.data.__sizeof__() + self.lengths.buffer_info()[1] * self.lengths.itemsize
+
+
+def url_key(url):
+    ''' 64 bit digest of the whole url, scheme included. '''
+    return int.from_bytes(blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class URLSet(object):
+    '''
+    A set of url strings for scraper.unique_pages: every url once in PackedURLs, in the
+    order they were added, and membership from a SeenSet of 64 bit digests (same odds
+    of two urls colliding as the frontier's seen set, about 3 in a million at 10M).
+    add() needs the caller's lock, like SeenSet.
+    '''
+    def __init__(self, urls=()):
+        self.urls = PackedURLs()
+        self.keys = SeenSet()
+        for url in urls:
+            self.add(url)
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __iter__(self):
+        return iter(self.urls)
+
+    def __contains__(self, url):
+        return url_key(url) in self.keys
+
+    def add(self, url):
+        if self.keys.add(url_key(url)):
+            self.urls.append(url)
+
+    def clear(self):
+        self.urls = PackedURLs()
+        self.keys = SeenSet()
+
+    def memory(self):
+        return self.urls.memory() + self.keys.memory()